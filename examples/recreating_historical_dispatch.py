@@ -39,7 +39,11 @@ inputs_manager = hi.DBManager(connection=con)
 # List for saving inputs to.
 outputs = []
 
-# Create and dispatch the spot market for each dispatch interval.
+# Create a market instance, which keeps its solver model alive between intervals, so each interval only updates the
+# parts of the model that have changed.
+market = markets.Spot(incremental=True)
+
+# Dispatch the spot market for each dispatch interval.
 for interval in dispatch_intervals:
     # Transform the historical input data into the format accepted by the Spot market class.
     # Unit info.
@@ -76,9 +80,6 @@ for interval in dispatch_intervals:
     loss_functions = hi.create_loss_functions(interconnector_loss_coefficients, interconnector_demand_coefficients,
                                               regional_demand.loc[:, ['region', 'loss_function_demand']])
 
-    # Create a market instance.
-    market = markets.Spot()
-
     # Add generators to the market.
     market.set_unit_info(unit_info.loc[:, ['unit', 'region']])
 
@@ -13,39 +13,39 @@ def keep_details(fn):
 
 def energy_bid_ids_exist(func):
     @keep_details(func)
-    def wrapper(*args):
+    def wrapper(*args, **kwargs):
         if 'bids' not in args[0].decision_variables:
             raise ModelBuildError('This cannot be performed before energy volume bids are set.')
-        func(*args)
+        return func(*args, **kwargs)
 
     return wrapper
 
 
 def all_units_have_info(func):
     @keep_details(func)
-    def wrapper(*args):
+    def wrapper(*args, **kwargs):
         if not set(args[1]['unit'].unique()) <= set(args[0].unit_info['unit']):
             raise ModelBuildError('Not all unit with bids are present in the unit_info input.')
-        func(*args)
+        return func(*args, **kwargs)
     return wrapper
 
 
 def interconnectors_exist(func):
     @keep_details(func)
-    def wrapper(*args):
+    def wrapper(*args, **kwargs):
         if 'interconnectors' not in args[0].decision_variables:
             raise ModelBuildError('Losses cannot be added to interconnectors because they do not exist yet.')
         existing_inters = args[0].decision_variables['interconnectors']['interconnector'].unique()
         new_inters = args[1]['interconnector'].unique()
         if not all(inter in existing_inters for inter in new_inters):
             raise ModelBuildError('Losses cannot be added to interconnectors because they do not exist yet.')
-        func(*args)
+        return func(*args, **kwargs)
     return wrapper
 
 
 def bid_prices_monotonic_increasing(func, arg=1):
     @keep_details(func)
-    def wrapper(*args):
+    def wrapper(*args, **kwargs):
         bids = args[arg].copy()
         if 'service' in bids.columns:
             bids = bids.set_index(['unit', 'service'], drop=True)
@@ -57,18 +57,28 @@ def bid_prices_monotonic_increasing(func, arg=1):
         for col in bids.columns:
             if not bids[col].is_monotonic:
                 raise BidsNotMonotonicIncreasing('Bids of each unit are not monotonic increasing.')
-        func(*args)
+        return func(*args, **kwargs)
 
     return wrapper
 
 
 def pre_dispatch(func):
     @keep_details(func)
-    def wrapper(*args):
+    def wrapper(*args, **kwargs):
         if 'energy_bids' in args[0].decision_variables and 'energy_bids' not in \
                 args[0].objective_function_components:
             raise ModelBuildError('No unit energy bids provided.')
-        func(*args)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def not_loaded_from_snapshot(func):
+    @keep_details(func)
+    def wrapper(*args, **kwargs):
+        if args[0].loaded_from_snapshot:
+            raise ModelBuildError('Inputs cannot be set on a market loaded from a snapshot.')
+        return func(*args, **kwargs)
 
     return wrapper
 
@@ -76,11 +86,11 @@ def pre_dispatch(func):
 def repeated_rows(name, cols, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             cols_in_df = [col for col in cols if col in args[arg].columns]
             if args[0].check and len(args[arg].index) != len(args[arg].drop_duplicates(cols_in_df)):
                 raise RepeatedRowError('{} should only have one row for each {}.'.format(name, ' '.join(cols_in_df)))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -90,7 +100,7 @@ def repeated_rows(name, cols, arg=1):
 def column_data_types(name, dtypes, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column in args[arg].columns:
                     if column in dtypes and dtypes[column] == str:
@@ -105,7 +115,7 @@ def column_data_types(name, dtypes, arg=1):
                     elif column not in dtypes and dtypes['else'] != args[arg][column].dtype:
                         raise ColumnDataTypeError('Column {} in {} should have type {}'.
                                                   format(column, name, dtypes['else']))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -115,14 +125,14 @@ def column_data_types(name, dtypes, arg=1):
 def required_columns(name, required, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column in required:
                     if column not in args[arg].columns:
                         raise MissingColumnError("Column '{}' not in {}.".format(column, name))
                 if len(args[arg].columns) < 2:
                     raise MissingColumnError("No bid bands provided.")
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -132,12 +142,12 @@ def required_columns(name, required, arg=1):
 def allowed_columns(name, allowed, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column in args[arg].columns:
                     if column not in allowed:
                         raise UnexpectedColumn("Column '{}' not allowed in {}.".format(column, name))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -147,7 +157,7 @@ def allowed_columns(name, allowed, arg=1):
 def column_values_must_be_real(name, cols_to_check, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column in cols_to_check:
                     if column not in args[arg].columns:
@@ -158,7 +168,7 @@ def column_values_must_be_real(name, cols_to_check, arg=1):
                         raise ColumnValues("Value -inf not allowed in column '{}' in {}.".format(column, name))
                     if args[arg][column].isnull().any():
                         raise ColumnValues("Null values not allowed in column '{}' in {}.".format(column, name))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -168,14 +178,14 @@ def column_values_must_be_real(name, cols_to_check, arg=1):
 def column_values_not_negative(name, cols_to_check, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column in cols_to_check:
                     if column not in args[arg].columns:
                         continue
                     if args[arg][column].min() < 0.0:
                         raise ColumnValues("Negative values not allowed in column '{}' in {}.".format(column, name))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -185,7 +195,7 @@ def column_values_not_negative(name, cols_to_check, arg=1):
 def column_values_outside_range(name, column_ranges, arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             if args[0].check:
                 for column, allowed_range in column_ranges.items():
                     if not all(args[arg].apply(
@@ -194,7 +204,7 @@ def column_values_outside_range(name, column_ranges, arg=1):
                             "Values in {} in column '{}' outside the range {} to {}.".format(name, column,
                                                                                              allowed_range[0],
                                                                                              allowed_range[1]))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
@@ -203,14 +213,14 @@ def column_values_outside_range(name, column_ranges, arg=1):
 def table_exists(arg=1):
     def decorator(func):
         @keep_details(func)
-        def wrapper(*args):
+        def wrapper(*args, **kwargs):
             with args[0].con:
                 cur = args[0].con.cursor()
                 check_query = ''' SELECT count(name) FROM sqlite_master WHERE type='table' AND name='{}' '''
                 cur.execute(check_query.format(args[1]))
                 if cur.fetchone()[0] != 1:
                     raise MissingTable("The table {} does not exist.".format(args[1]))
-            func(*args)
+            return func(*args, **kwargs)
 
         return wrapper
 
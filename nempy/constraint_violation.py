@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+
+def violation_variables(constraints_rhs_and_type, penalties, next_variable_id):
+    """Create penalty priced variables that let constraints be violated, so a problem is always feasible.
+
+    Each '<=' constraint gets a surplus variable, that lets its lhs go above the rhs, each '>=' constraint gets a
+    deficit variable, that lets its lhs go below the rhs, and each '=' constraint gets both. The variables have a lower
+    bound of zero, no upper bound, and cost the penalty of their constraint group for each unit of violation, similar
+    to the constraint violation penalties used by NEMDE. If the penalties are higher than any bid the constraints are
+    only violated when there is no other way to solve the problem.
+
+    Examples
+    --------
+
+    A demand constraint and a unit capacity constraint.
+
+    >>> constraints_rhs_and_type = {
+    ...   'demand': pd.DataFrame({
+    ...     'region': ['X'],
+    ...     'constraint_id': [0],
+    ...     'type': ['='],
+    ...     'rhs': [1000.0]}),
+    ...   'unit_capacity': pd.DataFrame({
+    ...     'unit': ['A'],
+    ...     'constraint_id': [1],
+    ...     'type': ['<='],
+    ...     'rhs': [500.0]})}
+
+    >>> penalties = pd.DataFrame({
+    ...   'constraint_group': ['demand', 'unit_capacity'],
+    ...   'penalty': [14000.0, 50000.0]})
+
+    >>> variables, lhs, costs = violation_variables(constraints_rhs_and_type, penalties, next_variable_id=4)
+
+    >>> print(variables.loc[:, ['constraint_group', 'constraint_id', 'direction', 'variable_id', 'upper_bound']])
+      constraint_group  constraint_id direction  variable_id  upper_bound
+    0           demand              0   deficit            4          inf
+    1           demand              0   surplus            5          inf
+    2    unit_capacity              1   surplus            6          inf
+
+    >>> print(lhs)
+       constraint_id  variable_id  coefficient
+    0              0            4          1.0
+    1              0            5         -1.0
+    2              1            6         -1.0
+
+    >>> print(costs)
+       variable_id     cost
+    0            4  14000.0
+    1            5  14000.0
+    2            6  50000.0
+
+    Parameters
+    ----------
+    constraints_rhs_and_type : dict of pd.DataFrame
+        The constraints by group, only groups with a penalty get variables.
+
+        =============  ===============================================================
+        Columns:       Description:
+        constraint_id  the id of the constraint (as `np.int64`)
+        type           the type of the constraint, e.g. "=" (as `str`)
+        =============  ===============================================================
+
+    penalties : pd.DataFrame
+        The cost of violating the constraints in each group.
+
+        ================  ===============================================================
+        Columns:          Description:
+        constraint_group  the name of the constraint group (as `str`)
+        penalty           the cost of each unit of violation, in $/MW (as `np.float64`)
+        ================  ===============================================================
+
+    next_variable_id : int
+        The next integer to start using for variable ids.
+
+    Returns
+    -------
+    variables : pd.DataFrame
+
+        ================  ===============================================================
+        Columns:          Description:
+        constraint_group  the group of the constraint violated (as `str`)
+        constraint_id     the id of the constraint violated (as `np.int64`)
+        direction         'deficit' if the lhs is below the rhs, 'surplus' if above (as `str`)
+        variable_id       the id of the variable (as `np.int64`)
+        lower_bound       the lower bound of the variable, 0.0 (as `np.float64`)
+        upper_bound       the upper bound of the variable, inf (as `np.float64`)
+        type              the type of variable, continuous (as `str`)
+        ================  ===============================================================
+
+    lhs : pd.DataFrame
+        The coefficients of the variables in their constraints, with the columns constraint_id, variable_id and
+        coefficient.
+
+    costs : pd.DataFrame
+        The objective function costs of the variables, with the columns variable_id and cost.
+    """
+    variables = []
+    for group, penalty in zip(penalties['constraint_group'], penalties['penalty']):
+        if group not in constraints_rhs_and_type:
+            continue
+        constraints = constraints_rhs_and_type[group]
+        for direction, types in [('deficit', ['>=', '=']), ('surplus', ['<=', '='])]:
+            ids = constraints.loc[constraints['type'].isin(types), 'constraint_id']
+            variables.append(pd.DataFrame({'constraint_group': group, 'constraint_id': ids.values.astype(np.int64),
+                                           'direction': direction, 'penalty': penalty}))
+    variables = pd.concat(variables + [pd.DataFrame({'constraint_group': pd.Series([], dtype=object),
+                                                     'constraint_id': pd.Series([], dtype=np.int64),
+                                                     'direction': pd.Series([], dtype=object),
+                                                     'penalty': pd.Series([], dtype=np.float64)})])
+    variables = variables.sort_values(['constraint_id', 'direction'], kind='mergesort').reset_index(drop=True)
+    variables['variable_id'] = np.arange(next_variable_id, next_variable_id + len(variables.index), dtype=np.int64)
+    variables['lower_bound'] = 0.0
+    variables['upper_bound'] = np.inf
+    variables['type'] = 'continuous'
+
+    lhs = pd.DataFrame({'constraint_id': variables['constraint_id'], 'variable_id': variables['variable_id'],
+                        'coefficient': np.where(variables['direction'] == 'deficit', 1.0, -1.0)})
+    costs = pd.DataFrame({'variable_id': variables['variable_id'], 'cost': variables['penalty'].astype(np.float64)})
+    variables = variables.drop(columns=['penalty'])
+    return variables, lhs, costs
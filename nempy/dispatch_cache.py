@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class DispatchCache:
+    """Stores the results of dispatch, keyed by a hash of the inputs, so identical inputs are not solved again.
+
+    Results are held in memory, up to max_entries of them, with the least recently used dropped first. If a directory
+    is given results are also written to disk, and the least recently used files are deleted once the files in the
+    directory take up more than max_disk_bytes. A result found on disk is moved back into memory.
+
+    Examples
+    --------
+    >>> cache = DispatchCache(max_entries=2)
+
+    >>> key = input_hash({'demand': pd.DataFrame({'constraint_id': [0], 'rhs': [100.0]})})
+
+    >>> cache.get(key) is None
+    True
+
+    >>> cache.put(key, {'price': 50.0})
+
+    >>> cache.get(key)
+    {'price': 50.0}
+
+    >>> cache.hits, cache.misses
+    (1, 1)
+
+    Parameters
+    ----------
+    max_entries : int
+        The number of results to keep in memory.
+    directory : str or None
+        The directory to keep results in on disk, None to only keep results in memory.
+    max_disk_bytes : int
+        The total size of the result files to keep on disk.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups that found a result, in memory or on disk.
+    disk_hits : int
+        The number of lookups that found a result on disk, but not in memory.
+    misses : int
+        The number of lookups that found no result.
+    """
+
+    def __init__(self, max_entries=128, directory=None, max_disk_bytes=1024 ** 3):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """Return a copy of the result stored under key, or None if there is no result."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(self.memory[key])
+        if self.directory is not None:
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # Mark the file as recently used, files are evicted by last use.
+                os.utime(path)
+                self._remember(key, data)
+                self.hits += 1
+                self.disk_hits += 1
+                return pickle.loads(data)
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Store a copy of result under key."""
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.directory is not None:
+            path = self._path(key)
+            temporary_path = path + '.tmp'
+            with open(temporary_path, 'wb') as f:
+                f.write(data)
+            os.replace(temporary_path, path)
+            self._evict_from_disk()
+
+    def clear(self):
+        """Remove every stored result, from memory and disk, and reset the counters."""
+        self.memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _evict_from_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for last_used, size, path in files)
+        for last_used, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def input_hash(*inputs, ignore_columns=()):
+    """Hash dispatch inputs, which may be DataFrames, dicts of DataFrames or plain values, to a hex string.
+
+    Constraint lhs triplets, DataFrames with the columns constraint_id, variable_id and coefficient, are sorted first,
+    so the order the triplets were assembled in does not change the hash. Columns named in ignore_columns, e.g. the
+    results of a previous dispatch, are left out.
+
+    Examples
+    --------
+    >>> lhs = pd.DataFrame({'constraint_id': [0, 1], 'variable_id': [0, 0], 'coefficient': [1.0, 1.0]})
+
+    >>> input_hash(lhs) == input_hash(lhs.iloc[::-1])
+    True
+
+    >>> input_hash(lhs) == input_hash(lhs.assign(coefficient=[1.0, 2.0]))
+    False
+
+    >>> input_hash(lhs) == input_hash(lhs.assign(value=[5.0, 5.0]), ignore_columns=['value'])
+    True
+    """
+    digest = hashlib.sha256()
+    for value in inputs:
+        _update_hash(digest, value, ignore_columns)
+    return digest.hexdigest()
+
+
+def _update_hash(digest, value, ignore_columns):
+    if isinstance(value, dict):
+        digest.update(b'dict')
+        for key in sorted(value.keys()):
+            digest.update(repr(key).encode())
+            _update_hash(digest, value[key], ignore_columns)
+    elif isinstance(value, pd.DataFrame):
+        value = value.drop(columns=[column for column in ignore_columns if column in value.columns])
+        if {'constraint_id', 'variable_id', 'coefficient'} <= set(value.columns):
+            value = value.sort_values(['constraint_id', 'variable_id', 'coefficient'], kind='mergesort')
+        digest.update(b'frame')
+        digest.update(repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()]).encode())
+        digest.update(np.ascontiguousarray(pd.util.hash_pandas_object(value, index=False).values).tobytes())
+    else:
+        digest.update(repr(value).encode())
@@ -0,0 +1,85 @@
+import pandas as pd
+
+
+class DispatchResults:
+    """The outcome of one dispatch of a market, kept apart from the inputs the market was dispatched with.
+
+    A market can be dispatched, have some of its inputs set again and be dispatched again, with each dispatch giving
+    a new results object, so results can be held on to and compared while the market moves on. The getters of
+    :class:`markets.Spot` read the results of the market's last dispatch.
+
+    Examples
+    --------
+    >>> from nempy import markets
+
+    >>> market = markets.Spot()
+    >>> market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+    >>> market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+    >>> market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+    >>> market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+    >>> market.dispatch()
+
+    >>> base = market.results
+
+    >>> market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [10.0]}))
+    >>> market.dispatch()
+
+    >>> print(base.get_energy_prices())
+      region  price
+    0    NSW  100.0
+
+    >>> print(market.results.get_energy_prices())
+      region  price
+    0    NSW   50.0
+
+    Attributes
+    ----------
+    decision_variables : dict of pd.DataFrame
+        The decision variables of each group, with the column value.
+    market_constraints_rhs_and_type : dict of pd.DataFrame
+        The market constraints of each group, with the column price if they were priced.
+    solve_statistics : dict
+        The details of the solve, read by :meth:`markets.Spot.get_solve_status`,
+        :meth:`markets.Spot.get_pricing_statistics`, :meth:`markets.Spot.get_timings` and
+        :meth:`markets.Spot.get_presolve_report`.
+    model_arrays : model_arrays.ModelArrays
+        The arrays of the model that was dispatched, used to total the dispatch of each unit.
+    """
+
+    def __init__(self, decision_variables, market_constraints_rhs_and_type, solve_statistics, model_arrays):
+        self.decision_variables = decision_variables
+        self.market_constraints_rhs_and_type = market_constraints_rhs_and_type
+        self.solve_statistics = solve_statistics
+        self.model_arrays = model_arrays
+
+    def get_unit_dispatch(self):
+        """The dispatch of each unit and service, see :meth:`markets.Spot.get_unit_dispatch`."""
+        return self.model_arrays.group_sum('bids', ['unit', 'service'],
+                                           self.decision_variables['bids']['value'].values, 'dispatch')
+
+    def get_energy_prices(self):
+        """The energy price of each region, see :meth:`markets.Spot.get_energy_prices`."""
+        return self.market_constraints_rhs_and_type['demand'].loc[:, ['region', 'price']]
+
+    def get_fcas_prices(self):
+        """The price of each set of FCAS requirements, see :meth:`markets.Spot.get_fcas_prices`."""
+        return self.market_constraints_rhs_and_type['fcas'].loc[:, ['set', 'price']]
+
+    def get_interconnector_flows(self):
+        """The flow, and losses if modelled, of each interconnector, see
+        :meth:`markets.Spot.get_interconnector_flows`."""
+        flow = self.decision_variables['interconnectors'].loc[:, ['interconnector', 'value']]
+        flow.columns = ['interconnector', 'flow']
+        if 'interconnector_losses' in self.decision_variables:
+            losses = self.decision_variables['interconnector_losses'].loc[:, ['interconnector', 'value']]
+            losses.columns = ['interconnector', 'losses']
+            flow = pd.merge(flow, losses, 'left', on='interconnector')
+        return flow.reset_index(drop=True)
+
+    def get_constraint_violations(self):
+        """The constraints violated and by how much, see :meth:`markets.Spot.get_constraint_violations`."""
+        violations = self.decision_variables['constraint_violation']
+        violations = violations[violations['value'] > 1e-6]
+        violations = violations.loc[:, ['constraint_group', 'constraint_id', 'direction', 'value']]
+        violations.columns = ['constraint_group', 'constraint_id', 'direction', 'violation']
+        return violations.reset_index(drop=True)
@@ -1,5 +1,7 @@
 import numpy as np
 import pandas as pd
+from contextlib import nullcontext
+from time import perf_counter
 
 
 def save_index(dataframe, new_col_name, offset=0):
@@ -14,6 +16,58 @@ def save_index(dataframe, new_col_name, offset=0):
     return dataframe
 
 
+class IdIndex:
+    """Finds the positions of ids in an array of unique ids, through a lookup table covering the range of the ids."""
+
+    def __init__(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.first_id = ids.min() if len(ids) > 0 else 0
+        self.table = np.full(ids.max() - self.first_id + 1 if len(ids) > 0 else 0, -1, dtype=np.int64)
+        self.table[ids - self.first_id] = np.arange(len(ids))
+
+    def __call__(self, ids):
+        offsets = np.asarray(ids, dtype=np.int64) - self.first_id
+        positions = self.table[np.clip(offsets, 0, max(len(self.table) - 1, 0))] if len(self.table) > 0 else offsets
+        if len(offsets) > 0 and ((offsets < 0) | (offsets >= len(self.table)) | (positions < 0)).any():
+            raise KeyError('Ids not found in the index.')
+        return positions
+
+
+class _PhaseTimer:
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings[self.phase] = self.timings.get(self.phase, 0.0) + perf_counter() - self.start
+        return False
+
+
+_NOT_TIMED = nullcontext()
+
+
+def timer(timings, phase):
+    """Time a block of code, adding the seconds taken to timings[phase], or do nothing if timings is None.
+
+    Examples
+    --------
+    >>> timings = {}
+    >>> with timer(timings, 'solve'):
+    ...     pass
+    >>> list(timings.keys())
+    ['solve']
+
+    >>> with timer(None, 'solve'):
+    ...     pass
+    """
+    if timings is None:
+        return _NOT_TIMED
+    return _PhaseTimer(timings, phase)
+
+
 def max_constraint_index(newest_variable_data):
     # Find the maximum constraint index already in use in the constraint matrix.
     max_index = newest_variable_data['ROWINDEX'].max()
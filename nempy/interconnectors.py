@@ -613,3 +613,423 @@ def create_loss_variables(inter_variables, inter_constraint_map, loss_shares, ne
     loss_variables = loss_variables.loc[:, ['interconnector', 'variable_id', 'lower_bound', 'upper_bound', 'type']]
     constraint_map = constraint_map.loc[:, ['variable_id', 'region', 'service', 'coefficient']]
     return loss_variables, constraint_map
+
+
+def create_loss_segments(break_points, loss_functions):
+    """Create the straight line segments of the loss function between each pair of adjacent break points.
+
+    Examples
+    --------
+
+    >>> break_points = pd.DataFrame({
+    ...   'interconnector': ['I', 'I', 'I'],
+    ...   'loss_segment': [1, 2, 3],
+    ...   'break_point': [-100.0, 0.0, 100.0]})
+
+    >>> def quadratic_losses(flow):
+    ...     return 0.001 * flow ** 2
+
+    >>> loss_functions = pd.DataFrame({
+    ...    'interconnector': ['I'],
+    ...    'from_region_loss_share': [0.5],
+    ...    'loss_function': [quadratic_losses]})
+
+    >>> print(create_loss_segments(break_points, loss_functions))
+      interconnector  loss_segment  slope  intercept
+    0              I             1   -0.1        0.0
+    1              I             2    0.1        0.0
+
+    Parameters
+    ----------
+    break_points : pd.DataFrame
+
+        ==============  ================================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        loss_segment    unique identifier of a loss segment on an interconnector basis (as `np.float64`)
+        break_points    the interconnector flow values to interpolate losses between (as `np.float64`)
+        ==============  ================================================================================
+
+    loss_functions : pd.DataFrame
+
+        ======================  ==============================================================================
+        Columns:                Description:
+        interconnector          unique identifier of a interconnector (as `str`)
+        from_region_loss_share  The fraction of loss occuring in the from region, 0.0 to 1.0 (as `np.float64`)
+        loss_function           A function that takes a flow, in MW as a float and returns the losses in MW
+                                (as `callable`)
+        ======================  ==============================================================================
+
+    Returns
+    -------
+    segments : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        loss_segment    the loss segment of the break point the segment starts at (as `np.int64`)
+        slope           the change in losses per MW of flow along the segment (as `np.float64`)
+        intercept       the losses the segment gives at a flow of 0.0 MW (as `np.float64`)
+        ==============  ==============================================================================
+    """
+    # Evaluate the loss function at each break point.
+    points = pd.merge(break_points, loss_functions.loc[:, ['interconnector', 'loss_function']], 'inner',
+                      on='interconnector')
+    points['losses'] = points.apply(lambda x: x['loss_function'](x['break_point']), axis=1)
+    points = points.sort_values(['interconnector', 'break_point']).reset_index(drop=True)
+
+    # Join each break point to the next one along on the same interconnector.
+    next_points = points.groupby('interconnector')[['break_point', 'losses']].shift(-1)
+    segments = points.loc[:, ['interconnector', 'loss_segment', 'break_point', 'losses']]
+    segments['next_break_point'] = next_points['break_point']
+    segments['next_losses'] = next_points['losses']
+    segments = segments[segments['next_break_point'].notna()]
+
+    segments['slope'] = (segments['next_losses'] - segments['losses']) / \
+        (segments['next_break_point'] - segments['break_point'])
+    segments['intercept'] = segments['losses'] - segments['slope'] * segments['break_point']
+    return segments.loc[:, ['interconnector', 'loss_segment', 'slope', 'intercept']].reset_index(drop=True)
+
+
+def loss_segments_are_convex(segments, tolerance=1e-9):
+    """Check, for each interconnector, that the slope of the loss segments never decreases as flow increases.
+
+    Examples
+    --------
+
+    >>> segments = pd.DataFrame({
+    ...   'interconnector': ['I', 'I', 'J', 'J'],
+    ...   'loss_segment': [1, 2, 1, 2],
+    ...   'slope': [-0.1, 0.1, 0.1, -0.1],
+    ...   'intercept': [0.0, 0.0, 0.0, 0.0]})
+
+    >>> print(loss_segments_are_convex(segments))
+    interconnector
+    I     True
+    J    False
+    Name: slope, dtype: bool
+
+    Parameters
+    ----------
+    segments : pd.DataFrame
+        Loss segments, as returned by :func:`create_loss_segments`, in order of flow for each interconnector.
+    tolerance : float
+        The decrease in slope allowed for rounding errors, relative to the size of the slopes.
+
+    Returns
+    -------
+    pd.Series
+        True for each interconnector with a convex loss function, indexed by interconnector.
+    """
+    def convex(slopes):
+        return bool((slopes.diff().dropna() >= -tolerance * max(1.0, slopes.abs().max())).all())
+
+    return segments.groupby('interconnector')['slope'].apply(convex)
+
+
+def link_inter_loss_to_flow_with_segments(segments, flow_variables, loss_variables, next_constraint_id):
+    """Create the constraints that keep the interconnector losses on or above each segment of the loss function.
+
+    For a convex loss function the loss segments all lie on or below the loss function, and where the segments
+    meet they trace out the linear interpolation of the loss function between the break points. So, when
+    extra losses only add cost, constraining the losses to be on or above every segment gives the same losses as
+    interpolating with weight variables, without the special ordered set. For each segment the constraint is:
+
+        interconnector losses - slope * interconnector flow >= intercept
+
+    Examples
+    --------
+
+    >>> segments = pd.DataFrame({
+    ...   'interconnector': ['I', 'I'],
+    ...   'loss_segment': [1, 2],
+    ...   'slope': [-0.1, 0.1],
+    ...   'intercept': [0.0, 0.0]})
+
+    >>> flow_variables = pd.DataFrame({
+    ...   'interconnector': ['I'],
+    ...   'variable_id': [0]})
+
+    >>> loss_variables = pd.DataFrame({
+    ...   'interconnector': ['I'],
+    ...   'variable_id': [1]})
+
+    >>> next_constraint_id = 0
+
+    >>> lhs, rhs = link_inter_loss_to_flow_with_segments(segments, flow_variables, loss_variables,
+    ...                                                  next_constraint_id)
+
+    >>> print(lhs)
+       variable_id  constraint_id  coefficient
+    0            1              0          1.0
+    1            1              1          1.0
+    2            0              0          0.1
+    3            0              1         -0.1
+
+    >>> print(rhs)
+      interconnector  loss_segment  constraint_id type  rhs
+    0              I             1              0   >=  0.0
+    1              I             2              1   >=  0.0
+
+    Parameters
+    ----------
+    segments : pd.DataFrame
+        Loss segments, as returned by :func:`create_loss_segments`.
+
+    flow_variables : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        variable_id     the id of the variable (as `np.int64`)
+        ==============  ==============================================================================
+
+    loss_variables : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        variable_id     the id of the variable (as `np.int64`)
+        ==============  ==============================================================================
+
+    next_constraint_id : int
+
+    Returns
+    -------
+    lhs : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        variable_id     the id of the variable (as `np.int64`)
+        constraint_id   the id of the constraint (as `np.int64`)
+        coefficient     the coefficient of the variable on the lhs of the constraint (as `np.float64`)
+        ==============  ==============================================================================
+
+    rhs : pd.DataFrame
+
+        ================  ==============================================================================
+        Columns:          Description:
+        interconnector    unique identifier of a interconnector (as `str`)
+        loss_segment      the loss segment the constraint is for (as `np.int64`)
+        constraint_id     the id of the constraint (as `np.int64`)
+        type              the type of the constraint, ">=" (as `str`)
+        rhs               the rhs of the constraint, the intercept of the segment (as `np.float64`)
+        ================  ==============================================================================
+    """
+    # Create a constraint for each segment.
+    rhs = hf.save_index(segments, 'constraint_id', next_constraint_id)
+
+    # The loss variable goes on the lhs of every segment constraint of its interconnector.
+    loss_lhs = pd.merge(rhs.loc[:, ['interconnector', 'constraint_id']],
+                        loss_variables.loc[:, ['interconnector', 'variable_id']], 'inner', on='interconnector')
+    loss_lhs['coefficient'] = 1.0
+
+    # And the flow variable, multiplied by the negative of the slope.
+    flow_lhs = pd.merge(rhs.loc[:, ['interconnector', 'constraint_id', 'slope']],
+                        flow_variables.loc[:, ['interconnector', 'variable_id']], 'inner', on='interconnector')
+    flow_lhs['coefficient'] = -1 * flow_lhs['slope']
+
+    lhs = pd.concat([loss_lhs, flow_lhs], ignore_index=True).loc[:, ['variable_id', 'constraint_id', 'coefficient']]
+    rhs['type'] = '>='
+    rhs['rhs'] = rhs['intercept']
+    rhs = rhs.loc[:, ['interconnector', 'loss_segment', 'constraint_id', 'type', 'rhs']]
+    return lhs, rhs
+
+
+def limit_flow_to_break_points(break_points, flow_variables, next_constraint_id):
+    """Create the constraints that keep each interconnector's flow between its lowest and highest break points.
+
+    The loss segments of :func:`link_inter_loss_to_flow_with_segments` are straight lines, so past the outer break
+    points they carry on without limit. These constraints keep the flow within the range the loss function was
+    interpolated over, as the weight variables of the special ordered set do.
+
+    Examples
+    --------
+
+    >>> break_points = pd.DataFrame({
+    ...   'interconnector': ['I', 'I', 'I'],
+    ...   'loss_segment': [1, 2, 3],
+    ...   'break_point': [-120.0, 0.0, 100.0]})
+
+    >>> flow_variables = pd.DataFrame({
+    ...   'interconnector': ['I'],
+    ...   'variable_id': [0]})
+
+    >>> lhs, rhs = limit_flow_to_break_points(break_points, flow_variables, 2)
+
+    >>> print(lhs)
+       variable_id  constraint_id  coefficient
+    0            0              2          1.0
+    1            0              3          1.0
+
+    >>> print(rhs)
+      interconnector  constraint_id type    rhs
+    0              I              2   >= -120.0
+    1              I              3   <=  100.0
+
+    Parameters
+    ----------
+    break_points : pd.DataFrame
+
+        ==============  ================================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        loss_segment    unique identifier of a loss segment on an interconnector basis (as `np.float64`)
+        break_points    the interconnector flow values to interpolate losses between (as `np.float64`)
+        ==============  ================================================================================
+
+    flow_variables : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        variable_id     the id of the variable (as `np.int64`)
+        ==============  ==============================================================================
+
+    next_constraint_id : int
+
+    Returns
+    -------
+    lhs : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        variable_id     the id of the variable (as `np.int64`)
+        constraint_id   the id of the constraint (as `np.int64`)
+        coefficient     the coefficient of the variable on the lhs of the constraint (as `np.float64`)
+        ==============  ==============================================================================
+
+    rhs : pd.DataFrame
+
+        ================  ==============================================================================
+        Columns:          Description:
+        interconnector    unique identifier of a interconnector (as `str`)
+        constraint_id     the id of the constraint (as `np.int64`)
+        type              the type of the constraint, ">=" for the lowest break point and "<=" for the
+                          highest (as `str`)
+        rhs               the break point (as `np.float64`)
+        ================  ==============================================================================
+    """
+    limits = break_points.groupby('interconnector', sort=True)['break_point'].agg(['min', 'max']).reset_index()
+    lower = pd.DataFrame({'interconnector': limits['interconnector'], 'type': '>=', 'rhs': limits['min']})
+    upper = pd.DataFrame({'interconnector': limits['interconnector'], 'type': '<=', 'rhs': limits['max']})
+    rhs = pd.concat([lower, upper]).sort_values('interconnector', kind='mergesort').reset_index(drop=True)
+    rhs = hf.save_index(rhs, 'constraint_id', next_constraint_id)
+
+    lhs = pd.merge(rhs.loc[:, ['interconnector', 'constraint_id']],
+                   flow_variables.loc[:, ['interconnector', 'variable_id']], 'inner', on='interconnector')
+    lhs['coefficient'] = 1.0
+    lhs = lhs.loc[:, ['variable_id', 'constraint_id', 'coefficient']]
+    rhs = rhs.loc[:, ['interconnector', 'constraint_id', 'type', 'rhs']]
+    return lhs, rhs
+
+
+def select_coarse_break_points(break_points, number):
+    """Select about number break points for each interconnector, evenly spread and always including the end points.
+
+    Examples
+    --------
+
+    >>> break_points = pd.DataFrame({
+    ...   'interconnector': ['I'] * 9,
+    ...   'loss_segment': [1, 2, 3, 4, 5, 6, 7, 8, 9],
+    ...   'break_point': [-400.0, -300.0, -200.0, -100.0, 0.0, 100.0, 200.0, 300.0, 400.0]})
+
+    >>> print(select_coarse_break_points(break_points, 3))
+      interconnector  loss_segment  break_point
+    0              I             1       -400.0
+    1              I             5          0.0
+    2              I             9        400.0
+
+    Parameters
+    ----------
+    break_points : pd.DataFrame
+
+        ==============  ================================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        loss_segment    unique identifier of a loss segment on an interconnector basis (as `np.float64`)
+        break_points    the interconnector flow values to interpolate losses between (as `np.float64`)
+        ==============  ================================================================================
+
+    number : int
+        The number of break points to select for each interconnector, at least 2.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selected rows of break_points, sorted by interconnector and break point.
+    """
+    def select(points):
+        positions = np.unique(np.linspace(0, len(points.index) - 1, max(number, 2)).round().astype(np.int64))
+        return points.iloc[positions]
+
+    break_points = break_points.sort_values(['interconnector', 'break_point'])
+    return break_points.groupby('interconnector', group_keys=False).apply(select).reset_index(drop=True)
+
+
+def refine_break_points(all_break_points, break_points, flows, margin=2.0):
+    """Add the break points around each interconnector's flow, from all the break points.
+
+    The break points around a flow are those within margin MW of it, and the nearest one beyond that on each side.
+    Only these are added, so for all but very closely spaced break points each refinement adds a few break points for
+    each interconnector. Once no break points are added, the losses interpolated within margin MW of each flow are
+    the same as with all the break points.
+
+    Examples
+    --------
+
+    >>> all_break_points = pd.DataFrame({
+    ...   'interconnector': ['I'] * 9,
+    ...   'loss_segment': [1, 2, 3, 4, 5, 6, 7, 8, 9],
+    ...   'break_point': [-400.0, -300.0, -200.0, -100.0, 0.0, 100.0, 200.0, 300.0, 400.0]})
+
+    >>> break_points = select_coarse_break_points(all_break_points, 3)
+
+    >>> flows = pd.DataFrame({
+    ...   'interconnector': ['I'],
+    ...   'flow': [150.0]})
+
+    >>> print(refine_break_points(all_break_points, break_points, flows))
+      interconnector  loss_segment  break_point
+    0              I             1       -400.0
+    1              I             5          0.0
+    2              I             6        100.0
+    3              I             7        200.0
+    4              I             9        400.0
+
+    Parameters
+    ----------
+    all_break_points : pd.DataFrame
+        All the break points, in the same form as in :func:`select_coarse_break_points`.
+    break_points : pd.DataFrame
+        The break points used in the last dispatch, a subset of all_break_points.
+    flows : pd.DataFrame
+
+        ==============  ==============================================================================
+        Columns:        Description:
+        interconnector  unique identifier of a interconnector (as `str`)
+        flow            the flow of the interconnector in the last dispatch, in MW (as `np.float64`)
+        ==============  ==============================================================================
+
+    margin : float
+        How far, in MW, either side of each flow the losses are made the same as with all the break points.
+        Perturbation pricing adds 1 MW to each market constraint, which can move a flow by a little over 1 MW, so the
+        default, 2.0, also covers the flows of the pricing re-solves.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selected rows of all_break_points, sorted by interconnector and break point.
+    """
+    flows = dict(zip(flows['interconnector'], flows['flow']))
+    refined = []
+    for interconnector, points in all_break_points.sort_values('break_point').groupby('interconnector'):
+        values = points['break_point'].to_numpy()
+        selected = np.isin(values, break_points.loc[break_points['interconnector'] == interconnector, 'break_point'])
+        flow = flows[interconnector]
+        first = max(np.searchsorted(values, flow - margin, side='left') - 1, 0)
+        last = min(np.searchsorted(values, flow + margin, side='right'), len(values) - 1)
+        selected[first:last + 1] = True
+        refined.append(points[selected])
+    return pd.concat(refined).reset_index(drop=True)
@@ -1,14 +1,44 @@
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from nempy import check, market_constraints, objective_function, solver_interface, unit_constraints, variable_ids, \
-    create_lhs, interconnectors as inter, fcas_constraints
+    merit_order, model_arrays, interconnectors as inter, fcas_constraints, helper_functions as hf, dispatch_cache, \
+    constraint_violation, snapshot, dispatch_results
 
 
-class Spot:
-    """Class for constructing and dispatch the spot market on an interval basis."""
+ELASTIC_CONSTRAINT_GROUPS = ['demand', 'fcas', 'unit_capacity', 'ramp_up', 'ramp_down', 'fcas_max_availability',
+                             'joint_ramping', 'joint_capacity', 'energy_and_regulation_capacity']
+
 
-    def __init__(self, dispatch_interval=5):
+class Spot:
+    """Class for constructing and dispatch the spot market on an interval basis.
+
+    Parameters
+    ----------
+    dispatch_interval : int
+        The length of the dispatch interval in minutes.
+    incremental : bool
+        If True the solver model is kept alive between calls to dispatch. Market inputs can then be set again for the
+        next interval and the next call to dispatch only updates the bounds, costs and rhs values that have changed,
+        and adds or removes variables and constraints for units, interconnectors etc. that appear or disappear.
+    timing : bool
+        If True the time spent in each phase of dispatch is recorded, see :meth:`get_timings`. If False, the default,
+        nothing is timed.
+    cache : dispatch_cache.DispatchCache or None
+        If given, the inputs to each dispatch are hashed and, if the same inputs have been dispatched before, the
+        stored dispatch and prices are used instead of solving again. One cache can be shared by many markets, e.g.
+        one for each interval of a replay. The hits and misses are counted by the cache.
+    """
+
+    def __init__(self, dispatch_interval=5, incremental=False, timing=False, cache=None):
         self.dispatch_interval = dispatch_interval
+        self.incremental = incremental
+        self.timing = timing
+        self.cache = cache
+        self.solver_model = None
+        self.interconnector_loss_inputs = None
+        self.loss_refinement = None
+        self.constraint_violation_penalties = None
         self.unit_info = None
         self.decision_variables = {}
         self.variable_to_constraint_map = {'regional': {}, 'unit_level': {}}
@@ -18,10 +48,14 @@ class Spot:
         self.constraints_dynamic_rhs_and_type = {}
         self.market_constraints_rhs_and_type = {}
         self.objective_function_components = {}
+        self.model_arrays = model_arrays.ModelArrays()
+        self.results = None
         self.next_variable_id = 0
         self.next_constraint_id = 0
+        self.loaded_from_snapshot = False
         self.check = True
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('unit_info', ['unit'])
     @check.column_data_types('unit_info', {'unit': str, 'region': str, 'loss_factor': np.float64})
     @check.required_columns('unit_info', ['unit', 'region'])
@@ -83,6 +117,7 @@ class Spot:
                 If there are inf, null or negative values in the 'loss_factor' column."""
         self.unit_info = unit_info
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('volume_bids', ['unit'])
     @check.allowed_columns('volume_bids', ['unit', 'service', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10'])
     @check.repeated_rows('volume_bids', ['unit', 'service'])
@@ -216,6 +251,7 @@ class Spot:
         # Update the variable id counter:
         self.next_variable_id = max(self.decision_variables['bids']['variable_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.energy_bid_ids_exist
     @check.required_columns('price_bids', ['unit'])
     @check.allowed_columns('price_bids', ['unit', 'service', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10'])
@@ -332,6 +368,7 @@ class Spot:
         self.objective_function_components['bids'] = \
             energy_objective_function.loc[:, ['variable_id', 'unit', 'service', 'capacity_band', 'cost']]
 
+    @check.not_loaded_from_snapshot
     @check.energy_bid_ids_exist
     @check.required_columns('unit_limits', ['unit', 'capacity'])
     @check.allowed_columns('unit_limits', ['unit', 'capacity'])
@@ -441,6 +478,7 @@ class Spot:
         # 3. Update the constraint and variable id counter
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.energy_bid_ids_exist
     @check.required_columns('unit_limits', ['unit', 'initial_output', 'ramp_up_rate'])
     @check.allowed_columns('unit_limits', ['unit', 'initial_output', 'ramp_up_rate'])
@@ -554,6 +592,7 @@ class Spot:
         # 3. Update the constraint and variable id counter
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('unit_limits', ['unit', 'initial_output', 'ramp_down_rate'])
     @check.allowed_columns('unit_limits', ['unit', 'initial_output', 'ramp_down_rate'])
     @check.repeated_rows('unit_limits', ['unit'])
@@ -667,6 +706,7 @@ class Spot:
         # 3. Update the constraint and variable id counter
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('demand', ['region', 'demand'])
     @check.allowed_columns('demand', ['region', 'demand'])
     @check.repeated_rows('demand', ['region'])
@@ -747,6 +787,7 @@ class Spot:
         # 3. Update the constraint id
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('fcas_requirements', ['set', 'service', 'region', 'volume'])
     @check.allowed_columns('fcas_requirements', ['set', 'service', 'region', 'volume'])
     @check.repeated_rows('fcas_requirements', ['set', 'service', 'region'])
@@ -834,6 +875,7 @@ class Spot:
         # 3. Update the constraint id
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('fcas_max_availability', ['unit', 'service', 'max_availability'], arg=1)
     @check.allowed_columns('fcas_max_availability', ['unit', 'service', 'max_availability'], arg=1)
     @check.repeated_rows('fcas_max_availability', ['unit', 'service'], arg=1)
@@ -914,6 +956,7 @@ class Spot:
         self.constraint_to_variable_map['unit_level']['fcas_max_availability'] = variable_map
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('regulation_units', ['unit', 'service'], arg=1)
     @check.allowed_columns('regulation_units', ['unit', 'service'], arg=1)
     @check.repeated_rows('regulation_units', ['unit', 'service'], arg=1)
@@ -1033,6 +1076,7 @@ class Spot:
         self.constraint_to_variable_map['unit_level']['joint_ramping'] = variable_map
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('contingency_trapeziums', ['unit', 'service', 'max_availability', 'enablement_min',
                                                        'low_break_point', 'high_break_point', 'enablement_max'], arg=1)
     @check.allowed_columns('contingency_trapeziums', ['unit', 'service', 'max_availability', 'enablement_min',
@@ -1142,6 +1186,7 @@ class Spot:
         self.constraint_to_variable_map['unit_level']['joint_capacity'] = variable_map
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('regulation_trapeziums', ['unit', 'service', 'max_availability', 'enablement_min',
                                                       'low_break_point', 'high_break_point', 'enablement_max'], arg=1)
     @check.allowed_columns('regulation_trapeziums', ['unit', 'service', 'max_availability', 'enablement_min',
@@ -1249,6 +1294,7 @@ class Spot:
         self.constraint_to_variable_map['unit_level']['energy_and_regulation_capacity'] = variable_map
         self.next_constraint_id = max(rhs_and_type['constraint_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.required_columns('interconnector_directions_and_limits',
                             ['interconnector', 'to_region', 'from_region', 'max', 'min'])
     @check.allowed_columns('interconnector_directions_and_limits',
@@ -1338,6 +1384,7 @@ class Spot:
 
         self.next_variable_id = max(self.decision_variables['interconnectors']['variable_id']) + 1
 
+    @check.not_loaded_from_snapshot
     @check.interconnectors_exist
     @check.required_columns('loss_functions', ['interconnector', 'from_region_loss_share', 'loss_function'], arg=1)
     @check.allowed_columns('loss_functions', ['interconnector', 'from_region_loss_share', 'loss_function'], arg=1)
@@ -1352,7 +1399,8 @@ class Spot:
     @check.column_data_types('interpolation_break_point', {'interconnector': str, 'loss_segment': np.int64,
                                                            'break_point': np.float64}, arg=2)
     @check.column_values_must_be_real('interpolation_break_point', ['break_point'], arg=2)
-    def set_interconnector_losses(self, loss_functions, interpolation_break_points):
+    def set_interconnector_losses(self, loss_functions, interpolation_break_points, formulation='sos2',
+                                  coarse_break_points=None):
         """Creates linearised loss functions for interconnectors.
 
         Creates a loss variable for each interconnector, this variable models losses by adding demand to each region.
@@ -1385,6 +1433,30 @@ class Spot:
 
             w1 * f(-100.0) + w2 * f(0.0) + w3 * f(100.0) = interconnector losses
 
+        The special ordered set makes dispatch a mixed integer problem. If every loss function is convex, e.g. the
+        quadratic loss functions of historical_spot_market_inputs, the 'lp' formulation can be used instead. The loss
+        function is split into a straight line segment between each pair of adjacent break points, and the losses are
+        constrained to be on or above every segment:
+
+            interconnector losses - slope * interconnector flow >= intercept
+
+        Because losses add to demand, the cheapest dispatch puts the losses on the highest segment at the actual flow,
+        which for a convex function is the same interpolation as the special ordered set gives. Dispatch then stays a
+        linear program. The flow is limited to the range of the break points, as with the special ordered set. If
+        extra losses would lower the cost of dispatch, which can only happen when there are negative price bids, the
+        losses could be set above the loss function, so a market with any negative price bids is dispatched with the
+        'sos2' formulation instead.
+
+        Historical loss models have many break points for each interconnector, which makes for a large special
+        ordered set. If coarse_break_points is given, break points are added adaptively instead. Dispatch starts with
+        that many break points for each interconnector, then adds the break points within 2 MW of each
+        interconnector's flow, and the nearest beyond that on each side, and dispatches again, until the flows add no
+        more break points, see :func:`interconnectors.refine_break_points`. Only the final dispatch is priced. The
+        losses within 2 MW of the final flows are then the same as with all the break points, but a better dispatch
+        with flows elsewhere is not always found. With convex loss functions and no negative price bids the dispatch
+        and prices are the same as with all the break points. Otherwise they may differ, e.g. if a non-convex loss
+        function has a lower cost dispatch with the flow in a segment that was never refined.
+
         Examples
         --------
         This is an example of the minimal set of steps for using this method.
@@ -1484,6 +1556,23 @@ class Spot:
         1            3              2          0.0
         2            4              2          5.0
 
+        The same losses can be set with the linear program formulation, which replaces the weight variables with a
+        constraint for each segment of the loss function.
+
+        >>> simple_market.set_interconnector_losses(loss_functions, interpolation_break_points, formulation='lp')
+
+        >>> print(simple_market.constraints_rhs_and_type['interconnector_loss_segments'])
+          interconnector  loss_segment  constraint_id type  rhs
+        0    little_link             1              3   >=  0.0
+        1    little_link             2              4   >=  0.0
+
+        ... and constraints that keep the flow between the outer break points.
+
+        >>> print(simple_market.constraints_rhs_and_type['interconnector_flow_range'])
+          interconnector  constraint_id type    rhs
+        0    little_link              5   >= -120.0
+        1    little_link              6   <=  100.0
+
 
         Parameters
         ----------
@@ -1507,6 +1596,15 @@ class Spot:
                             (as `np.float64`)
             ==============  ============================================================================================
 
+        formulation : str
+            How the loss functions are linearised, 'sos2' (the default) interpolates between break points with a
+            special ordered set of weight variables, 'lp' constrains the losses to be on or above each segment of the
+            loss function, which needs every loss function to be convex.
+        coarse_break_points : int
+            If given, dispatch starts with this many of the break points for each interconnector, evenly spread and
+            including the end points, and adds break points around the flows found, see above. The default, None,
+            uses all the break points.
+
         Returns
         -------
         None
@@ -1514,7 +1612,10 @@ class Spot:
         Raises
         ------
             ModelBuildError
-                If all the interconnectors in the input data have not already been added to the model.
+                If all the interconnectors in the input data have not already been added to the model. Or if the 'lp'
+                formulation is used and a loss function is not convex between the break points.
+            ValueError
+                If formulation is not 'sos2' or 'lp'.
             RepeatedRowError
                 If there is more than one row for any interconnector in loss_functions. Or if there is a repeated break
                 point for an interconnector in interpolation_break_points.
@@ -1529,6 +1630,21 @@ class Spot:
                 from_region_loss_share are outside the range of 0.0 to 1.0
         """
 
+        if formulation not in ['sos2', 'lp']:
+            raise ValueError("formulation should be 'sos2' or 'lp', not '{}'.".format(formulation))
+
+        self.interconnector_loss_inputs = dict(loss_functions=loss_functions, formulation=formulation)
+        self.loss_refinement = None
+        if coarse_break_points is not None:
+            self.loss_refinement = dict(loss_functions=loss_functions, all_break_points=interpolation_break_points,
+                                        formulation=formulation)
+            interpolation_break_points = inter.select_coarse_break_points(interpolation_break_points,
+                                                                          coarse_break_points)
+            self.loss_refinement['coarse_break_points'] = interpolation_break_points
+        self.interconnector_loss_inputs['break_points'] = interpolation_break_points
+        self._add_interconnector_losses(loss_functions, interpolation_break_points, formulation)
+
+    def _add_interconnector_losses(self, loss_functions, interpolation_break_points, formulation):
         # Create loss variables.
         loss_variables, loss_variables_constraint_map = \
             inter.create_loss_variables(self.decision_variables['interconnectors'],
@@ -1536,6 +1652,11 @@ class Spot:
                                         loss_functions, self.next_variable_id)
         next_variable_id = loss_variables['variable_id'].max() + 1
 
+        if formulation == 'lp':
+            self._set_interconnector_loss_segments(loss_functions, interpolation_break_points, loss_variables,
+                                                   loss_variables_constraint_map)
+            return
+
         # Create weight variables.
         weight_variables = inter.create_weights(interpolation_break_points, next_variable_id)
 
@@ -1568,14 +1689,127 @@ class Spot:
         self.decision_variables['interconnector_losses'] = loss_variables
         self.variable_to_constraint_map['regional']['interconnector_losses'] = loss_variables_constraint_map
         self.decision_variables['interpolation_weights'] = weight_variables
-        self.lhs_coefficients = pd.concat([self.lhs_coefficients, lhs])  # TODO pontential bug if losses adde twice.
+        self.lhs_coefficients = lhs
         self.constraints_rhs_and_type['interpolation_weights'] = weights_sum_rhs
         self.constraints_dynamic_rhs_and_type['link_loss_to_flow'] = dynamic_rhs
+        self.constraints_rhs_and_type.pop('interconnector_loss_segments', None)
+        self.constraints_rhs_and_type.pop('interconnector_flow_range', None)
         self.next_variable_id = pd.concat([loss_variables, weight_variables])['variable_id'].max() + 1
         self.next_constraint_id = pd.concat([weights_sum_rhs, dynamic_rhs])['constraint_id'].max() + 1
 
+    def _set_interconnector_loss_segments(self, loss_functions, interpolation_break_points, loss_variables,
+                                          loss_variables_constraint_map):
+        segments = inter.create_loss_segments(interpolation_break_points, loss_functions)
+        convex = inter.loss_segments_are_convex(segments)
+        if not convex.all():
+            raise check.ModelBuildError('The loss functions of {} are not convex between the break points, use the '
+                                        "'sos2' formulation.".format(', '.join(convex[~convex].index)))
+
+        lhs, rhs = inter.link_inter_loss_to_flow_with_segments(segments, self.decision_variables['interconnectors'],
+                                                               loss_variables, self.next_constraint_id)
+        range_lhs, range_rhs = inter.limit_flow_to_break_points(interpolation_break_points,
+                                                                self.decision_variables['interconnectors'],
+                                                                rhs['constraint_id'].max() + 1)
+        lhs = pd.concat([lhs, range_lhs], ignore_index=True)
+
+        # Save results, replacing any interpolation weights set up previously.
+        self.decision_variables['interconnector_losses'] = loss_variables
+        self.variable_to_constraint_map['regional']['interconnector_losses'] = loss_variables_constraint_map
+        self.decision_variables.pop('interpolation_weights', None)
+        self.constraints_rhs_and_type.pop('interpolation_weights', None)
+        self.constraints_dynamic_rhs_and_type.pop('link_loss_to_flow', None)
+        self.lhs_coefficients = lhs
+        self.constraints_rhs_and_type['interconnector_loss_segments'] = rhs
+        self.constraints_rhs_and_type['interconnector_flow_range'] = range_rhs
+        self.next_variable_id = loss_variables['variable_id'].max() + 1
+        self.next_constraint_id = range_rhs['constraint_id'].max() + 1
+
+    @check.not_loaded_from_snapshot
+    @check.required_columns('penalties', ['constraint_group', 'penalty'])
+    @check.allowed_columns('penalties', ['constraint_group', 'penalty'])
+    @check.repeated_rows('penalties', ['constraint_group'])
+    @check.column_data_types('penalties', {'constraint_group': str, 'penalty': np.float64})
+    @check.column_values_must_be_real('penalties', ['penalty'])
+    @check.column_values_not_negative('penalties', ['penalty'])
+    def set_constraint_violation_penalties(self, penalties):
+        """Lets the constraints of the given groups be violated, at a cost, so dispatch always finds a solution.
+
+        At each dispatch, penalty priced variables are added to the constraints of each group, see
+        :func:`constraint_violation.violation_variables`, similar to the constraint violation penalties used by NEMDE.
+        An interval with inputs that can not all be met then still solves in one pass, with the constraints that could
+        not be met violated by the least costly amounts, see :meth:`get_constraint_violations`. Penalties are applied
+        to the constraints in place when dispatch is called, so they can be set before or after the constraints.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+
+        Demand is more than the units have bid.
+
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [80.0]}))
+
+        >>> simple_market.set_constraint_violation_penalties(pd.DataFrame({
+        ...     'constraint_group': ['demand'], 'penalty': [14000.0]}))
+
+        >>> simple_market.dispatch()
+
+        >>> print(simple_market.get_constraint_violations())
+          constraint_group  constraint_id direction  violation
+        0           demand              0   deficit       10.0
+
+        The price is set by the penalty.
+
+        >>> print(simple_market.get_energy_prices())
+          region    price
+        0    NSW  14000.0
+
+        Parameters
+        ----------
+        penalties : pd.DataFrame
+            The cost of violating the constraints of each group.
+
+            ================  ======================================================================================
+            Columns:          Description:
+            constraint_group  the constraints penalised, one of 'demand', 'fcas', 'unit_capacity', 'ramp_up',
+                              'ramp_down', 'fcas_max_availability', 'joint_ramping', 'joint_capacity' or
+                              'energy_and_regulation_capacity' (as `str`)
+            penalty           the cost of each MW of violation, in $/MW (as `np.float64`)
+            ================  ======================================================================================
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+            RepeatedRowError
+                If there is more than one row for any constraint group.
+            ColumnDataTypeError
+                If columns are not of the require type.
+            MissingColumnError
+                If the column 'constraint_group' or 'penalty' is missing.
+            UnexpectedColumn
+                There is a column that is not 'constraint_group' or 'penalty'.
+            ColumnValues
+                If there are inf, null or negative values in the 'penalty' column.
+            ValueError
+                If a constraint group is not one that can be penalised.
+        """
+        unknown = set(penalties['constraint_group']) - set(ELASTIC_CONSTRAINT_GROUPS)
+        if len(unknown) > 0:
+            raise ValueError('Constraint groups {} can not be penalised.'.format(sorted(unknown)))
+        self.constraint_violation_penalties = penalties
+
     @check.pre_dispatch
-    def dispatch(self):
+    def dispatch(self, price_method='perturbation', pricing_workers=None, backend='cbc', presolve=False,
+                 decompose=False, component_workers=None, aggregate=False, time_limit=None, mip_gap=None,
+                 threads=None, merit_order=True):
         """Combines the elements of the linear program and solves to find optimal dispatch.
 
         Examples
@@ -1653,37 +1887,976 @@ class Spot:
           region  price
         0    NSW  130.0
 
+        Parameters
+        ----------
+        price_method : str
+            How the prices of market constraints are found. The default, 'perturbation', re-solves the problem once
+            for each market constraint with the constraint's rhs increased by 1.0 and takes the change in objective
+            value as the price. 'dual' fixes the integer and SOS structure at its optimal values, re-solves once as a
+            linear program and reads the shadow price of every market constraint in one pass, which is much faster
+            when there are many market constraints. Perturbation pricing can be used to cross check dual prices.
+        pricing_workers : int
+            The number of worker processes to share the perturbation pricing re-solves between. Each worker holds its
+            own solved copy of the model. The default, None, re-solves serially. Not used with dual pricing.
+        backend : str
+            The solver to use, 'cbc' (the default, through python-mip) or 'highs' (through highspy, which needs to
+            be installed). HiGHS does not support SOS constraints, so interconnector loss interpolation is formulated
+            with binary variables instead.
+        presolve : bool
+            If True, before the problem is solved, where several unit level constraints bound the same sum of
+            variables, e.g. a unit's capacity and ramp up constraints, only the tightest is kept, and constraints on a
+            single variable are turned into variable bounds. Market constraints are always kept, so prices are not
+            affected. See :meth:`get_presolve_report` for the number of constraints eliminated. Default False.
+        decompose : bool
+            If True the problem is split into parts that share no constraints, e.g. regions with no interconnectors
+            between them or with interconnectors whose flow is fixed, and each part is dispatched as its own smaller
+            problem, with the results joined back together. The market's solver model is not kept between dispatches
+            when decomposing. Default False.
+        component_workers : int
+            The number of worker processes to share the parts of a decomposed problem between. The default, None,
+            dispatches the parts one after another. Perturbation pricing of each part is done serially within its
+            worker. Only used if decompose is True.
+        aggregate : bool
+            If True, bid bands that are interchangeable, i.e. in the same region at the same price, of units with no
+            unit level constraints that tell them apart, are merged into one variable before the problem is solved.
+            The dispatch of each merged variable is then shared between its bands in proportion to their volumes.
+            The total dispatch and prices are the same as without merging, but where bands are tied the dispatch may
+            be shared differently between them. Default False.
+        time_limit : float
+            The seconds the solver may spend on the dispatch solve, and on each perturbation pricing re-solve. If the
+            limit is reached once a feasible solution has been found, that solution is used rather than raising an
+            error, see :meth:`get_solve_status` for whether the solution is optimal and how far from the best bound it
+            is. A pricing re-solve that finds no feasible solution in time gives a price of NaN. The default, None, is
+            no limit.
+        mip_gap : float
+            The relative gap between the solution and the best bound at which the solver stops searching for a better
+            integer solution. The default, None, uses the solver's own default. Only affects problems with integer or
+            SOS structure, e.g. those with fast start units or interconnector losses.
+        threads : int
+            The number of threads the solver may use. The default, None, uses the solver's own default.
+        merit_order : bool
+            If True, the default, markets with only energy bids, unit capacity and ramp up constraints and one demand
+            constraint per region, i.e. no interconnectors, FCAS or other constraints, are cleared by sorting the bids
+            into merit order in each region rather than with the solver, which gives the same dispatch and
+            perturbation prices much faster. Where bids are tied on price the dispatch may be shared differently
+            between them. Merit order prices are the bid prices themselves, while the solver's perturbation prices
+            are the difference between two solved objective values, so the two can differ slightly, by the solver's
+            numerical tolerance, which is a few 1e-4 $/MWh with CBC. :meth:`get_pricing_statistics` has no rows for a
+            market cleared by merit order, as no re-solves are needed. Dual pricing, presolve, decompose, aggregate,
+            incremental markets and constraint violation penalties always use the solver. If False the solver is always
+            used.
+
         Returns
         -------
-        None
+        None, the results are kept in the attribute results, a :class:`dispatch_results.DispatchResults`, and read by
+        the get methods. The inputs of the market are not changed, so inputs can be set again and the market
+        dispatched again.
 
         Raises
         ------
             ModelBuildError
                 If a model build process is incomplete, i.e. there are energy bids but not energy demand set.
+            ValueError
+                If price_method is not 'perturbation' or 'dual', or the backend is not known, if the problem is
+                infeasible, or if no feasible solution is found within the time limit.
         """
+        limits = None
+        if time_limit is not None or mip_gap is not None or threads is not None:
+            limits = {'time_limit': time_limit, 'mip_gap': mip_gap, 'threads': threads}
+        options = (pricing_workers, backend, presolve, decompose, component_workers, aggregate, limits, merit_order)
+        market = self._with_losses_dispatchable()
+        if market.loss_refinement is not None:
+            market._dispatch_with_loss_refinement(price_method, *options)
+        else:
+            market._dispatch(price_method, *options)
+        if market is not self:
+            self.results = market.results
+            self.solver_model = market.solver_model
+
+    def _with_losses_dispatchable(self):
+        # The market, or, if it has 'lp' interconnector losses and any negative price bids, which could make it
+        # cheaper to over state the losses, a clone of the market with 'sos2' losses, leaving its own as they are.
+        losses = self.interconnector_loss_inputs
+        if losses is None or losses['formulation'] != 'lp' or 'bids' not in self.objective_function_components or \
+                not (self.objective_function_components['bids']['cost'] < 0.0).any():
+            return self
+        market = self._with_interconnector_losses(losses['break_points'], 'sos2')
+        if market.loss_refinement is not None:
+            market.loss_refinement['formulation'] = 'sos2'
+        return market
+
+    def _with_interconnector_losses(self, break_points, formulation):
+        # A clone of the market, sharing its solver model, with the interconnector losses set up again.
+        market = self.clone()
+        market.solver_model = self.solver_model
+        market._add_interconnector_losses(self.interconnector_loss_inputs['loss_functions'], break_points,
+                                          formulation)
+        return market
+
+    def _dispatch_with_loss_refinement(self, price_method, *options):
+        # Dispatch, adding the break points next to the interconnector flows, until no more are added. A dispatch is
+        # only priced once its flows add no break points, so the final dispatch is priced as it is solved, except
+        # when decomposed, where every dispatch is priced. Each refined set of break points is dispatched on a clone
+        # of the market, so the market keeps its coarse break points and every dispatch starts from them.
+        refinement = self.loss_refinement
+        break_points = refinement['coarse_break_points']
+        market = self
+        dispatches = 0
+        while True:
+            def is_final(decision_variables, break_points=break_points):
+                refined = self._refine_break_points(break_points, decision_variables)
+                return len(refined.index) == len(break_points.index)
+
+            market._dispatch(price_method, *options, price_if=is_final)
+            dispatches += 1
+            refined = self._refine_break_points(break_points, market.results.decision_variables)
+            if len(refined.index) == len(break_points.index):
+                break
+            break_points = refined
+            market = market._with_interconnector_losses(break_points, refinement['formulation'])
+        market.results.solve_statistics['loss_refinement'] = {'dispatches': dispatches,
+                                                              'break_points': len(break_points.index)}
+        self.results = market.results
+        self.solver_model = market.solver_model
+
+    def _refine_break_points(self, break_points, decision_variables):
+        flows = decision_variables['interconnectors'].loc[:, ['interconnector', 'value']]
+        flows.columns = ['interconnector', 'flow']
+        return inter.refine_break_points(self.loss_refinement['all_break_points'], break_points, flows)
+
+    def _assemble(self, timings=None):
+        # Build the lhs of every constraint and add any constraint violation variables, giving the inputs to
+        # solver_interface.dispatch that are not kept on the market as they are, and the model arrays they match.
+        self._sync_model_arrays()
+        arrays = self.model_arrays
+        decision_variables = self.decision_variables
+        objective_function_components = self.objective_function_components
+        if self.constraint_violation_penalties is not None:
+            variables, lhs, costs = constraint_violation.violation_variables(
+                dict(self.constraints_rhs_and_type, **self.market_constraints_rhs_and_type),
+                self.constraint_violation_penalties, self.next_variable_id)
+            decision_variables = dict(decision_variables, constraint_violation=variables)
+            objective_function_components = dict(objective_function_components, constraint_violation=costs)
+            arrays = arrays.copy()
+            arrays.set_variables('constraint_violation', variables)
+            arrays.set_costs('constraint_violation', costs)
+            arrays.set_lhs('constraint_violation', lhs)
+
+        with hf.timer(timings, 'lhs_assembly'):
+            constraints_lhs = arrays.lhs_frame()
+        return decision_variables, constraints_lhs, objective_function_components, arrays
+
+    def _sync_model_arrays(self):
+        # Encode the groups of inputs set, or edited in place, since the problem was last built, so the model arrays
+        # always match the DataFrames of the market.
+        self.model_arrays.sync(model_arrays.groups(
+            self.decision_variables, self.objective_function_components, self.constraints_rhs_and_type,
+            self.market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+            self.variable_to_constraint_map, self.constraint_to_variable_map, self.lhs_coefficients))
+
+    def _merit_order_inputs(self):
+        # The bands, unit limits and regional demand to clear by merit order, or None if the market has any structure
+        # that merit order can not clear.
+        unit_level_groups = set(self.constraints_rhs_and_type)
+        if set(self.decision_variables) != {'bids'} or set(self.objective_function_components) - {'bids'} or \
+                len(self.lhs_coefficients.index) > 0 or len(self.constraints_dynamic_rhs_and_type) > 0 or \
+                set(self.market_constraints_rhs_and_type) != {'demand'} or \
+                not unit_level_groups <= {'unit_capacity', 'ramp_up'} or \
+                set(self.variable_to_constraint_map['regional']) != {'bids'} or \
+                set(self.variable_to_constraint_map['unit_level']) - {'bids'} or \
+                set(self.constraint_to_variable_map['regional']) != {'demand'} or \
+                set(self.constraint_to_variable_map['unit_level']) != unit_level_groups or \
+                self.constraint_violation_penalties is not None or self.loss_refinement is not None:
+            return None
+
+        maps = [self.variable_to_constraint_map['regional']['bids'],
+                self.constraint_to_variable_map['regional']['demand']]
+        maps += [self.constraint_to_variable_map['unit_level'][group] for group in unit_level_groups]
+        if 'bids' in self.variable_to_constraint_map['unit_level']:
+            maps.append(self.variable_to_constraint_map['unit_level']['bids'])
+        if any((variable_map['coefficient'] != 1.0).any() or (variable_map['service'] != 'energy').any()
+               for variable_map in maps):
+            return None
+
+        bids = self.decision_variables['bids']
+        demand = self.market_constraints_rhs_and_type['demand']
+        if (bids['type'] != 'continuous').any() or (bids['lower_bound'] != 0.0).any() or \
+                (bids['service'] != 'energy').any() or (demand['type'] != '=').any() or \
+                demand['region'].duplicated().any() or \
+                any((self.constraints_rhs_and_type[group]['type'] != '<=').any() for group in unit_level_groups):
+            return None
+
+        bid_regions = self.variable_to_constraint_map['regional']['bids'].drop_duplicates('variable_id')
+        bid_regions = bid_regions.set_index('variable_id')['region'].reindex(bids['variable_id'])
+        regions = pd.Index(demand['region'])
+        band_regions = regions.get_indexer(bid_regions.values)
+        if (band_regions < 0).any() or \
+                len(self.variable_to_constraint_map['regional']['bids'].index) != len(bids.index):
+            return None
+
+        units = pd.Index(bids['unit'].unique())
+        unit_limits = np.full(len(units), np.inf)
+        for group in unit_level_groups:
+            limits = self.constraint_to_variable_map['unit_level'][group].loc[:, ['constraint_id', 'unit']]
+            limits = pd.merge(limits, self.constraints_rhs_and_type[group].loc[:, ['constraint_id', 'rhs']],
+                              on='constraint_id')
+            positions = units.get_indexer(limits['unit'])
+            limited = positions >= 0
+            np.minimum.at(unit_limits, positions[limited], limits['rhs'].values[limited])
+
+        costs = self.objective_function_components.get('bids')
+        if costs is None:
+            costs = np.zeros(len(bids.index))
+        else:
+            costs = costs.set_index('variable_id')['cost'].reindex(bids['variable_id']).fillna(0.0).values
+        return dict(band_regions=band_regions, band_units=units.get_indexer(bids['unit']),
+                    volumes=bids['upper_bound'].values, costs=costs, unit_limits=unit_limits,
+                    demand=demand['rhs'].values)
+
+    def _dispatch_by_merit_order(self, inputs, price_method, statistics, timings):
+        with hf.timer(timings, 'merit_order'):
+            dispatch, prices = merit_order.clear(**inputs)
+        bids = self.decision_variables['bids'].reset_index(drop=True)
+        bids['value'] = dispatch
+        demand = self.market_constraints_rhs_and_type['demand'].copy()
+        statistics['solve'] = {'status': 'optimal', 'gap': 0.0}
+        if price_method is not None:
+            demand['price'] = prices
+            # The prices are read from the merit order, so there are no pricing re-solves to report.
+            statistics['pricing'] = pd.DataFrame({
+                'constraint_id': np.array([], dtype=np.int64), 'warm_start': np.array([], dtype=object),
+                'status': np.array([], dtype=object), 'iterations': np.array([], dtype=object),
+                'seconds': np.array([], dtype=np.float64)})
+        return {'bids': bids}, {'demand': demand}
+
+    def _dispatch(self, price_method, pricing_workers, backend, presolve, decompose, component_workers, aggregate,
+                  limits, use_merit_order=False, price_if=None):
+        timings = {} if self.timing else None
+        merit_order_inputs = None
+        if use_merit_order and price_method in ('perturbation', None) and \
+                not (presolve or decompose or aggregate or self.incremental):
+            merit_order_inputs = self._merit_order_inputs()
+        if merit_order_inputs is not None and self.cache is None:
+            self._sync_model_arrays()
+            statistics = {}
+            self._set_results(*self._dispatch_by_merit_order(merit_order_inputs, price_method, statistics, timings),
+                              statistics, timings)
+            return
+        decision_variables, constraints_lhs, objective_function_components, arrays = self._assemble(timings)
+
+        cache_key = None
+        if self.cache is not None:
+            with hf.timer(timings, 'cache_lookup'):
+                # Merit order can share the dispatch of tied bands out differently to the solver, so results from
+                # the two are kept apart.
+                cache_key = dispatch_cache.input_hash(
+                    decision_variables, constraints_lhs, self.constraints_rhs_and_type,
+                    self.market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+                    objective_function_components, price_method, backend, presolve, aggregate, limits,
+                    merit_order_inputs is not None, decompose, component_workers)
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                decision_variables, market_constraints_rhs_and_type, statistics = cached
+                self._set_results(decision_variables, market_constraints_rhs_and_type, dict(statistics), timings)
+                return
+
+        # Prices are added to the market constraints by the solver, so it is given copies to keep the inputs as set.
+        market_constraints_rhs_and_type = {name: frame.copy()
+                                           for name, frame in self.market_constraints_rhs_and_type.items()}
+        statistics = {}
+        if merit_order_inputs is not None:
+            decision_variables, market_constraints_rhs_and_type = \
+                self._dispatch_by_merit_order(merit_order_inputs, price_method, statistics, timings)
+        elif decompose:
+            decision_variables, market_constraints_rhs_and_type = solver_interface.dispatch_components(
+                decision_variables, constraints_lhs, self.constraints_rhs_and_type,
+                market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+                objective_function_components, price_method, pricing_workers, statistics, backend,
+                presolve, timings, component_workers, aggregate, limits)
+        else:
+            if self.incremental and (self.solver_model is None or self.solver_model.backend_name != backend):
+                self.solver_model = solver_interface.PersistentModel(backend)
+            decision_variables, market_constraints_rhs_and_type = solver_interface.dispatch(
+                decision_variables, constraints_lhs, self.constraints_rhs_and_type,
+                market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+                objective_function_components, price_method, pricing_workers, statistics,
+                self.solver_model, backend, presolve, timings, aggregate, limits, model_arrays=arrays,
+                price_if=price_if)
+        # A dispatch that price_if left unpriced is not what the cache key stands for, so it is not cached.
+        priced = price_method is None or all('price' in frame.columns
+                                             for frame in market_constraints_rhs_and_type.values())
+        if cache_key is not None and priced:
+            # The statistics are cached with the results, leaving out the timings, which are of this dispatch.
+            self.cache.put(cache_key, (decision_variables, market_constraints_rhs_and_type, dict(statistics)))
+        self._set_results(decision_variables, market_constraints_rhs_and_type, statistics, timings)
+
+    def _set_results(self, decision_variables, market_constraints_rhs_and_type, statistics, timings):
+        if timings is not None:
+            statistics['timings'] = timings
+        self.results = dispatch_results.DispatchResults(decision_variables, market_constraints_rhs_and_type,
+                                                        statistics, self.model_arrays.copy())
+
+    def _last_results(self):
+        if self.results is None:
+            raise check.ModelBuildError('The market has not been dispatched.')
+        return self.results
+
+    def get_constraint_violations(self):
+        """Retrieves the constraints violated in the last dispatch, and by how much.
+
+        Constraints can only be violated if penalties have been set, see :meth:`set_constraint_violation_penalties`.
+
+        Returns
+        -------
+        pd.DataFrame
 
-        constraints_lhs = self.lhs_coefficients
+            ================  ==================================================================================
+            Columns:          Description:
+            constraint_group  the group of the constraint violated (as `str`)
+            constraint_id     the id of the constraint violated (as `np.int64`)
+            direction         'deficit' if the lhs was below the rhs, 'surplus' if above (as `str`)
+            violation         the amount of the violation, in MW (as `np.float64`)
+            ================  ==================================================================================
 
-        if len(self.constraint_to_variable_map['regional']) > 0:
-            regional_constraints_lhs = create_lhs.create(self.constraint_to_variable_map['regional'],
-                                                         self.variable_to_constraint_map['regional'],
-                                                         ['region', 'service'])
+        Raises
+        ------
+            ModelBuildError
+                If the market has not been dispatched with constraint violation penalties.
+        """
+        if self.results is None or 'constraint_violation' not in self.results.decision_variables:
+            raise check.ModelBuildError('The market has not been dispatched with constraint violation penalties.')
+        return self.results.get_constraint_violations()
 
-            constraints_lhs = pd.concat([constraints_lhs, regional_constraints_lhs])
+    def price_curve(self, region, demand_values, price_method='perturbation', backend='cbc'):
+        """Dispatches the market at each of a series of demand levels in one region, giving the price curve.
 
-        if len(self.constraint_to_variable_map['unit_level']) > 0:
-            unit_constraints_lhs = create_lhs.create(self.constraint_to_variable_map['unit_level'],
-                                                     self.variable_to_constraint_map['unit_level'],
-                                                     ['unit', 'service'])
-            constraints_lhs = pd.concat([constraints_lhs, unit_constraints_lhs])
+        The model is assembled once and held by one solver model, and only the rhs of the region's demand constraint
+        is changed between points, with each solve warm started from the solution at the previous point. This is much
+        quicker than building and dispatching the market again for each point. The market's own inputs and results
+        are left as they are.
 
-        decision_variables, market_constraints_rhs_and_type = solver_interface.dispatch(
-            self.decision_variables, constraints_lhs, self.constraints_rhs_and_type,
-            self.market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
-            self.objective_function_components)
-        self.market_constraints_rhs_and_type = market_constraints_rhs_and_type
-        self.decision_variables = decision_variables
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+
+        >>> prices, dispatch = simple_market.price_curve('NSW', [10.0, 40.0])
+
+        >>> print(prices)
+           demand region  price
+        0    10.0    NSW   50.0
+        1    40.0    NSW  100.0
+
+        >>> print(dispatch)
+           demand unit service  dispatch
+        0    10.0    A  energy      10.0
+        1    10.0    B  energy       0.0
+        2    40.0    A  energy      20.0
+        3    40.0    B  energy      20.0
+
+        Parameters
+        ----------
+        region : str
+            The region whose demand is changed.
+        demand_values : list-like of float
+            The demand levels to dispatch at, in MW.
+        price_method : str
+            How prices are found, 'perturbation' (the default) or 'dual', see :meth:`dispatch`.
+        backend : str
+            The solver to use, 'cbc' (the default) or 'highs', see :meth:`dispatch`.
+
+        Returns
+        -------
+        prices : pd.DataFrame
+
+            ========  ================================================================================
+            Columns:  Description:
+            demand    the demand level in the region changed, in MW (as `np.float64`)
+            region    unique identifier of a market region (as `str`)
+            price     the energy price in the region, in $/MW (as `np.float64`)
+            ========  ================================================================================
+
+        dispatch : pd.DataFrame
+
+            ========  ================================================================================
+            Columns:  Description:
+            demand    the demand level in the region changed, in MW (as `np.float64`)
+            unit      unique identifier of a dispatch unit (as `str`)
+            service   the service being provided (as `str`)
+            dispatch  the dispatch of the unit, in MW (as `np.float64`)
+            ========  ================================================================================
+
+        Raises
+        ------
+            ModelBuildError
+                If demand constraints have not been set.
+            ValueError
+                If there is no demand constraint for the region.
+        """
+        if 'demand' not in self.market_constraints_rhs_and_type:
+            raise check.ModelBuildError('Demand constraints have not been set.')
+        demand = self.market_constraints_rhs_and_type['demand']
+        if region not in set(demand['region']):
+            raise ValueError("There is no demand constraint for the region '{}'.".format(region))
+        market = self._with_losses_dispatchable()
+        if market is not self:
+            return market.price_curve(region, demand_values, price_method, backend)
+        decision_variables, constraints_lhs, objective_function_components, _ = self._assemble()
+        model = solver_interface.PersistentModel(backend)
+        in_region = (demand['region'] == region).values
+        prices = []
+        dispatch = []
+        for demand_value in demand_values:
+            # Copy the market constraints, as dispatch adds prices to them.
+            market_constraints_rhs_and_type = {name: frame.copy()
+                                               for name, frame in self.market_constraints_rhs_and_type.items()}
+            market_constraints_rhs_and_type['demand']['rhs'] = np.where(in_region, demand_value, demand['rhs'])
+            variables, market_constraints_rhs_and_type = solver_interface.dispatch(
+                decision_variables, constraints_lhs, self.constraints_rhs_and_type, market_constraints_rhs_and_type,
+                self.constraints_dynamic_rhs_and_type, objective_function_components, price_method, model=model,
+                warm_start=True)
+            point_prices, point_dispatch = _energy_results(variables, market_constraints_rhs_and_type)
+            point_prices.insert(0, 'demand', float(demand_value))
+            point_dispatch.insert(0, 'demand', float(demand_value))
+            prices.append(point_prices)
+            dispatch.append(point_dispatch)
+        return pd.concat(prices, ignore_index=True), pd.concat(dispatch, ignore_index=True)
+
+    @check.required_columns('scenarios', ['scenario', 'delta', 'target', 'value'])
+    @check.allowed_columns('scenarios', ['scenario', 'delta', 'target', 'value'])
+    @check.column_values_must_be_real('scenarios', ['value'])
+    def dispatch_scenarios(self, scenarios, price_method='perturbation', backend='cbc', workers=None):
+        """Dispatches a batch of scenarios, each a set of changes to the market as it is, e.g. for a risk study.
+
+        The model is assembled once. Each scenario's changes are applied to a copy of the variable bounds, constraint
+        rhs or bid costs they touch, and the scenario is dispatched on a solver model that is kept between scenarios,
+        so only those bounds, rhs values and costs are updated in the solver. With workers, the scenarios are shared
+        out over a pool of processes, each holding its own solver model. The market's own inputs and results are left
+        as they are.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 80.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+
+        Scenario 1 has 45 MW less demand, scenario 2 an outage of unit A and scenario 3 unit A's bids tripled.
+
+        >>> scenarios = pd.DataFrame({
+        ...     'scenario': [1, 2, 3],
+        ...     'delta': ['demand_offset', 'outage', 'price_factor'],
+        ...     'target': ['NSW', 'A', 'A'],
+        ...     'value': [-45.0, 0.0, 3.0]})
+
+        >>> prices, dispatch = simple_market.dispatch_scenarios(scenarios)
+
+        >>> print(prices)
+           scenario region  price
+        0         1    NSW   50.0
+        1         2    NSW  100.0
+        2         3    NSW  100.0
+
+        >>> print(dispatch)
+           scenario unit service  dispatch
+        0         1    A  energy      15.0
+        1         1    B  energy       0.0
+        2         2    A  energy       0.0
+        3         2    B  energy      60.0
+        4         3    A  energy       0.0
+        5         3    B  energy      60.0
+
+        Parameters
+        ----------
+        scenarios : pd.DataFrame
+            The changes that make up each scenario, one row per change, applied to the market as it is.
+
+            ========  ===============================================================================================
+            Columns:  Description:
+            scenario  the id of the scenario the change is part of
+            delta     the kind of change (as `str`), one of \n
+                      'demand_offset', value MW are added to the demand of the target region, \n
+                      'outage', the bids of the target unit are made unavailable, value is not used, or \n
+                      'price_factor', the bid prices of the target unit are multiplied by value
+            target    the region or unit changed (as `str`)
+            value     the size of the change (as `np.float64`)
+            ========  ===============================================================================================
+
+        price_method : str
+            How prices are found, 'perturbation' (the default) or 'dual', see :meth:`dispatch`.
+        backend : str
+            The solver to use, 'cbc' (the default) or 'highs', see :meth:`dispatch`.
+        workers : int
+            The number of worker processes to share the scenarios between. The default, None, dispatches the
+            scenarios one after another in this process.
+
+        Returns
+        -------
+        prices : pd.DataFrame
+            The energy price in each region for each scenario, with the columns scenario, region and price, see
+            :meth:`get_energy_prices`.
+        dispatch : pd.DataFrame
+            The dispatch of each unit for each scenario, with the columns scenario, unit, service and dispatch, see
+            :meth:`get_unit_dispatch`.
+
+        Raises
+        ------
+            ModelBuildError
+                If demand constraints have not been set.
+            ValueError
+                If a delta is not known, a target is not a region with a demand constraint or a unit with unit info,
+                or a scenario can not be dispatched, e.g. because it is infeasible.
+        """
+        if 'demand' not in self.market_constraints_rhs_and_type:
+            raise check.ModelBuildError('Demand constraints have not been set.')
+        unknown = set(scenarios['delta']) - {'demand_offset', 'outage', 'price_factor'}
+        if len(unknown) > 0:
+            raise ValueError('Scenario deltas {} are not known.'.format(sorted(unknown)))
+        regions = set(self.market_constraints_rhs_and_type['demand']['region'])
+        units = set(self.unit_info['unit']) if self.unit_info is not None else set()
+        region_targets = set(scenarios.loc[scenarios['delta'] == 'demand_offset', 'target'])
+        unit_targets = set(scenarios.loc[scenarios['delta'] != 'demand_offset', 'target'])
+        if len(region_targets - regions) > 0:
+            raise ValueError('Scenario demand_offset regions {} have no demand constraint.'.format(
+                sorted(region_targets - regions)))
+        if len(unit_targets - units) > 0:
+            raise ValueError('Scenario outage or price_factor units {} are not known.'.format(
+                sorted(unit_targets - units)))
+        market = self._with_losses_dispatchable()
+        if market is not self:
+            return market.dispatch_scenarios(scenarios, price_method, backend, workers)
+        decision_variables, constraints_lhs, objective_function_components, _ = self._assemble()
+        model_inputs = (decision_variables, constraints_lhs, self.constraints_rhs_and_type,
+                        self.market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+                        objective_function_components)
+        scenario_ids = []
+        deltas = []
+        for scenario_id, scenario in scenarios.groupby('scenario', sort=False):
+            scenario_ids.append(scenario_id)
+            deltas.append(scenario.loc[:, ['delta', 'target', 'value']])
+
+        if workers is not None and workers > 1 and len(deltas) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(deltas)), initializer=_start_scenario_worker,
+                                     initargs=(model_inputs, price_method, backend)) as pool:
+                results = list(pool.map(_dispatch_scenario_in_worker, deltas))
+        else:
+            model = solver_interface.PersistentModel(backend)
+            results = [_dispatch_scenario(model, model_inputs, scenario, price_method) for scenario in deltas]
+
+        prices = []
+        dispatch = []
+        for scenario_id, (scenario_prices, scenario_dispatch) in zip(scenario_ids, results):
+            scenario_prices.insert(0, 'scenario', scenario_id)
+            scenario_dispatch.insert(0, 'scenario', scenario_id)
+            prices.append(scenario_prices)
+            dispatch.append(scenario_dispatch)
+        return pd.concat(prices, ignore_index=True), pd.concat(dispatch, ignore_index=True)
+
+    def clone(self, changes=None):
+        """A branch of the market, for what-if studies, that shares the inputs of this market until they are set again.
+
+        The inputs of a market are held as a DataFrame for each group, encoded into a block of arrays when dispatched,
+        and setting a group replaces them rather than changing them, so the branch only needs its own dicts of groups.
+        It shares every DataFrame and block with this market, and only the groups set on the branch, e.g. new demand
+        constraints, are its own. Setting inputs on the branch, or dispatching it, leaves this market as it is, and
+        setting inputs on this market leaves the branch as it is. The branch starts without a solver model or results.
+
+        The changes of a branch, see :meth:`changes`, are only the groups set on it, so they are small to pickle and
+        can be sent to worker processes holding the base market, where the branch is rebuilt with clone(changes).
+
+        Examples
+        --------
+        >>> import pickle
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> base = markets.Spot()
+        >>> base.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> base.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> base.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> base.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+
+        >>> branch = base.clone()
+        >>> branch.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [10.0]}))
+
+        >>> branch.decision_variables['bids'] is base.decision_variables['bids']
+        True
+
+        The branch is sent as its changes and rebuilt from the base.
+
+        >>> changes = pickle.loads(pickle.dumps(branch.changes(base)))
+        >>> rebuilt = base.clone(changes)
+        >>> rebuilt.dispatch()
+
+        >>> print(rebuilt.get_energy_prices())
+          region  price
+        0    NSW   50.0
+
+        >>> base.dispatch()
+
+        >>> print(base.get_energy_prices())
+          region  price
+        0    NSW  100.0
+
+        Parameters
+        ----------
+        changes : model_arrays.Changes
+            The changes of a branch of this market, from :meth:`changes`, to apply to the clone. By default the clone
+            is the same as this market.
+
+        Returns
+        -------
+        Spot
+        """
+        branch = Spot.__new__(Spot)
+        branch.__dict__.update(self.__dict__)
+        for name in ['decision_variables', 'constraints_rhs_and_type', 'constraints_dynamic_rhs_and_type',
+                     'market_constraints_rhs_and_type', 'objective_function_components']:
+            setattr(branch, name, dict(getattr(self, name)))
+        for name in ['variable_to_constraint_map', 'constraint_to_variable_map']:
+            setattr(branch, name, {level: dict(maps) for level, maps in getattr(self, name).items()})
+        if self.loss_refinement is not None:
+            branch.loss_refinement = dict(self.loss_refinement)
+        branch.model_arrays = self.model_arrays.copy()
+        branch.solver_model = None
+        branch.results = None
+        if changes is not None:
+            for name, change in changes.changed.items():
+                if name == 'model_arrays':
+                    branch.model_arrays = self.model_arrays.with_changes(change)
+                else:
+                    setattr(branch, name, model_arrays.patch(getattr(self, name), change))
+        return branch
+
+    def changes(self, base):
+        """The inputs of this market that are not shared with base, the market it was cloned from, see :meth:`clone`.
+
+        Only the groups set since cloning are included, and the solver model, results and cache are left out.
+
+        Parameters
+        ----------
+        base : Spot
+            The market this was cloned from.
+
+        Returns
+        -------
+        model_arrays.Changes
+        """
+        state = {name: value for name, value in vars(self).items()
+                 if name not in ['solver_model', 'results', 'cache', 'model_arrays']}
+        base_state = {name: value for name, value in vars(base).items()
+                      if name not in ['solver_model', 'results', 'cache', 'model_arrays']}
+        changes = model_arrays.diff(base_state, state)
+        changes.changed['model_arrays'] = self.model_arrays.changes(base.model_arrays)
+        return changes
+
+    def save_snapshot(self, path):
+        """Saves the fully assembled model to a binary file, from which it can be loaded and dispatched again.
+
+        The snapshot holds the decision variables, the lhs of every constraint as triplets, the rhs and type of the
+        constraints and the objective function, each group as numpy arrays of its columns in one .npz file, see
+        :func:`snapshot.save`. Any results of a previous dispatch are left out. Snapshots load in milliseconds, so a
+        slow interval can be dispatched again, or a set of intervals collected for benchmarking, without rebuilding
+        the inputs, see :meth:`load_snapshot`.
+
+        Examples
+        --------
+        >>> import os
+        >>> import tempfile
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+
+        >>> path = os.path.join(tempfile.mkdtemp(), 'interval.npz')
+        >>> simple_market.save_snapshot(path)
+
+        A new market can be dispatched from the snapshot.
+
+        >>> replay_market = markets.Spot()
+        >>> replay_market.load_snapshot(path)
+        >>> replay_market.dispatch()
+
+        >>> print(replay_market.get_unit_dispatch())
+          unit service  dispatch
+        0    A  energy      20.0
+        1    B  energy      40.0
+
+        Parameters
+        ----------
+        path : str
+            The file to write, with a '.npz' extension.
+
+        Returns
+        -------
+        None
+        """
+        decision_variables, constraints_lhs, objective_function_components, _ = self._assemble()
+        snapshot.save(path, {
+            'decision_variables': decision_variables,
+            'constraints_lhs': constraints_lhs,
+            'constraints_rhs_and_type': self.constraints_rhs_and_type,
+            'market_constraints_rhs_and_type': self.market_constraints_rhs_and_type,
+            'constraints_dynamic_rhs_and_type': self.constraints_dynamic_rhs_and_type,
+            'objective_function_components': objective_function_components,
+            'dispatch_interval': self.dispatch_interval,
+            'next_variable_id': self.next_variable_id,
+            'next_constraint_id': self.next_constraint_id})
+
+    def load_snapshot(self, path):
+        """Replaces the model of the market with one saved by :meth:`save_snapshot`, ready to dispatch.
+
+        The constraint lhs are loaded already assembled, so the unit and regional constraint maps are left empty,
+        and constraint violation variables, if the saved market had penalties set, are part of the loaded model.
+        Because the maps are gone, new constraints could not be mapped to the loaded variables, so inputs cannot be
+        set after loading, and each set method raises a ModelBuildError. To dispatch with different inputs, set them
+        on the market the snapshot was saved from and save it again.
+
+        Parameters
+        ----------
+        path : str
+            The file written by :meth:`save_snapshot`.
+
+        Returns
+        -------
+        None
+        """
+        inputs = snapshot.load(path)
+        self.decision_variables = inputs['decision_variables']
+        self.lhs_coefficients = inputs['constraints_lhs']
+        self.variable_to_constraint_map = {'regional': {}, 'unit_level': {}}
+        self.constraint_to_variable_map = {'regional': {}, 'unit_level': {}}
+        self.constraints_rhs_and_type = inputs['constraints_rhs_and_type']
+        self.market_constraints_rhs_and_type = inputs['market_constraints_rhs_and_type']
+        self.constraints_dynamic_rhs_and_type = inputs['constraints_dynamic_rhs_and_type']
+        self.objective_function_components = inputs['objective_function_components']
+        self.model_arrays = model_arrays.ModelArrays()
+        self.dispatch_interval = inputs['dispatch_interval']
+        self.next_variable_id = inputs['next_variable_id']
+        self.next_constraint_id = inputs['next_constraint_id']
+        self.loaded_from_snapshot = True
+        self.constraint_violation_penalties = None
+        self.interconnector_loss_inputs = None
+        self.loss_refinement = None
+        self.solver_model = None
+        self.results = None
+
+    def write_model(self, path, backend='cbc'):
+        """Writes the fully assembled model to a standard MPS or LP file, chosen by the extension of path.
+
+        The file is written by the solver of the backend, see :func:`solver_interface.write_model`, so the problem
+        can be studied with that solver, or others, away from nempy. Interconnector loss interpolation is written as
+        SOS2 constraints with the 'cbc' backend, and with binary variables with the 'highs' backend.
+
+        Parameters
+        ----------
+        path : str
+            The file to write, ending in '.mps' or '.lp'.
+        backend : str
+            The solver to write the file with, 'cbc' (the default) or 'highs'.
+
+        Returns
+        -------
+        None
+        """
+        decision_variables, constraints_lhs, objective_function_components, _ = self._assemble()
+        solver_interface.write_model(path, decision_variables, constraints_lhs, self.constraints_rhs_and_type,
+                                     self.market_constraints_rhs_and_type, self.constraints_dynamic_rhs_and_type,
+                                     objective_function_components, backend)
+
+    def get_pricing_statistics(self):
+        """Retrieves the details of each perturbation pricing re-solve from the last dispatch.
+
+        Re-solves are warm started from the base solution, from the previous basis if the problem is a linear program
+        ('lp_basis'), or from a MIP start if the problem has integer or SOS structure ('mip_start'). A market cleared by
+        merit order, see :meth:`dispatch`, is priced without re-solves, so its statistics have no rows.
+
+        Returns
+        -------
+        pd.DataFrame
+
+            =============  ==========================================================================================
+            Columns:       Description:
+            constraint_id  the id of the market constraint priced by the re-solve (as `np.int64`)
+            warm_start     how the re-solve was warm started, 'lp_basis' or 'mip_start' (as `str`)
+            status         the status of the re-solve, 'optimal', or 'feasible' if stopped by a limit (as `str`)
+            iterations     the simplex iterations used, only reported by the 'highs' backend, None with
+                           'cbc', as python-mip does not make CBC's iteration count available
+            seconds        the time taken by the re-solve (as `np.float64`)
+            =============  ==========================================================================================
+
+        Raises
+        ------
+            ModelBuildError
+                If the market has not been dispatched with perturbation pricing by the solver.
+        """
+        statistics = self.results.solve_statistics if self.results is not None else {}
+        if 'pricing' not in statistics:
+            raise check.ModelBuildError('The market has not been dispatched with perturbation pricing.')
+        return statistics['pricing']
+
+    def get_solve_status(self):
+        """Retrieves whether the last dispatch was solved to optimality, and if not how close to optimal it is.
+
+        A dispatch is only not solved to optimality if a time_limit or mip_gap was given to :meth:`dispatch`.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+        >>> simple_market.dispatch(time_limit=10.0)
+
+        >>> print(simple_market.get_solve_status())
+            status  gap
+        0  optimal  0.0
+
+        Returns
+        -------
+        pd.DataFrame
+
+            ===========  ====================================================================================
+            Columns:     Description:
+            status       'optimal', or 'feasible' if a limit stopped the solver first (as `str`)
+            gap          the relative gap between the solution and the best bound found (as `np.float64`)
+            ===========  ====================================================================================
+
+        Raises
+        ------
+            ModelBuildError
+                If the market has not been dispatched.
+        """
+        statistics = self.results.solve_statistics if self.results is not None else {}
+        if 'solve' not in statistics:
+            raise check.ModelBuildError('The market has not been dispatched.')
+        solve = statistics['solve']
+        return pd.DataFrame({'status': [solve['status']], 'gap': [solve['gap']]})
+
+    def get_timings(self):
+        """Retrieves the time spent in each phase of the last dispatch.
+
+        Timing must be turned on when the market is created, with markets.Spot(timing=True). The timings are cheap to
+        collect, so they can be left on and the results of each dispatch in a replay aggregated.
+        A market cleared by merit order, see :meth:`dispatch`, only has the phase 'merit_order'.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot(timing=True)
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+        >>> simple_market.dispatch(merit_order=False)
+
+        >>> print(simple_market.get_timings()['phase'])
+        0           lhs_assembly
+        1         problem_arrays
+        2      variable_creation
+        3    constraint_creation
+        4          initial_solve
+        5      result_extraction
+        6                pricing
+        Name: phase, dtype: object
+
+        Returns
+        -------
+        pd.DataFrame
+
+            ===========  ====================================================================================
+            Columns:     Description:
+            phase        the phase of dispatch, in the order they run (as `str`)
+            seconds      the time spent in the phase (as `np.float64`)
+            ===========  ====================================================================================
+
+        Raises
+        ------
+            ModelBuildError
+                If the market has not been dispatched with timing on.
+        """
+        statistics = self.results.solve_statistics if self.results is not None else {}
+        if 'timings' not in statistics:
+            raise check.ModelBuildError('The market has not been dispatched with timing on.')
+        timings = statistics['timings']
+        return pd.DataFrame({'phase': list(timings.keys()), 'seconds': list(timings.values())})
+
+    def get_presolve_report(self):
+        """Retrieves the number of constraints removed by presolve in the last dispatch.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> from nempy import markets
+
+        >>> simple_market = markets.Spot()
+        >>> simple_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        >>> simple_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0], '2': [20.0, 30.0]}))
+        >>> simple_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0], '2': [60.0, 130.0]}))
+
+        Unit A has both a capacity and a ramp up constraint, only the tighter ramp up constraint is needed.
+
+        >>> simple_market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A'], 'capacity': [40.0]}))
+        >>> simple_market.set_unit_ramp_up_constraints(pd.DataFrame({
+        ...     'unit': ['A'], 'initial_output': [20.0], 'ramp_up_rate': [120.0]}))
+        >>> simple_market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+
+        >>> simple_market.dispatch(presolve=True)
+
+        >>> print(simple_market.get_presolve_report())
+                                      step  constraints
+        0                           before            3
+        1        duplicate_rows_eliminated            1
+        2  single_variable_rows_eliminated            0
+        3                            after            2
+
+        >>> print(simple_market.get_energy_prices())
+          region  price
+        0    NSW  100.0
+
+        Returns
+        -------
+        pd.DataFrame
+
+            ===========  ====================================================================================
+            Columns:     Description:
+            step         'before' presolve, each type of row eliminated, and 'after' presolve (as `str`)
+            constraints  the number of constraints (as `np.int64`)
+            ===========  ====================================================================================
+
+        Raises
+        ------
+            ModelBuildError
+                If the market has not been dispatched with presolve.
+        """
+        statistics = self.results.solve_statistics if self.results is not None else {}
+        if 'presolve' not in statistics:
+            raise check.ModelBuildError('The market has not been dispatched with presolve.')
+        report = statistics['presolve']
+        return pd.DataFrame({
+            'step': ['before', 'duplicate_rows_eliminated', 'single_variable_rows_eliminated', 'after'],
+            'constraints': [report['rows_before'], report['duplicate_rows_eliminated'],
+                            report['single_variable_rows_eliminated'], report['rows_after']]})
 
     def get_unit_dispatch(self):
         """Retrieves the energy dispatch for each unit.
@@ -1764,11 +2937,10 @@ class Spot:
         Raises
         ------
             ModelBuildError
-                If a model build process is incomplete, i.e. there are energy bids but not energy demand set.
+                If a model build process is incomplete, i.e. there are energy bids but not energy demand set, or the
+                market has not been dispatched.
         """
-        dispatch = self.decision_variables['bids'].loc[:, ['unit', 'service', 'value']]
-        dispatch.columns = ['unit', 'service', 'dispatch']
-        return dispatch.groupby(['unit', 'service'], as_index=False).sum()
+        return self._last_results().get_unit_dispatch()
 
     def get_energy_prices(self):
         """Retrieves the energy price in each market region.
@@ -1850,10 +3022,10 @@ class Spot:
         Raises
         ------
             ModelBuildError
-                If a model build process is incomplete, i.e. there are energy bids but not energy demand set.
+                If a model build process is incomplete, i.e. there are energy bids but not energy demand set, or the
+                market has not been dispatched.
         """
-        prices = self.market_constraints_rhs_and_type['demand'].loc[:, ['region', 'price']]
-        return prices
+        return self._last_results().get_energy_prices()
 
     def get_fcas_prices(self):
         """Retrives the price associated with each set of FCAS requirement constraints.
@@ -1862,8 +3034,7 @@ class Spot:
         -------
         pd.DateFrame
         """
-        prices = self.market_constraints_rhs_and_type['fcas'].loc[:, ['set', 'price']]
-        return prices
+        return self._last_results().get_fcas_prices()
 
     def get_interconnector_flows(self):
         """Retrieves the  flows for each interconnector.
@@ -1958,13 +3129,60 @@ class Spot:
         Raises
         ------
             ModelBuildError
-                If a model build process is incomplete, i.e. there are energy bids but not energy demand set.
+                If a model build process is incomplete, i.e. there are energy bids but not energy demand set, or the
+                market has not been dispatched.
         """
-        flow = self.decision_variables['interconnectors'].loc[:, ['interconnector', 'value']]
-        flow.columns = ['interconnector', 'flow']
-        if 'interconnector_losses' in self.decision_variables:
-            losses = self.decision_variables['interconnector_losses'].loc[:, ['interconnector', 'value']]
-            losses.columns = ['interconnector', 'losses']
-            flow = pd.merge(flow, losses, 'left', on='interconnector')
-
-        return flow.reset_index(drop=True)
+        return self._last_results().get_interconnector_flows()
+
+
+def _energy_results(decision_variables, market_constraints_rhs_and_type):
+    # The energy prices and unit dispatch, in the form of get_energy_prices and get_unit_dispatch.
+    prices = market_constraints_rhs_and_type['demand'].loc[:, ['region', 'price']]
+    dispatch = decision_variables['bids'].loc[:, ['unit', 'service', 'value']]
+    dispatch.columns = ['unit', 'service', 'dispatch']
+    dispatch = dispatch.groupby(['unit', 'service'], as_index=False).sum()
+    return prices, dispatch
+
+
+def _apply_scenario(model_inputs, deltas):
+    decision_variables, constraints_lhs, constraints_rhs_and_type, market_constraints_rhs_and_type, \
+        constraints_dynamic_rhs_and_type, objective_function_components = model_inputs
+    # The market constraints are always copied, as dispatch adds prices to them.
+    market_constraints_rhs_and_type = {name: frame.copy() for name, frame in market_constraints_rhs_and_type.items()}
+    for delta, target, value in zip(deltas['delta'], deltas['target'], deltas['value']):
+        if delta == 'demand_offset':
+            demand = market_constraints_rhs_and_type['demand']
+            demand['rhs'] = np.where(demand['region'] == target, demand['rhs'] + value, demand['rhs'])
+        elif delta == 'outage':
+            bids = decision_variables['bids'].copy()
+            bids.loc[bids['unit'] == target, ['lower_bound', 'upper_bound']] = 0.0
+            decision_variables = dict(decision_variables, bids=bids)
+        elif delta == 'price_factor':
+            costs = objective_function_components['bids'].copy()
+            costs.loc[costs['unit'] == target, 'cost'] *= value
+            objective_function_components = dict(objective_function_components, bids=costs)
+        else:
+            raise ValueError('Scenario delta {} is not known.'.format(delta))
+    return decision_variables, constraints_lhs, constraints_rhs_and_type, market_constraints_rhs_and_type, \
+        constraints_dynamic_rhs_and_type, objective_function_components
+
+
+def _dispatch_scenario(model, model_inputs, deltas, price_method):
+    variables, market_constraints_rhs_and_type = solver_interface.dispatch(
+        *_apply_scenario(model_inputs, deltas), price_method=price_method, model=model, warm_start=True)
+    return _energy_results(variables, market_constraints_rhs_and_type)
+
+
+# The base model and solver model of a scenario worker process, set up once when the worker starts.
+_scenario_worker = {}
+
+
+def _start_scenario_worker(model_inputs, price_method, backend):
+    _scenario_worker['model'] = solver_interface.PersistentModel(backend)
+    _scenario_worker['inputs'] = model_inputs
+    _scenario_worker['price_method'] = price_method
+
+
+def _dispatch_scenario_in_worker(deltas):
+    return _dispatch_scenario(_scenario_worker['model'], _scenario_worker['inputs'], deltas,
+                              _scenario_worker['price_method'])
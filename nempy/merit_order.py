@@ -0,0 +1,107 @@
+import numpy as np
+
+
+def clear(band_regions, band_units, volumes, costs, unit_limits, demand):
+    """Dispatch bid bands against demand in each region by merit order, without a solver.
+
+    This gives the same answer as the linear program when the only constraints are an upper limit on the total
+    dispatch of each unit and an equality between supply and demand in each region. The bands of each unit are first
+    cut back, most expensive first, so the unit's total is within its limit. Then, in each region, the cheapest bands
+    are dispatched until demand is met. Where bands have the same cost the volume dispatched may be shared between
+    them differently to the linear program.
+
+    The price of each region is found as perturbation pricing would find it, as the cost of meeting one more MW of
+    demand, which is NaN if the bands in the region can not meet it.
+
+    Examples
+    --------
+    >>> import numpy as np
+
+    Two units in one region, each with two bands, unit A limited to 30 MW.
+
+    >>> band_regions = np.array([0, 0, 0, 0])
+    >>> band_units = np.array([0, 0, 1, 1])
+    >>> volumes = np.array([20.0, 20.0, 50.0, 30.0])
+    >>> costs = np.array([50.0, 60.0, 55.0, 100.0])
+    >>> unit_limits = np.array([30.0, np.inf])
+
+    >>> dispatch, prices = clear(band_regions, band_units, volumes, costs, unit_limits, demand=np.array([75.0]))
+
+    >>> dispatch
+    array([20.,  5., 50.,  0.])
+
+    >>> prices
+    array([60.])
+
+    Parameters
+    ----------
+    band_regions : np.ndarray of int
+        The position of the region of each band in demand.
+    band_units : np.ndarray of int
+        The position of the unit of each band in unit_limits.
+    volumes : np.ndarray of float
+        The volume of each band, in MW.
+    costs : np.ndarray of float
+        The cost of each band, in $/MW.
+    unit_limits : np.ndarray of float
+        The limit on the total dispatch of each unit, inf if the unit has no limit, in MW.
+    demand : np.ndarray of float
+        The demand in each region, in MW.
+
+    Returns
+    -------
+    dispatch : np.ndarray of float
+        The dispatch of each band, in MW.
+    prices : np.ndarray of float
+        The price of each region, in $/MW.
+
+    Raises
+    ------
+        ValueError
+            If demand can not be met in a region, or a unit has a negative limit.
+    """
+    band_regions = np.asarray(band_regions, dtype=np.int64)
+    band_units = np.asarray(band_units, dtype=np.int64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    costs = np.asarray(costs, dtype=np.float64)
+    unit_limits = np.asarray(unit_limits, dtype=np.float64)
+    demand = np.asarray(demand, dtype=np.float64)
+    if (unit_limits < 0.0).any():
+        raise ValueError('Linear program infeasible')
+
+    # 1. Cut back the bands of each unit, most expensive first, to the unit's limit.
+    order = np.lexsort((costs, band_units))
+    cumulative = _grouped_cumsum(band_units[order], volumes[order])
+    capped = np.minimum(cumulative, unit_limits[band_units[order]])
+    previous_capped = np.where(_same_as_previous(band_units[order]), np.append(0.0, capped[:-1]), 0.0)
+    available = np.empty(len(volumes))
+    available[order] = capped - previous_capped
+
+    # 2. Dispatch the cheapest bands in each region until demand is met.
+    order = np.lexsort((costs, band_regions))
+    start = np.empty(len(volumes))
+    start[order] = _grouped_cumsum(band_regions[order], available[order]) - available[order]
+    band_demand = demand[band_regions]
+    dispatch = np.clip(band_demand - start, 0.0, available)
+    supply = np.bincount(band_regions, available, minlength=len(demand))
+    if (supply < demand - 1e-9).any():
+        raise ValueError('Linear program infeasible')
+
+    # 3. Price each region by the cost of one more MW of demand.
+    extra = np.clip(band_demand + 1.0 - start, 0.0, available) - dispatch
+    prices = np.bincount(band_regions, costs * extra, minlength=len(demand)).astype(np.float64)
+    prices[supply < demand + 1.0 - 1e-9] = np.nan
+    return dispatch, prices
+
+
+def _same_as_previous(groups):
+    return np.append(False, groups[1:] == groups[:-1])[:len(groups)]
+
+
+def _grouped_cumsum(groups, values):
+    # Cumulative sums that restart at the start of each group, for values sorted by group.
+    cumulative = np.cumsum(values)
+    group_starts = np.flatnonzero(~_same_as_previous(groups))
+    group_sizes = np.diff(np.append(group_starts, len(values)))
+    offsets = np.repeat(cumulative[group_starts] - values[group_starts], group_sizes)
+    return cumulative - offsets
@@ -0,0 +1,512 @@
+import numpy as np
+import pandas as pd
+
+from nempy import helper_functions as hf
+
+# The columns constraints and variables are matched on at each level when the lhs is built from the maps.
+JOIN_COLUMNS = {'regional': ['region', 'service'], 'unit_level': ['unit', 'service']}
+# The columns encoded to integer codes, each with its own dictionary of codes.
+KEY_COLUMNS = ['unit', 'region', 'service']
+# The tables of maps, with the group, of constraints or variables, whose lhs joins are dropped when a map is set.
+MAP_TABLES = {'variable_maps': 'variable_group', 'constraint_maps': 'constraint_group'}
+VARIABLE_TYPES = np.array(['continuous', 'integer', 'binary'], dtype=object)
+CONSTRAINT_TYPES = np.array(['=', '<=', '>='], dtype=object)
+
+
+class ModelArrays:
+    """The linear program of a market held as typed numpy arrays, one block of arrays for each group.
+
+    Each DataFrame set is encoded into a variable table (id, bounds, type and the codes of its unit, region and
+    service), a cost table, a constraint table (id, type and rhs) and maps of variables and constraints to the codes of
+    their join columns. Units, regions and services each have their own dictionary of codes, see :class:`KeyCodes`,
+    shared by every block. The lhs of the mapped constraints is then found by matching codes, as COO triplets of
+    constraint id, variable id and coefficient, without any DataFrame merges, and the arrays the solver is built from
+    are joined from the blocks with numpy. Strings are only decoded again for results, see :meth:`group_sum`.
+
+    Setting a group again replaces its block, keeping its place in the order of the groups, as setting a key of a dict
+    does, so the variables stay in the same order as the decision variables of the market. A market keeps its inputs
+    as DataFrames and encodes them with :meth:`sync` when the problem is built, which only encodes the groups that have
+    changed since.
+
+    Examples
+    --------
+    >>> model = ModelArrays()
+
+    >>> model.set_variables('bids', pd.DataFrame({
+    ...   'variable_id': [0, 1],
+    ...   'lower_bound': [0.0, 0.0],
+    ...   'upper_bound': [20.0, 50.0],
+    ...   'type': ['continuous', 'continuous']}))
+
+    >>> model.set_variable_map('regional', 'bids', pd.DataFrame({
+    ...   'variable_id': [0, 1],
+    ...   'region': ['NSW', 'NSW'],
+    ...   'service': ['energy', 'energy'],
+    ...   'coefficient': [1.0, 1.0]}))
+
+    >>> model.set_costs('bids', pd.DataFrame({'variable_id': [0, 1], 'cost': [50.0, 100.0]}))
+
+    >>> model.set_constraints('market', 'demand', pd.DataFrame({
+    ...   'region': ['NSW'],
+    ...   'constraint_id': [0],
+    ...   'type': ['='],
+    ...   'rhs': [60.0]}))
+
+    >>> model.set_constraint_map('regional', 'demand', pd.DataFrame({
+    ...   'constraint_id': [0],
+    ...   'region': ['NSW'],
+    ...   'service': ['energy'],
+    ...   'coefficient': [1.0]}))
+
+    >>> print(model.lhs_frame())
+       constraint_id  variable_id  coefficient
+    0              0            0          1.0
+    1              0            1          1.0
+
+    >>> arrays = model.arrays()
+
+    >>> arrays['costs'], arrays['upper_bounds'], arrays['senses'], arrays['rhs']
+    (array([ 50., 100.]), array([20., 50.]), array(['='], dtype=object), array([60.]))
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.costs = {}
+        self.constraints = {}
+        self.variable_maps = {'regional': {}, 'unit_level': {}}
+        self.constraint_maps = {'regional': {}, 'unit_level': {}}
+        self.lhs_blocks = {}
+        self.key_codes = {column: KeyCodes() for column in KEY_COLUMNS}
+        self.lhs_joins = {}
+        self.sources = {}
+        self._lhs = None
+
+    def copy(self):
+        """A copy that shares the arrays of every block and the codes seen so far, so blocks can be set on the copy, and
+        new codes given, without changing this."""
+        model = ModelArrays()
+        model.variables = dict(self.variables)
+        model.costs = dict(self.costs)
+        model.constraints = dict(self.constraints)
+        model.variable_maps = {level: dict(maps) for level, maps in self.variable_maps.items()}
+        model.constraint_maps = {level: dict(maps) for level, maps in self.constraint_maps.items()}
+        model.lhs_blocks = dict(self.lhs_blocks)
+        model.key_codes = {column: codes.copy() for column, codes in self.key_codes.items()}
+        model.lhs_joins = dict(self.lhs_joins)
+        model.sources = dict(self.sources)
+        model._lhs = self._lhs
+        return model
+
+    def changes(self, base):
+        """The blocks, joins and codes of this that are not shared with base, which this was copied from, see
+        :func:`diff`. The cached lhs is left out, it is joined again from the blocks when needed."""
+        attributes = {name: value for name, value in vars(self).items() if name not in ['key_codes', '_lhs']}
+        base_attributes = {name: value for name, value in vars(base).items() if name not in ['key_codes', '_lhs']}
+        changes = diff(base_attributes, attributes)
+        key_codes = {column: codes.values for column, codes in self.key_codes.items()
+                     if codes.values is not base.key_codes[column].values}
+        if len(key_codes) > 0:
+            changes.changed['key_codes'] = key_codes
+        return changes
+
+    def with_changes(self, changes):
+        """A copy of this with changes, given by :meth:`changes` with this as the base, applied."""
+        model = self.copy()
+        key_codes = changes.changed.get('key_codes', {})
+        for name, change in changes.changed.items():
+            if name != 'key_codes':
+                setattr(model, name, patch(getattr(self, name), change))
+        for column, values in key_codes.items():
+            model.key_codes[column].values = values
+        model._lhs = None
+        return model
+
+    def set_variables(self, group, variables):
+        """Encode the variables of a group, a DataFrame with the columns variable_id, lower_bound, upper_bound, type
+        and any of unit, region and service."""
+        self._store('variables', group, variables)
+
+    def set_costs(self, group, costs):
+        """Encode the objective function costs of a group, a DataFrame with the columns variable_id and cost."""
+        self._store('costs', group, costs)
+
+    def set_constraints(self, kind, group, constraints):
+        """Encode the constraints of a group, a DataFrame with the columns constraint_id, type and either rhs or, for
+        the kind 'dynamic', rhs_variable_id. The kind is 'constraints', 'market' or 'dynamic'."""
+        self._store('constraints', (kind, group), constraints)
+
+    def set_variable_map(self, level, group, variable_map):
+        """Encode the map of a group of variables to the constraints at a level, 'regional' or 'unit_level', a
+        DataFrame with the columns variable_id, coefficient and the join columns of the level."""
+        self._store('variable_maps', (level, group), variable_map)
+
+    def set_constraint_map(self, level, group, constraint_map):
+        """Encode the map of a group of constraints to the variables at a level, 'regional' or 'unit_level', a
+        DataFrame with the columns constraint_id, coefficient and the join columns of the level."""
+        self._store('constraint_maps', (level, group), constraint_map)
+
+    def set_lhs(self, group, lhs):
+        """Encode lhs coefficients that are already complete, a DataFrame with the columns constraint_id, variable_id
+        and coefficient."""
+        self._store('lhs_blocks', group, lhs)
+
+    def remove(self, table, group):
+        """Remove a group, if it has been set, from one of the tables 'variables', 'costs', 'lhs_blocks', or, with the
+        group given as (kind, group), 'constraints', or, with the group given as (level, group), 'variable_maps' and
+        'constraint_maps'."""
+        if table in MAP_TABLES:
+            level, map_group = group
+            getattr(self, table)[level].pop(map_group, None)
+            self._drop_lhs_joins(level, **{MAP_TABLES[table]: map_group})
+        else:
+            getattr(self, table).pop(group, None)
+        self.sources.pop((table, group), None)
+        self._lhs = None
+
+    def sync(self, groups):
+        """Encode again the groups, a dict of DataFrames keyed by table and group as given by :func:`groups`, that
+        have changed since their blocks were encoded, and remove the blocks of groups no longer given.
+
+        A group has changed if it is not the DataFrame its block was encoded from, e.g. because it was set again, or
+        if its values no longer match the block, because the DataFrame was edited in place. So the blocks are always
+        encoded from the DataFrames as they are when the problem is built, and only the groups that changed are
+        encoded again.
+
+        Examples
+        --------
+        >>> model = ModelArrays()
+
+        >>> bids = pd.DataFrame({
+        ...   'variable_id': [0, 1],
+        ...   'lower_bound': [0.0, 0.0],
+        ...   'upper_bound': [20.0, 50.0],
+        ...   'type': ['continuous', 'continuous']})
+
+        >>> model.sync({('variables', 'bids'): bids})
+
+        >>> bids.loc[1, 'upper_bound'] = 30.0
+
+        >>> model.sync({('variables', 'bids'): bids})
+
+        >>> model.arrays()['upper_bounds']
+        array([20., 30.])
+        """
+        for (table, group), frame in groups.items():
+            if self.sources.get((table, group)) is not frame or not self._matches(table, group, frame):
+                self._store(table, group, frame)
+        for table, group in [key for key in self.sources if key not in groups]:
+            self.remove(table, group)
+        # Keep the blocks in the order of the groups, so the variables stay in the order of the decision variables.
+        for table in ['variables', 'costs', 'constraints', 'lhs_blocks']:
+            order = [group for group_table, group in groups if group_table == table]
+            if list(getattr(self, table)) != order:
+                setattr(self, table, {group: getattr(self, table)[group] for group in order})
+
+    def _store(self, table, group, frame):
+        # Encode a group, keeping the DataFrame it was encoded from so later changes to the group can be found.
+        block = self._encode(table, group, frame)
+        if table in MAP_TABLES:
+            level, map_group = group
+            getattr(self, table)[level][map_group] = block
+            self._drop_lhs_joins(level, **{MAP_TABLES[table]: map_group})
+        else:
+            getattr(self, table)[group] = block
+        self.sources[(table, group)] = frame
+        self._lhs = None
+
+    def _encode(self, table, group, frame):
+        if table == 'variables':
+            block = dict(variable_id=_ids(frame['variable_id']), lower_bound=_floats(frame['lower_bound']),
+                         upper_bound=_floats(frame['upper_bound']), type=_codes(frame['type'], VARIABLE_TYPES))
+            for column in KEY_COLUMNS:
+                if column in frame.columns:
+                    block[column] = self.key_codes[column].encode(frame[column])
+            return block
+        if table == 'costs':
+            return dict(variable_id=_ids(frame['variable_id']), cost=_floats(frame['cost']))
+        if table == 'constraints':
+            block = dict(constraint_id=_ids(frame['constraint_id']), type=_codes(frame['type'], CONSTRAINT_TYPES))
+            if group[0] == 'dynamic':
+                block['rhs_variable_id'] = _ids(frame['rhs_variable_id'])
+            else:
+                block['rhs'] = _floats(frame['rhs'])
+            return block
+        if table in MAP_TABLES:
+            id_column = 'constraint_id' if table == 'constraint_maps' else 'variable_id'
+            return {id_column: _ids(frame[id_column]), 'key': self._encode_keys(group[0], frame),
+                    'coefficient': _floats(frame['coefficient'])}
+        return dict(constraint_id=_ids(frame['constraint_id']), variable_id=_ids(frame['variable_id']),
+                    coefficient=_floats(frame['coefficient']))
+
+    def _matches(self, table, group, frame):
+        # Whether the block of a group is the same as encoding the DataFrame again would give.
+        if table in MAP_TABLES:
+            block = getattr(self, table)[group[0]][group[1]]
+        else:
+            block = getattr(self, table)[group]
+        encoded = self._encode(table, group, frame)
+        return list(block) == list(encoded) and all(
+            np.array_equal(block[name], values, equal_nan=values.dtype.kind == 'f') for name, values in encoded.items())
+
+    def _drop_lhs_joins(self, level, constraint_group=None, variable_group=None):
+        self.lhs_joins = {pair: lhs for pair, lhs in self.lhs_joins.items()
+                          if pair[0] != level or (pair[1] != constraint_group and pair[2] != variable_group)}
+        self._lhs = None
+
+    def _encode_keys(self, level, frame):
+        first, second = JOIN_COLUMNS[level]
+        return _combine(self.key_codes[first].encode(frame[first]), self.key_codes[second].encode(frame[second]))
+
+    def group_sum(self, group, columns, values, name):
+        """Sum values given for each variable of a group, in the order the group was set, by the key columns of the
+        variables, giving a DataFrame of the decoded key columns and the sums, sorted by the key columns, as
+        DataFrame.groupby would give.
+
+        Examples
+        --------
+        >>> model = ModelArrays()
+
+        >>> model.set_variables('bids', pd.DataFrame({
+        ...   'unit': ['B', 'B', 'A'],
+        ...   'service': ['energy', 'energy', 'energy'],
+        ...   'variable_id': [0, 1, 2],
+        ...   'lower_bound': [0.0, 0.0, 0.0],
+        ...   'upper_bound': [20.0, 50.0, 10.0],
+        ...   'type': ['continuous', 'continuous', 'continuous']}))
+
+        >>> print(model.group_sum('bids', ['unit', 'service'], np.array([20.0, 5.0, 10.0]), 'dispatch'))
+          unit service  dispatch
+        0    A  energy      10.0
+        1    B  energy      25.0
+        """
+        block = self.variables[group]
+        first, second = columns
+        keys, positions = np.unique(_combine(block[first], block[second]), return_inverse=True)
+        sums = np.bincount(positions, weights=values, minlength=len(keys))
+        result = pd.DataFrame({first: self.key_codes[first].decode(keys >> 32),
+                               second: self.key_codes[second].decode(keys & 0xFFFFFFFF), name: sums})
+        return result.sort_values(columns, kind='mergesort').reset_index(drop=True)
+
+    def lhs(self):
+        """The lhs of every constraint as COO triplets, a tuple of constraint id, variable id and coefficient arrays,
+        from the complete lhs blocks followed by the lhs of the mapped constraints of each level.
+
+        The lhs of the mapped constraints is joined separately for each pair of constraint group and variable group at
+        a level, and each join is kept in the attribute lhs_joins, keyed by (level, constraint group, variable group),
+        until the map of either group is set again. So after a change to one group, e.g. new demand constraints, only
+        the joins of that group are redone."""
+        if self._lhs is None:
+            blocks = list(self.lhs_blocks.values())
+            for level in ['regional', 'unit_level']:
+                for constraint_group, constraint_map in self.constraint_maps[level].items():
+                    for variable_group, variable_map in self.variable_maps[level].items():
+                        pair = (level, constraint_group, variable_group)
+                        if pair not in self.lhs_joins:
+                            self.lhs_joins[pair] = _join(constraint_map, variable_map)
+                        blocks.append(self.lhs_joins[pair])
+            lhs = _concatenate(blocks, dict(constraint_id=np.int64, variable_id=np.int64, coefficient=np.float64))
+            self._lhs = lhs['constraint_id'], lhs['variable_id'], lhs['coefficient']
+        return self._lhs
+
+    def lhs_frame(self):
+        """The lhs of every constraint, as a DataFrame with the columns constraint_id, variable_id and coefficient."""
+        constraint_ids, variable_ids, coefficients = self.lhs()
+        return pd.DataFrame({'constraint_id': constraint_ids, 'variable_id': variable_ids,
+                             'coefficient': coefficients})
+
+    def arrays(self):
+        """The arrays the problem is built from, the same as given by :func:`solver_interface.create_arrays` for the
+        DataFrames the blocks were encoded from."""
+        variables = _concatenate(self.variables.values(), dict(variable_id=np.int64, lower_bound=np.float64,
+                                                               upper_bound=np.float64, type=np.int8))
+        arrays = dict(variable_ids=variables['variable_id'], lower_bounds=variables['lower_bound'],
+                      upper_bounds=variables['upper_bound'], types=VARIABLE_TYPES[variables['type']],
+                      costs=np.zeros(len(variables['variable_id'])))
+        variable_index = hf.IdIndex(arrays['variable_ids'])
+        if len(self.costs) > 0:
+            costs = _concatenate(self.costs.values())
+            arrays['costs'][variable_index(costs['variable_id'])] = costs['cost']
+
+        fixed = [block for (kind, group), block in self.constraints.items() if kind != 'dynamic']
+        dynamic = [block for (kind, group), block in self.constraints.items() if kind == 'dynamic']
+        fixed = _concatenate(fixed, dict(constraint_id=np.int64, type=np.int8, rhs=np.float64))
+        dynamic = _concatenate(dynamic, dict(constraint_id=np.int64, type=np.int8, rhs_variable_id=np.int64))
+        constraint_ids = np.append(fixed['constraint_id'], dynamic['constraint_id'])
+        senses = np.append(fixed['type'], dynamic['type'])
+        rhs = np.append(fixed['rhs'], np.zeros(len(dynamic['constraint_id'])))
+
+        # Variables on the rhs of dynamic constraints are moved to the lhs.
+        lhs_constraint_ids, lhs_variable_ids, lhs_coefficients = self.lhs()
+        lhs_constraint_ids = np.append(lhs_constraint_ids, dynamic['constraint_id'])
+        lhs_variable_ids = np.append(lhs_variable_ids, dynamic['rhs_variable_id'])
+        lhs_coefficients = np.append(lhs_coefficients, -1.0 * np.ones(len(dynamic['constraint_id'])))
+        order = np.lexsort((lhs_variable_ids, lhs_constraint_ids))
+        arrays['constraint_ids'], arrays['row_starts'] = np.unique(lhs_constraint_ids[order], return_index=True)
+        arrays['lhs_variable_ids'] = lhs_variable_ids[order]
+        arrays['lhs_coefficients'] = lhs_coefficients[order]
+        rows = hf.IdIndex(constraint_ids)(arrays['constraint_ids'])
+        arrays['senses'] = CONSTRAINT_TYPES[senses[rows]]
+        arrays['rhs'] = rhs[rows]
+        return arrays
+
+
+class KeyCodes:
+    """A dictionary of the values of one key column, e.g. unit names, to integer codes, in the order first seen.
+
+    Examples
+    --------
+    >>> units = KeyCodes()
+
+    >>> units.encode(pd.Series(['B', 'A', 'B']))
+    array([0, 1, 0])
+
+    >>> units.encode(pd.Series(['C', 'A']))
+    array([2, 1])
+
+    >>> units.decode(np.array([1, 2]))
+    array(['A', 'C'], dtype=object)
+    """
+
+    def __init__(self):
+        self.values = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        """The codes of the values, with values not seen before given the next codes."""
+        values = pd.Index(np.asarray(values, dtype=object))
+        codes = self.values.get_indexer(values)
+        unseen = codes < 0
+        if unseen.any():
+            self.values = self.values.append(pd.Index(values[unseen].unique(), dtype=object))
+            codes[unseen] = self.values.get_indexer(values[unseen])
+        return codes.astype(np.int64)
+
+    def decode(self, codes):
+        """The values of the codes."""
+        return self.values.values[codes]
+
+    def copy(self):
+        """A copy that starts with the same codes, sharing them until a value not seen before is encoded."""
+        codes = KeyCodes()
+        codes.values = self.values
+        return codes
+
+
+class Changes:
+    """The entries of a dict that are not shared with the dict it was copied from, see :func:`diff`.
+
+    Attributes
+    ----------
+    order : list
+        Every key of the dict, in order.
+    changed : dict
+        The entries that are new, or were set again, with nested dicts given as Changes of their own.
+    """
+
+    def __init__(self, order, changed):
+        self.order = order
+        self.changed = changed
+
+
+def diff(base, branch):
+    """The changes to a dict, e.g. of the DataFrames or blocks of each group, since it was copied from base.
+
+    Entries are compared by identity, not value, so this is only the entries set again on the copy, and entries that
+    are shared are left out, down through nested dicts. Entries removed from the copy are left out of its order.
+
+    Examples
+    --------
+    >>> base = {'bids': np.array([1.0]), 'maps': {'regional': np.array([2.0]), 'unit_level': np.array([3.0])}}
+    >>> branch = {'bids': base['bids'], 'maps': dict(base['maps'], unit_level=np.array([4.0]))}
+
+    >>> changes = diff(base, branch)
+
+    >>> changes.changed['maps'].changed
+    {'unit_level': array([4.])}
+
+    >>> patch(base, changes)
+    {'bids': array([1.]), 'maps': {'regional': array([2.]), 'unit_level': array([4.])}}
+    """
+    changed = {}
+    for key, value in branch.items():
+        base_value = base.get(key)
+        if base_value is value:
+            continue
+        if isinstance(base_value, dict) and isinstance(value, dict):
+            changes = diff(base_value, value)
+            if len(changes.changed) > 0 or changes.order != list(base_value):
+                changed[key] = changes
+        else:
+            changed[key] = value
+    return Changes(list(branch), changed)
+
+
+def patch(base, changes):
+    """The dict given by applying changes, from :func:`diff`, to base, sharing the entries of base that are unchanged.
+    """
+    if not isinstance(changes, Changes):
+        return changes
+    return {key: patch(base.get(key), changes.changed[key]) if key in changes.changed else base[key]
+            for key in changes.order}
+
+
+def groups(decision_variables, objective_function, constraints_rhs_and_type, market_rhs_and_type,
+           constraints_dynamic_rhs_and_type, variable_to_constraint_map, constraint_to_variable_map, constraints_lhs):
+    """The DataFrame of each group of the inputs to a market, keyed by table and group, to encode with
+    :meth:`ModelArrays.sync`."""
+    groups = {}
+    groups.update({('variables', group): variables for group, variables in decision_variables.items()})
+    groups.update({('costs', group): costs for group, costs in objective_function.items()})
+    for kind, frames in [('constraints', constraints_rhs_and_type), ('market', market_rhs_and_type),
+                         ('dynamic', constraints_dynamic_rhs_and_type)]:
+        groups.update({('constraints', (kind, group)): constraints for group, constraints in frames.items()})
+    for table, maps in [('variable_maps', variable_to_constraint_map), ('constraint_maps', constraint_to_variable_map)]:
+        for level, level_maps in maps.items():
+            groups.update({(table, (level, group)): group_map for group, group_map in level_maps.items()})
+    if len(constraints_lhs.index) > 0:
+        groups[('lhs_blocks', 'lhs_coefficients')] = constraints_lhs
+    return groups
+
+
+def _ids(values):
+    # Copied, as are all values encoded, so the blocks do not change with the DataFrames they were encoded from.
+    return np.array(values, dtype=np.int64)
+
+
+def _floats(values):
+    return np.array(values, dtype=np.float64)
+
+
+def _codes(values, categories):
+    codes = pd.Index(categories).get_indexer(np.asarray(values, dtype=object))
+    if (codes < 0).any():
+        raise ValueError('Unknown values {}, should be one of {}.'.format(
+            sorted(set(np.asarray(values, dtype=object)[codes < 0])), list(categories)))
+    return codes.astype(np.int8)
+
+
+def _concatenate(blocks, dtypes=None):
+    # Join the arrays of blocks by name, only those named in dtypes if it is given, giving empty arrays of the given
+    # types if there are no blocks.
+    blocks = list(blocks)
+    if len(blocks) == 0:
+        return {name: np.array([], dtype=dtype) for name, dtype in dtypes.items()}
+    return {name: np.concatenate([block[name] for block in blocks]) for name in (dtypes or blocks[0])}
+
+
+def _combine(first, second):
+    # One integer key for each pair of codes.
+    return (first << 32) | second
+
+
+def _join(constraint_map, variable_map):
+    # Pair every constraint with every variable that has the same key, as an inner merge on the key would.
+    order = np.argsort(variable_map['key'], kind='stable')
+    sorted_keys = variable_map['key'][order]
+    starts = np.searchsorted(sorted_keys, constraint_map['key'], side='left')
+    counts = np.searchsorted(sorted_keys, constraint_map['key'], side='right') - starts
+    constraint_rows = np.repeat(np.arange(len(counts)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    variable_rows = order[np.repeat(starts, counts) + within]
+    return dict(constraint_id=constraint_map['constraint_id'][constraint_rows],
+                variable_id=variable_map['variable_id'][variable_rows],
+                coefficient=constraint_map['coefficient'][constraint_rows] * variable_map['coefficient'][variable_rows])
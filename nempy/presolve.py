@@ -0,0 +1,244 @@
+import numpy as np
+from nempy import helper_functions as hf
+
+
+def presolve(arrays, protected_constraint_ids):
+    """Shrink a problem, given in the form returned by :func:`solver_interface.create_arrays`, before it is solved.
+
+    Two reductions are made to constraints that are not protected:
+
+    1. Where several '<=' or '>=' constraints have exactly the same lhs, e.g. the capacity and ramp up constraints of
+       a unit, only the tightest is kept.
+    2. Constraints on a single continuous variable are folded into the bounds of that variable.
+
+    Market constraints should be protected, as their prices are read from them, along with constraints that have a
+    variable on the rhs.
+
+    Examples
+    --------
+    >>> import numpy as np
+
+    Two variables, a unit's two bid bands, with a capacity (id 0) and ramp up (id 1) constraint on their sum, a demand
+    constraint (id 2) and a capacity constraint on the second variable alone (id 3).
+
+    >>> arrays = dict(
+    ...   variable_ids=np.array([0, 1]),
+    ...   lower_bounds=np.array([0.0, 0.0]),
+    ...   upper_bounds=np.array([50.0, 50.0]),
+    ...   types=np.array(['continuous', 'continuous'], dtype=object),
+    ...   costs=np.array([10.0, 20.0]),
+    ...   constraint_ids=np.array([0, 1, 2, 3]),
+    ...   row_starts=np.array([0, 2, 4, 6]),
+    ...   lhs_variable_ids=np.array([0, 1, 0, 1, 0, 1, 1]),
+    ...   lhs_coefficients=np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0]),
+    ...   senses=np.array(['<=', '<=', '=', '<='], dtype=object),
+    ...   rhs=np.array([80.0, 60.0, 55.0, 30.0]))
+
+    >>> arrays, report = presolve(arrays, protected_constraint_ids=[2])
+
+    The ramp up constraint is tighter than the capacity constraint, so the capacity constraint is dropped, and the
+    constraint on the second variable becomes its upper bound.
+
+    >>> arrays['constraint_ids']
+    array([1, 2])
+
+    >>> arrays['upper_bounds']
+    array([50., 30.])
+
+    >>> report
+    {'rows_before': 4, 'duplicate_rows_eliminated': 1, 'single_variable_rows_eliminated': 1, 'rows_after': 2}
+
+    Parameters
+    ----------
+    arrays : dict of np.ndarray
+        The problem, see :func:`solver_interface.create_arrays`.
+    protected_constraint_ids : list-like of int
+        The constraints that must be kept.
+
+    Returns
+    -------
+    arrays : dict of np.ndarray
+        The reduced problem, in the same form.
+    report : dict
+        The number of constraints before presolve, eliminated by each reduction and left after presolve.
+    """
+    n_rows = len(arrays['constraint_ids'])
+    n_lhs = len(arrays['lhs_variable_ids'])
+    row_starts = arrays['row_starts']
+    row_ends = np.append(row_starts[1:], n_lhs).astype(np.int64)
+    row_lengths = row_ends - row_starts
+    senses = arrays['senses']
+    rhs = arrays['rhs']
+    candidates = ~np.isin(arrays['constraint_ids'], np.asarray(protected_constraint_ids, dtype=np.int64)) & \
+        np.isin(senses, ['<=', '>='])
+    keep = np.ones(n_rows, dtype=bool)
+
+    # 1. Keep only the tightest of constraints with the same lhs and direction.
+    lhs_variable_ids = arrays['lhs_variable_ids'].tolist()
+    lhs_coefficients = arrays['lhs_coefficients'].tolist()
+    tightest = {}
+    for row in np.flatnonzero(candidates & (row_lengths > 1)):
+        start, end = row_starts[row], row_ends[row]
+        signature = (senses[row], tuple(lhs_variable_ids[start:end]), tuple(lhs_coefficients[start:end]))
+        if signature not in tightest:
+            tightest[signature] = row
+            continue
+        best = tightest[signature]
+        if (senses[row] == '<=' and rhs[row] < rhs[best]) or (senses[row] == '>=' and rhs[row] > rhs[best]):
+            tightest[signature] = row
+            keep[best] = False
+        else:
+            keep[row] = False
+    duplicates = n_rows - keep.sum()
+
+    # 2. Fold constraints on a single continuous variable into the variable's bounds.
+    variable_index = hf.IdIndex(arrays['variable_ids'])
+    lower_bounds = arrays['lower_bounds'].copy()
+    upper_bounds = arrays['upper_bounds'].copy()
+    single = np.flatnonzero(candidates & keep & (row_lengths == 1))
+    positions = variable_index(arrays['lhs_variable_ids'][row_starts[single]])
+    coefficients = arrays['lhs_coefficients'][row_starts[single]]
+    foldable = (arrays['types'][positions] == 'continuous') & (coefficients != 0.0)
+    single, positions, coefficients = single[foldable], positions[foldable], coefficients[foldable]
+    bounds = rhs[single] / coefficients
+    # Dividing a '<=' constraint by a negative coefficient turns it into a lower bound, and a '>=' into an upper bound.
+    upper = (senses[single] == '<=') == (coefficients > 0.0)
+    np.minimum.at(upper_bounds, positions[upper], bounds[upper])
+    np.maximum.at(lower_bounds, positions[~upper], bounds[~upper])
+    keep[single] = False
+
+    kept_lhs = np.repeat(keep, row_lengths)
+    reduced = dict(arrays, lower_bounds=lower_bounds, upper_bounds=upper_bounds,
+                   constraint_ids=arrays['constraint_ids'][keep],
+                   row_starts=np.cumsum(np.append(0, row_lengths[keep]))[:-1].astype(np.int64),
+                   lhs_variable_ids=arrays['lhs_variable_ids'][kept_lhs],
+                   lhs_coefficients=arrays['lhs_coefficients'][kept_lhs],
+                   senses=senses[keep], rhs=rhs[keep])
+    report = {'rows_before': int(n_rows), 'duplicate_rows_eliminated': int(duplicates),
+              'single_variable_rows_eliminated': int(len(single)), 'rows_after': int(keep.sum())}
+    return reduced, report
+
+
+def aggregate_variables(arrays, protected_variable_ids=()):
+    """Merge continuous variables that are interchangeable into one aggregate variable each.
+
+    Variables are interchangeable if they have the same cost and appear in exactly the same constraints with the same
+    coefficients, e.g. the bid bands of units in the same region at the same price, when neither unit has a unit level
+    constraint. Any dispatch of the aggregate can be shared between its members without changing the objective value
+    or breaking a constraint, so the reduction is exact. Each aggregate takes the id of its first member, with the
+    sums of its members' bounds, and the values of the members are found after the solve with
+    :func:`split_aggregate_values`.
+
+    Examples
+    --------
+    >>> import numpy as np
+
+    Three bid bands in one region, the first two at the same price, and a demand constraint (id 0).
+
+    >>> arrays = dict(
+    ...   variable_ids=np.array([0, 1, 2]),
+    ...   lower_bounds=np.array([0.0, 0.0, 0.0]),
+    ...   upper_bounds=np.array([20.0, 60.0, 50.0]),
+    ...   types=np.array(['continuous', 'continuous', 'continuous'], dtype=object),
+    ...   costs=np.array([10.0, 10.0, 20.0]),
+    ...   constraint_ids=np.array([0]),
+    ...   row_starts=np.array([0]),
+    ...   lhs_variable_ids=np.array([0, 1, 2]),
+    ...   lhs_coefficients=np.array([1.0, 1.0, 1.0]),
+    ...   senses=np.array(['='], dtype=object),
+    ...   rhs=np.array([100.0]))
+
+    >>> reduced, aggregation = aggregate_variables(arrays)
+
+    >>> reduced['variable_ids'], reduced['upper_bounds']
+    (array([0, 2]), array([80., 50.]))
+
+    >>> reduced['lhs_variable_ids']
+    array([0, 2])
+
+    If the aggregate is dispatched to 40.0, it is shared between its members in proportion to their bounds.
+
+    >>> split_aggregate_values(np.array([40.0, 40.0, 50.0]), aggregation)
+    array([10., 30., 50.])
+
+    Parameters
+    ----------
+    arrays : dict of np.ndarray
+        The problem, see :func:`solver_interface.create_arrays`.
+    protected_variable_ids : list-like of int
+        Variables that must not be merged, e.g. the weights of special ordered sets.
+
+    Returns
+    -------
+    arrays : dict of np.ndarray
+        The reduced problem, in the same form.
+    aggregation : dict of np.ndarray
+        With the keys aggregate_of, the position in the reduced variables of the aggregate each variable is part of,
+        and lower_bounds and upper_bounds, the bounds of the original variables.
+    """
+    n_variables = len(arrays['variable_ids'])
+    variable_index = hf.IdIndex(arrays['variable_ids'])
+    lhs_positions = variable_index(arrays['lhs_variable_ids'])
+    rows = np.repeat(np.arange(len(arrays['constraint_ids'])),
+                     np.diff(np.append(arrays['row_starts'], len(lhs_positions))).astype(np.int64))
+
+    # Build the column of each variable, the constraints it is in and its coefficients, as a hashable signature.
+    order = np.lexsort((rows, lhs_positions))
+    column_starts = np.searchsorted(lhs_positions[order], np.arange(n_variables + 1))
+    column_rows = rows[order].tolist()
+    column_coefficients = arrays['lhs_coefficients'][order].tolist()
+    candidates = (arrays['types'] == 'continuous') & np.isfinite(arrays['lower_bounds']) & \
+        np.isfinite(arrays['upper_bounds']) & \
+        ~np.isin(arrays['variable_ids'], np.asarray(protected_variable_ids, dtype=np.int64))
+    costs = arrays['costs'].tolist()
+
+    aggregate_of = np.empty(n_variables, dtype=np.int64)
+    first_members = []
+    signatures = {}
+    for position in range(n_variables):
+        signature = None
+        if candidates[position]:
+            start, end = column_starts[position], column_starts[position + 1]
+            signature = (costs[position], tuple(column_rows[start:end]), tuple(column_coefficients[start:end]))
+        if signature is not None and signature in signatures:
+            aggregate_of[position] = signatures[signature]
+        else:
+            aggregate_of[position] = len(first_members)
+            first_members.append(position)
+            if signature is not None:
+                signatures[signature] = aggregate_of[position]
+    first_members = np.array(first_members, dtype=np.int64)
+
+    is_first_member = np.zeros(n_variables, dtype=bool)
+    is_first_member[first_members] = True
+    kept_lhs = is_first_member[lhs_positions]
+    reduced = dict(arrays, variable_ids=arrays['variable_ids'][first_members],
+                   lower_bounds=np.bincount(aggregate_of, arrays['lower_bounds'], len(first_members)),
+                   upper_bounds=np.bincount(aggregate_of, arrays['upper_bounds'], len(first_members)),
+                   types=arrays['types'][first_members], costs=arrays['costs'][first_members],
+                   row_starts=np.cumsum(np.append(0, np.bincount(rows[kept_lhs], minlength=len(
+                       arrays['constraint_ids']))))[:-1].astype(np.int64),
+                   lhs_variable_ids=arrays['lhs_variable_ids'][kept_lhs],
+                   lhs_coefficients=arrays['lhs_coefficients'][kept_lhs])
+    aggregation = dict(aggregate_of=aggregate_of, lower_bounds=arrays['lower_bounds'],
+                       upper_bounds=arrays['upper_bounds'])
+    return reduced, aggregation
+
+
+def split_aggregate_values(values, aggregation):
+    """Share the value of each aggregate between its members, in proportion to the range between their bounds.
+
+    values holds, for each original variable, the value of the aggregate it is part of, see
+    :func:`aggregate_variables`. Each member gets its lower bound plus a share of what the aggregate is above the sum
+    of its members' lower bounds. Variables with an infinite bound are never merged, so they keep their own value.
+    """
+    aggregate_of = aggregation['aggregate_of']
+    lower_bounds = aggregation['lower_bounds']
+    upper_bounds = aggregation['upper_bounds']
+    merged = np.isfinite(lower_bounds) & np.isfinite(upper_bounds)
+    lower_bounds = np.where(merged, lower_bounds, 0.0)
+    ranges = np.where(merged, upper_bounds - lower_bounds, 0.0)
+    aggregate_lower_bounds = np.bincount(aggregate_of, lower_bounds)[aggregate_of]
+    aggregate_ranges = np.bincount(aggregate_of, ranges)[aggregate_of]
+    shares = np.divide(ranges, aggregate_ranges, out=np.zeros(len(ranges)), where=aggregate_ranges > 0.0)
+    return np.where(merged, lower_bounds + (values - aggregate_lower_bounds) * shares, values)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+
+def save(path, inputs):
+    """Save DataFrames, dicts of DataFrames and plain values to a numpy .npz file, one array per column.
+
+    Columns of strings are stored as fixed width unicode arrays, so the file can be loaded without pickle, which keeps
+    loading fast and safe. The order of the inputs, groups and columns is kept.
+
+    Examples
+    --------
+    >>> import os
+    >>> import tempfile
+
+    >>> inputs = {
+    ...   'decision_variables': {'bids': pd.DataFrame({'unit': ['A', 'B'], 'variable_id': [0, 1]})},
+    ...   'constraints_lhs': pd.DataFrame({'constraint_id': [0, 0], 'variable_id': [0, 1], 'coefficient': [1.0, 1.0]}),
+    ...   'next_variable_id': 2}
+
+    >>> path = os.path.join(tempfile.mkdtemp(), 'interval.npz')
+
+    >>> save(path, inputs)
+
+    >>> loaded = load(path)
+
+    >>> print(loaded['decision_variables']['bids'])
+      unit  variable_id
+    0    A            0
+    1    B            1
+
+    >>> loaded['next_variable_id']
+    2
+
+    Parameters
+    ----------
+    path : str
+        The file to write, a '.npz' extension is added by numpy if it is missing.
+    inputs : dict
+        The items to save, by name, each a pd.DataFrame, a dict of pd.DataFrame or a value numpy can store as an array.
+
+    Returns
+    -------
+    None
+    """
+    manifest = []
+    arrays = {}
+
+    def add(kind, name, group, column, values):
+        arrays['a{}'.format(len(manifest))] = values
+        manifest.append((kind, name, group, column))
+
+    for name, value in inputs.items():
+        if isinstance(value, pd.DataFrame):
+            _add_frame(add, 'frame', name, '', value)
+        elif isinstance(value, dict):
+            if len(value) == 0:
+                add('frames', name, '', '', np.array([]))
+            for group, frame in value.items():
+                _add_frame(add, 'frames', name, group, frame)
+        else:
+            add('value', name, '', '', np.asarray(value))
+    np.savez(path, manifest=np.array(manifest, dtype=str).reshape(-1, 4), **arrays)
+
+
+def _add_frame(add, kind, name, group, frame):
+    if len(frame.columns) == 0:
+        add(kind, name, group, '', np.array([]))
+    for column in frame.columns:
+        values = frame[column].values
+        if values.dtype == object:
+            values = values.astype(str)
+        add(kind, name, group, column, values)
+
+
+def load(path):
+    """Load the inputs saved to a file by :func:`save`, with strings restored to object columns as pandas uses."""
+    inputs = {}
+    with np.load(path, allow_pickle=False) as data:
+        for i, (kind, name, group, column) in enumerate(data['manifest']):
+            values = data['a{}'.format(i)]
+            if kind == 'value':
+                inputs[name] = values.item()
+                continue
+            columns = inputs.setdefault(name, {}) if kind == 'frames' else inputs.setdefault(name, {'': {}})
+            if kind == 'frames' and group == '':
+                continue
+            columns = columns.setdefault(group, {})
+            if column != '':
+                columns[column] = values.astype(object) if values.dtype.kind == 'U' else values
+    for name, value in inputs.items():
+        if isinstance(value, dict):
+            frames = {group: pd.DataFrame(columns) for group, columns in value.items()}
+            inputs[name] = frames[''] if '' in frames else frames
+    return inputs
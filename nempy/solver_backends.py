@@ -0,0 +1,481 @@
+import gzip
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+from mip import Model, xsum, INTEGER, CONTINUOUS, OptimizationStatus, BINARY, CBC
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+def create(backend_name):
+    """Create a new, empty, solver backend by name.
+
+    Examples
+    --------
+    >>> backend = create('cbc')
+
+    >>> backend.add_variables(lower_bounds=[0.0, 0.0], upper_bounds=[10.0, 10.0], types=['continuous', 'continuous'],
+    ...                       costs=[1.0, 2.0])
+    array([0, 1])
+
+    >>> backend.add_constraints(row_starts=[0], variable_positions=[0, 1], coefficients=[1.0, 1.0], senses=['='],
+    ...                         rhs=[12.0])
+    array([0])
+
+    >>> backend.solve()
+    'optimal'
+
+    >>> backend.primal_values()
+    array([10.,  2.])
+
+    Parameters
+    ----------
+    backend_name : str
+        One of the keys of BACKENDS, 'cbc' or 'highs'.
+
+    Returns
+    -------
+    SolverBackend
+
+    Raises
+    ------
+        ValueError
+            If the backend name is not known.
+    """
+    if backend_name not in BACKENDS:
+        raise ValueError("backend should be one of {}, not '{}'.".format(sorted(BACKENDS.keys()), backend_name))
+    return BACKENDS[backend_name]()
+
+
+class SolverBackend(ABC):
+    """The interface through which the solver_interface builds, solves and reads back a problem.
+
+    Variables and constraints are referred to by their position in the problem, starting at zero, in the order they
+    were added. Removing variables or constraints shifts the positions of those after them down, as in a list. Variable
+    types are given as 'continuous', 'integer' or 'binary', and constraint senses as '<=', '>=' or '='. Solve statuses
+    are returned as 'optimal', 'feasible' if a limit stopped the solve after a feasible solution was found,
+    'infeasible' or the solver's own description of other outcomes.
+
+    Every method without a default must be given by a backend, a backend missing one can not be created.
+    """
+
+    name = None
+    # Whether the solver handles SOS2 constraints itself, if not add_sos2 formulates them with binary variables.
+    supports_sos = False
+
+    @abstractmethod
+    def add_variables(self, lower_bounds, upper_bounds, types, costs):
+        """Add variables, returning their positions."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_constraints(self, row_starts, variable_positions, coefficients, senses, rhs):
+        """Add constraints given in compressed sparse row form, returning their positions.
+
+        The lhs of constraint i has the variables variable_positions[row_starts[i]:row_starts[i + 1]], with the
+        matching coefficients.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_sos2(self, variable_positions, weights):
+        """Add a SOS2 constraint over the variables, ordered by weights."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_variable_bounds(self, positions, lower_bounds, upper_bounds):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_variable_types(self, positions, types):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_costs(self, positions, costs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_rhs(self, positions, rhs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_variables(self, positions):
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_constraints(self, positions):
+        raise NotImplementedError
+
+    @abstractmethod
+    def variable_bounds(self):
+        """The lower and upper bounds of every variable, as two arrays."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def variable_types(self):
+        """The type of every variable, as an array."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_start(self, values):
+        """Give the solver a starting solution, one value for every variable, for the next MIP solve."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_limits(self, time_limit=None, mip_gap=None, threads=None):
+        """Limit every following solve to time_limit seconds and stop MIP solves once the relative gap between the
+        best solution and the best bound is within mip_gap, using up to threads threads. None leaves the solver's
+        default in place."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def solve(self, relax=False):
+        """Solve the problem, ignoring integer and SOS constraints if relax is True, and return the status."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def objective_value(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def primal_values(self):
+        """The value of every variable in the last solution, as an array."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def duals(self):
+        """The shadow price of every constraint in the last solution, as an array, only available after a relaxed
+        solve."""
+        raise NotImplementedError
+
+    def iterations(self):
+        """The simplex iterations used by the last solve, or None if the solver does not report them."""
+        return None
+
+    def gap(self):
+        """The relative gap between the last solution and the best bound found, 0.0 for a relaxed solve, or None if
+        the solver does not report it."""
+        return None
+
+    @abstractmethod
+    def write(self, path):
+        """Write the problem to a file, in MPS format if path ends in '.mps' or LP format if it ends in '.lp'."""
+        raise NotImplementedError
+
+
+class MipBackend(SolverBackend):
+    """A CBC backend through python-mip."""
+
+    name = 'cbc'
+    supports_sos = True
+
+    def __init__(self):
+        self.prob = Model("market", solver_name=CBC)
+        self.prob.verbose = 0
+        self.next_name = 0
+        self.time_limit = None
+        self.relaxed = False
+
+    def add_variables(self, lower_bounds, upper_bounds, types, costs):
+        first = self.prob.num_cols
+        variable_types = {'continuous': CONTINUOUS, 'integer': INTEGER, 'binary': BINARY}
+        for lower_bound, upper_bound, variable_type, cost in zip(lower_bounds, upper_bounds, types, costs):
+            # Names are never reused, as CBC matches MIP start values to variables by name.
+            self.next_name += 1
+            self.prob.add_var(lb=lower_bound, ub=upper_bound, var_type=variable_types[variable_type], obj=cost,
+                              name='x{}'.format(self.next_name))
+        return np.arange(first, self.prob.num_cols)
+
+    def add_constraints(self, row_starts, variable_positions, coefficients, senses, rhs):
+        first = self.prob.num_rows
+        row_ends = np.append(row_starts[1:], len(variable_positions)).astype(np.int64)
+        variables = self.prob.vars
+        for start, end, sense, row_rhs in zip(row_starts, row_ends, senses, rhs):
+            exp = xsum(coefficient * variables[position] for position, coefficient in
+                       zip(variable_positions[start:end], coefficients[start:end]))
+            if sense == '<=':
+                self.prob.add_constr(exp <= row_rhs)
+            elif sense == '>=':
+                self.prob.add_constr(exp >= row_rhs)
+            else:
+                self.prob.add_constr(exp == row_rhs)
+        return np.arange(first, self.prob.num_rows)
+
+    def add_sos2(self, variable_positions, weights):
+        self.prob.add_sos([(self.prob.vars[position], weight) for position, weight in
+                           zip(variable_positions, weights)], 2)
+
+    def set_variable_bounds(self, positions, lower_bounds, upper_bounds):
+        for position, lower_bound, upper_bound in zip(positions, lower_bounds, upper_bounds):
+            var = self.prob.vars[position]
+            var.lb, var.ub = lower_bound, upper_bound
+
+    def set_variable_types(self, positions, types):
+        variable_types = {'continuous': CONTINUOUS, 'integer': INTEGER, 'binary': BINARY}
+        for position, variable_type in zip(positions, types):
+            self.prob.vars[position].var_type = variable_types[variable_type]
+
+    def set_costs(self, positions, costs):
+        for position, cost in zip(positions, costs):
+            self.prob.vars[position].obj = cost
+
+    def set_rhs(self, positions, rhs):
+        for position, row_rhs in zip(positions, rhs):
+            self.prob.constrs[position].rhs = row_rhs
+
+    def remove_variables(self, positions):
+        variables = [self.prob.vars[position] for position in positions]
+        if self.prob.start:
+            # CBC holds on to the last MIP start, so drop the variables that are about to be removed from it.
+            removed = set(variables)
+            self.prob.start = [(var, value) for var, value in self.prob.start if var not in removed]
+        self.prob.remove(variables)
+
+    def remove_constraints(self, positions):
+        self.prob.remove([self.prob.constrs[position] for position in positions])
+
+    def variable_bounds(self):
+        return (np.array([var.lb for var in self.prob.vars]), np.array([var.ub for var in self.prob.vars]))
+
+    def variable_types(self):
+        variable_types = {CONTINUOUS: 'continuous', INTEGER: 'integer', BINARY: 'binary'}
+        return np.array([variable_types[var.var_type] for var in self.prob.vars])
+
+    def set_start(self, values):
+        self.prob.start = list(zip(self.prob.vars, values))
+
+    def set_limits(self, time_limit=None, mip_gap=None, threads=None):
+        self.time_limit = time_limit
+        if mip_gap is not None:
+            self.prob.max_mip_gap = mip_gap
+        if threads is not None:
+            self.prob.threads = threads
+
+    def solve(self, relax=False):
+        self.relaxed = relax
+        if self.time_limit is None:
+            status = self.prob.optimize(relax=relax)
+        else:
+            status = self.prob.optimize(relax=relax, max_seconds=self.time_limit)
+        if status == OptimizationStatus.OPTIMAL:
+            return 'optimal'
+        elif status == OptimizationStatus.FEASIBLE:
+            return 'feasible'
+        elif status == OptimizationStatus.INFEASIBLE:
+            return 'infeasible'
+        return status.name.lower()
+
+    def iterations(self):
+        """Always None, python-mip does not make CBC's iteration count available, and CBC's own count is not kept
+        for the relaxed solves used to price linear programs."""
+        return None
+
+    def gap(self):
+        if self.relaxed:
+            return 0.0
+        return max(self.prob.gap, 0.0)
+
+    def write(self, path):
+        if not path.lower().endswith('.mps'):
+            self.prob.write(path)
+            return
+        # CBC adds '.mps' to the name it is given and compresses the file, so write to a temporary name and unpack.
+        with tempfile.TemporaryDirectory() as directory:
+            self.prob.write(os.path.join(directory, 'model.mps'))
+            written = [os.path.join(directory, name) for name in os.listdir(directory)][0]
+            opener = gzip.open if written.endswith('.gz') else open
+            with opener(written, 'rb') as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+    def objective_value(self):
+        return self.prob.objective_value
+
+    def primal_values(self):
+        return np.array([var.x for var in self.prob.vars], dtype=np.float64)
+
+    def duals(self):
+        return np.array([constr.pi for constr in self.prob.constrs], dtype=np.float64)
+
+
+class HighsBackend(SolverBackend):
+    """A HiGHS backend through highspy.
+
+    HiGHS does not support SOS constraints, so SOS2 sets are formulated with binary variables, see
+    :func:`add_sos2_with_binaries`.
+    """
+
+    name = 'highs'
+    supports_sos = False
+
+    def __init__(self):
+        if highspy is None:
+            raise ImportError("The 'highs' backend requires the highspy package.")
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', False)
+        self.senses = np.array([], dtype=object)
+        self.types = np.array([], dtype=object)
+        self.relaxed = False
+
+    def add_variables(self, lower_bounds, upper_bounds, types, costs):
+        first = self.highs.getNumCol()
+        n = len(lower_bounds)
+        if n == 0:
+            return np.arange(first, first)
+        self.highs.addCols(n, np.asarray(costs, dtype=np.float64), np.asarray(lower_bounds, dtype=np.float64),
+                           np.asarray(upper_bounds, dtype=np.float64), 0, np.array([], dtype=np.int32),
+                           np.array([], dtype=np.int32), np.array([], dtype=np.float64))
+        positions = np.arange(first, first + n)
+        self.types = np.append(self.types, np.asarray(types, dtype=object))
+        self._set_integrality(positions, types)
+        return positions
+
+    def add_constraints(self, row_starts, variable_positions, coefficients, senses, rhs):
+        first = self.highs.getNumRow()
+        n = len(senses)
+        if n == 0:
+            return np.arange(first, first)
+        lower, upper = self._row_bounds(senses, rhs)
+        self.highs.addRows(n, lower, upper, len(variable_positions), np.asarray(row_starts, dtype=np.int32),
+                           np.asarray(variable_positions, dtype=np.int32),
+                           np.asarray(coefficients, dtype=np.float64))
+        self.senses = np.append(self.senses, np.asarray(senses, dtype=object))
+        return np.arange(first, first + n)
+
+    def add_sos2(self, variable_positions, weights):
+        add_sos2_with_binaries(self, [position for weight, position in sorted(zip(weights, variable_positions))])
+
+    def set_variable_bounds(self, positions, lower_bounds, upper_bounds):
+        if len(positions) > 0:
+            self.highs.changeColsBounds(len(positions), np.asarray(positions, dtype=np.int32),
+                                        np.asarray(lower_bounds, dtype=np.float64),
+                                        np.asarray(upper_bounds, dtype=np.float64))
+
+    def set_variable_types(self, positions, types):
+        self.types[np.asarray(positions, dtype=np.int64)] = types
+        self._set_integrality(positions, types)
+
+    def set_costs(self, positions, costs):
+        if len(positions) > 0:
+            self.highs.changeColsCost(len(positions), np.asarray(positions, dtype=np.int32),
+                                      np.asarray(costs, dtype=np.float64))
+
+    def set_rhs(self, positions, rhs):
+        if len(positions) > 0:
+            lower, upper = self._row_bounds(self.senses[np.asarray(positions, dtype=np.int64)], rhs)
+            self.highs.changeRowsBounds(len(positions), np.asarray(positions, dtype=np.int32), lower, upper)
+
+    def remove_variables(self, positions):
+        if len(positions) > 0:
+            self.highs.deleteCols(len(positions), np.asarray(positions, dtype=np.int32))
+            self.types = np.delete(self.types, positions)
+
+    def remove_constraints(self, positions):
+        if len(positions) > 0:
+            self.highs.deleteRows(len(positions), np.asarray(positions, dtype=np.int32))
+            self.senses = np.delete(self.senses, positions)
+
+    def variable_bounds(self):
+        lp = self.highs.getLp()
+        return np.array(lp.col_lower_), np.array(lp.col_upper_)
+
+    def variable_types(self):
+        return self.types.copy()
+
+    def set_start(self, values):
+        solution = highspy.HighsSolution()
+        solution.col_value = list(values)
+        self.highs.setSolution(solution)
+
+    def set_limits(self, time_limit=None, mip_gap=None, threads=None):
+        if time_limit is not None:
+            self.highs.setOptionValue('time_limit', float(time_limit))
+        if mip_gap is not None:
+            self.highs.setOptionValue('mip_rel_gap', float(mip_gap))
+        if threads is not None:
+            self.highs.setOptionValue('threads', int(threads))
+
+    def solve(self, relax=False):
+        self.relaxed = relax
+        self.highs.setOptionValue('solve_relaxation', relax)
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        if status == highspy.HighsModelStatus.kOptimal:
+            return 'optimal'
+        elif status == highspy.HighsModelStatus.kInfeasible:
+            return 'infeasible'
+        elif self.highs.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+            return 'feasible'
+        return self.highs.modelStatusToString(status).lower()
+
+    def objective_value(self):
+        return self.highs.getInfo().objective_function_value
+
+    def primal_values(self):
+        return np.array(self.highs.getSolution().col_value)
+
+    def duals(self):
+        return np.array(self.highs.getSolution().row_dual)
+
+    def iterations(self):
+        iterations = self.highs.getInfo().simplex_iteration_count
+        return iterations if iterations >= 0 else None
+
+    def gap(self):
+        if self.relaxed or not np.isin(self.types, ['integer', 'binary']).any():
+            return 0.0
+        return self.highs.getInfo().mip_gap
+
+    def write(self, path):
+        self.highs.writeModel(path)
+
+    def _set_integrality(self, positions, types):
+        integer = np.isin(np.asarray(types, dtype=object), ['integer', 'binary'])
+        if integer.any():
+            self.highs.changeColsIntegrality(int(integer.sum()), np.asarray(positions, dtype=np.int32)[integer],
+                                             np.full(int(integer.sum()), highspy.HighsVarType.kInteger))
+        if (~integer).any():
+            self.highs.changeColsIntegrality(int((~integer).sum()), np.asarray(positions, dtype=np.int32)[~integer],
+                                             np.full(int((~integer).sum()), highspy.HighsVarType.kContinuous))
+
+    @staticmethod
+    def _row_bounds(senses, rhs):
+        senses = np.asarray(senses, dtype=object)
+        rhs = np.asarray(rhs, dtype=np.float64)
+        lower = np.where(senses == '<=', -highspy.kHighsInf, rhs)
+        upper = np.where(senses == '>=', highspy.kHighsInf, rhs)
+        return lower, upper
+
+
+def add_sos2_with_binaries(backend, weight_positions):
+    """Formulate a SOS2 constraint over the ordered weights with one binary variable per segment between weights.
+
+    Exactly one segment is selected, and only the weights at either end of the selected segment can be non zero:
+
+        segment 1 + segment 2 + . . . + segment n-1 = 1
+
+        weight 1 <= segment 1
+        weight i <= segment i-1 + segment i
+        weight n <= segment n-1
+    """
+    n = len(weight_positions)
+    if n < 3:
+        return
+    segments = backend.add_variables([0.0] * (n - 1), [1.0] * (n - 1), ['binary'] * (n - 1), [0.0] * (n - 1))
+    variable_positions = list(segments)
+    coefficients = [1.0] * (n - 1)
+    row_starts = [0]
+    for i, weight in enumerate(weight_positions):
+        row_starts.append(len(variable_positions))
+        adjacent_segments = [segments[j] for j in (i - 1, i) if 0 <= j < n - 1]
+        variable_positions += [weight] + adjacent_segments
+        coefficients += [1.0] + [-1.0] * len(adjacent_segments)
+    backend.add_constraints(row_starts, variable_positions, coefficients, ['='] + ['<='] * n, [1.0] + [0.0] * n)
+
+
+BACKENDS = {'cbc': MipBackend, 'highs': HighsBackend}
@@ -1,15 +1,18 @@
 import numpy as np
 import pandas as pd
-from mip import Model, xsum, minimize, INTEGER, CONTINUOUS, OptimizationStatus, LinExpr, BINARY
-from nempy import check
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from nempy import check, solver_backends, presolve as pre, helper_functions as hf
 from time import time
 
 
 def dispatch(decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
-             constraints_dynamic_rhs_and_type, objective_function):
+             constraints_dynamic_rhs_and_type, objective_function, price_method='perturbation', pricing_workers=None,
+             statistics=None, model=None, backend='cbc', presolve=False, timings=None, aggregate=False,
+             limits=None, warm_start=False, model_arrays=None, price_if=None):
     """Create and solve a linear program, returning prices of the market constraints and decision variables values.
 
-    0. Create the problem instance as a mip-python object instance
+    0. Create the problem instance with the chosen solver backend
     1. Create the decision variables
     2. Create the objective function
     3. Create the constraints
@@ -41,6 +44,51 @@ def dispatch(decision_variables, constraints_lhs, constraints_rhs_and_type, mark
     :param objective_function: dict of DataFrames each with the following columns
         variable_id: int
         cost: float
+    :param price_method: str one of 'perturbation' or 'dual', or None
+        'perturbation' re-solves once per market constraint with its rhs increased by 1.0, 'dual' fixes the integer
+        and SOS structure at the optimal values and reads all shadow prices from a single linear program re-solve.
+        If None the market constraints are not priced.
+    :param pricing_workers: int or None
+        the number of worker processes to share perturbation pricing re-solves between, None to re-solve serially.
+    :param statistics: dict or None
+        if a dict is given, details of the solve are saved to it, see :func:`get_prices_by_perturbation`, and the
+        changes made to the problem are saved under the key 'model_update', see :class:`PersistentModel`.
+    :param model: PersistentModel or None
+        if given, the problem held by the model is updated in place and solved, rather than a new problem being
+        created.
+    :param backend: str one of the keys of solver_backends.BACKENDS, 'cbc' or 'highs'
+        the solver used to create and solve a new problem, not used if a model is given.
+    :param presolve: bool
+        if True, redundant and single variable constraints are removed before the problem is solved, see
+        :func:`presolve.presolve`, and if a statistics dict is given the presolve report is saved to it under the key
+        'presolve'.
+    :param timings: dict or None
+        if a dict is given, the seconds spent in each phase of the dispatch are added to it, under the keys
+        'problem_arrays', 'variable_creation', 'constraint_creation', 'initial_solve', 'result_extraction' and
+        'pricing'. If None nothing is timed.
+    :param aggregate: bool
+        if True, interchangeable continuous variables, e.g. bid bands in the same region at the same price, are merged
+        before the problem is solved, and the value of each aggregate is shared back out between its members in
+        proportion to their bounds, see :func:`presolve.aggregate_variables`. If a statistics dict is given the number
+        of variables before and after merging is saved to it under the key 'aggregation'.
+    :param limits: dict or None
+        solver limits, with any of the keys time_limit, the seconds allowed for the solve and for each pricing
+        re-solve, mip_gap, the relative gap at which MIP solves stop, and threads, see
+        :meth:`solver_backends.SolverBackend.set_limits`. If a limit stops the solve after a feasible solution is
+        found that solution is used, and if a statistics dict is given the solve status ('optimal' or 'feasible') and
+        the relative gap to the best bound are saved to it under the key 'solve'. A pricing re-solve that finds no
+        feasible solution gives a price of NaN.
+    :param warm_start: bool
+        if True, and a model is given that was last solved with the same variables, a problem with integer or SOS
+        structure is started from the model's last solution, e.g. when dispatching a series of small changes to one
+        problem. Linear programs are always started from the basis the model's solver already holds.
+    :param model_arrays: model_arrays.ModelArrays or None
+        if given, the arrays the problem is built from are taken from it, rather than being flattened from the
+        DataFrame inputs, which must hold the same problem.
+    :param price_if: function or None
+        if given, it is called with the decision variables, with their values, once the problem is solved, and the
+        market constraints are only priced if it returns True, e.g. so a dispatch that will be refined and solved
+        again is not priced.
     :return:
         decision_variables: dict of DataFrames each with the following columns
             variable_id: int
@@ -55,160 +103,807 @@ def dispatch(decision_variables, constraints_lhs, constraints_rhs_and_type, mark
             price: float
     """
 
-    # 0. Create the problem instance as a mip-python object instance
-    prob = Model("market")
-    prob.verbose = 0
+    model_inputs = (decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                    constraints_dynamic_rhs_and_type, objective_function)
 
-    sos_variables = None
-    if 'interpolation_weights' in decision_variables.keys():
-        sos_variables = decision_variables['interpolation_weights']
+    # 0 - 3. Create the problem instance, variables, objective function and constraints.
+    if model is None:
+        model = PersistentModel(backend, reuse=False)
+    variable_positions, lp_constraints, sos_variables = model.update(*model_inputs, presolve=presolve, timings=timings,
+                                                                     aggregate=aggregate, model_arrays=model_arrays)
+    if statistics is not None:
+        statistics['model_update'] = dict(model.changes)
+        if presolve:
+            statistics['presolve'] = dict(model.presolve_report)
+        if aggregate:
+            statistics['aggregation'] = {'variables_before': len(model.aggregation['aggregate_of']),
+                                         'variables_after': int(model.aggregation['aggregate_of'].max(initial=-1)) + 1}
+    solver = model.backend
+    if limits is not None:
+        solver.set_limits(**limits)
 
-    # 1. Create the decision variables
-    decision_variables = pd.concat(decision_variables)
-    lp_variables = {}
-    variable_types = {'continuous': CONTINUOUS, 'binary': BINARY}
-    for variable_id, lower_bound, upper_bound, variable_type in zip(
-            list(decision_variables['variable_id']), list(decision_variables['lower_bound']),
-            list(decision_variables['upper_bound']), list(decision_variables['type'])):
-        lp_variables[variable_id] = prob.add_var(lb=lower_bound, ub=upper_bound, var_type=variable_types[variable_type],
-                                                 name=str(variable_id))
+    is_linear = sos_variables is None and \
+        all((variables['type'] == 'continuous').all() for variables in decision_variables.values())
+    same_variables = not model.changes['rebuilt'] and model.changes['variables_added'] == 0 and \
+        model.changes['variables_removed'] == 0
+    if warm_start and not is_linear and model.solution is not None and same_variables:
+        solver.set_start(model.solution)
 
-    def add_sos_vars(sos_group):
-        prob.add_sos(list(zip(sos_group['vars'], sos_group['loss_segment'])), 2)
+    # 4. Solve the problem
+    with hf.timer(timings, 'initial_solve'):
+        status = solver.solve()
+    if status == 'infeasible':
+        raise ValueError('Linear program infeasible')
+    elif status not in ['optimal', 'feasible']:
+        raise ValueError("No feasible solution found, the solve ended with the status '{}'.".format(status))
+    if statistics is not None:
+        statistics['solve'] = {'status': status, 'gap': solver.gap()}
+    if warm_start:
+        model.solution = solver.primal_values()
 
-    if sos_variables is not None:
-        sos_variables['vars'] = sos_variables['variable_id'].apply(lambda x: lp_variables[x])
-        sos_variables.groupby('interconnector').apply(add_sos_vars)
+    # 5. Retrieve optimal values of each variable, as one solution vector in the order of the decision variables, each
+    # group of variables takes its values as a slice of the vector.
+    with hf.timer(timings, 'result_extraction'):
+        values = solver.primal_values()[variable_positions]
+        if model.aggregation is not None:
+            values = pre.split_aggregate_values(values, model.aggregation)
+        split_decision_variables = {}
+        start = 0
+        for variable_group, variables in decision_variables.items():
+            end = start + len(variables.index)
+            split_decision_variables[variable_group] = variables.reset_index(drop=True)
+            split_decision_variables[variable_group]['value'] = values[start:end]
+            start = end
 
-    # 2. Create the objective function
-    if len(objective_function) > 0:
-        objective_function = pd.concat(list(objective_function.values()))
-        objective_function = objective_function.sort_values('variable_id')
-        objective_function = objective_function.set_index('variable_id')
-        prob.objective = minimize(xsum(objective_function['cost'][i] * lp_variables[i] for i in
-                                       list(objective_function.index)))
-
-    # 3. Create the constraints
-    sos_constraints = []
-    if len(constraints_rhs_and_type) > 0:
-        constraints_rhs_and_type = pd.concat(list(constraints_rhs_and_type.values()))
-    else:
-        constraints_rhs_and_type = pd.DataFrame({})
-
-    if len(constraints_dynamic_rhs_and_type) > 0:
-        constraints_dynamic_rhs_and_type = pd.concat(list(constraints_dynamic_rhs_and_type.values()))
-        constraints_dynamic_rhs_and_type['rhs'] = constraints_dynamic_rhs_and_type.\
-            apply(lambda x: lp_variables[x['rhs_variable_id']], axis=1)
-        rhs_and_type = pd.concat([constraints_rhs_and_type] + list(market_rhs_and_type.values()) +
-                                 [constraints_dynamic_rhs_and_type])
-    else:
-        rhs_and_type = pd.concat([constraints_rhs_and_type] + list(market_rhs_and_type.values()))
-
-    constraint_matrix = constraints_lhs.pivot('constraint_id', 'variable_id', 'coefficient')
-    constraint_matrix = constraint_matrix.sort_index(axis=1)
-    constraint_matrix = constraint_matrix.sort_index()
-    column_ids = np.asarray(constraint_matrix.columns)
-    row_ids = np.asarray(constraint_matrix.index)
-    constraint_matrix_np = np.asarray(constraint_matrix)
-
-    # if len(constraint_matrix.columns) != max(decision_variables['variable_id']) + 1:
-    #     raise check.ModelBuildError("Not all variables used in constraint matrix")
-
-    rhs = dict(zip(rhs_and_type['constraint_id'], rhs_and_type['rhs']))
-    enq_type = dict(zip(rhs_and_type['constraint_id'], rhs_and_type['type']))
-    #var_list = np.asarray([lp_variables[k] for k in sorted(list(lp_variables))])
-    #t0 = time()
-    for row, id in zip(constraint_matrix_np, row_ids):
-        new_constraint = make_constraint(lp_variables, row, rhs[id], column_ids, enq_type[id])
-        prob.add_constr(new_constraint, name=str(id))
-    #print(time() - t0)
-    # for row_index in sos_constraints:
-    #     sos_set = get_sos(var_list, constraint_matrix_np[row_index], column_ids)
-     #   prob.add_sos(list(zip(sos_set, [0 for var in sos_set])), 1)
+    # 6. Retrieve the shadow costs of market constraints
+    if price_if is not None and not price_if(split_decision_variables):
+        price_method = None
+    with hf.timer(timings, 'pricing'):
+        if price_method == 'perturbation':
+            market_rhs_and_type = get_prices_by_perturbation(solver, lp_constraints, market_rhs_and_type,
+                                                             pricing_workers, model_inputs, is_linear, statistics,
+                                                             presolve, aggregate, limits)
+        elif price_method == 'dual':
+            market_rhs_and_type = get_prices_from_duals(solver, lp_constraints, sos_variables, market_rhs_and_type)
+        elif price_method is not None:
+            raise ValueError("price_method should be 'perturbation' or 'dual', not '{}'.".format(price_method))
+    return split_decision_variables, market_rhs_and_type
 
-    # 4. Solve the problem
-    k = prob.add_var(var_type=BINARY, obj=1.0)
-    #tc = 0
-    #t0 = time()
-    status = prob.optimize()
-    #tc += time() - t0
-    #print(tc)
-    if status != OptimizationStatus.OPTIMAL:
-        raise ValueError('Linear program infeasible')
 
-    # 5. Retrieve optimal values of each variable
-    #t0 = time()
-    decision_variables = decision_variables.droplevel(1)
-    decision_variables['lp_variables'] = [lp_variables[i] for i in decision_variables['variable_id']]
-    decision_variables['value'] = decision_variables['lp_variables'].apply(lambda x: x.x)
-    decision_variables = decision_variables.drop('lp_variables', axis=1)
+def dispatch_components(decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                        constraints_dynamic_rhs_and_type, objective_function, price_method='perturbation',
+                        pricing_workers=None, statistics=None, backend='cbc', presolve=False, timings=None,
+                        component_workers=None, aggregate=False, limits=None):
+    """Split the problem into independent parts, dispatch each with :func:`dispatch` and join the results back up.
+
+    The parts are the connected components of the problem, see :func:`find_components`, e.g. each region of a market
+    with no interconnectors, or the two sides of an interconnector with a fixed flow. Each part is smaller than the
+    whole problem, and so are the perturbation pricing re-solves, which only re-solve the part a market constraint is
+    in. If component_workers is given the parts are shared out over a pool of that many worker processes, in which
+    case the perturbation pricing of each part is done serially in its worker.
+
+    The inputs and outputs are the same as :func:`dispatch`. If a statistics dict is given the statistics of the parts
+    are combined, the solve status is 'optimal' only if every part was solved to optimality, the gap is the largest
+    gap of any part, and the number of parts is saved under the key 'components'. If a timings dict is given the
+    seconds spent in each phase are summed over the parts.
+    """
+    arrays = create_arrays(decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                           constraints_dynamic_rhs_and_type, objective_function)
+    components = find_components(arrays)
+
+    # Constraints without a lhs are not part of any component, they are dispatched with the first part as they would
+    # be without splitting the problem.
+    all_constraint_ids = [frame['constraint_id'] for frames in [constraints_rhs_and_type, market_rhs_and_type,
+                                                                constraints_dynamic_rhs_and_type]
+                          for frame in frames.values()]
+    all_constraint_ids = np.concatenate([np.asarray(ids, dtype=np.int64) for ids in all_constraint_ids] +
+                                        [np.array([], dtype=np.int64)])
+    unassigned = np.setdiff1d(all_constraint_ids, arrays['constraint_ids'])
+    components[0] = (components[0][0], np.append(components[0][1], unassigned))
+
+    parts = []
+    for variable_ids, constraint_ids in components:
+        parts.append((_select(decision_variables, 'variable_id', variable_ids),
+                      constraints_lhs[constraints_lhs['constraint_id'].isin(constraint_ids)],
+                      _select(constraints_rhs_and_type, 'constraint_id', constraint_ids),
+                      _select(market_rhs_and_type, 'constraint_id', constraint_ids),
+                      _select(constraints_dynamic_rhs_and_type, 'constraint_id', constraint_ids),
+                      _select(objective_function, 'variable_id', variable_ids)))
+
+    if component_workers is not None and component_workers > 1 and len(parts) > 1:
+        options = (price_method, None, backend, presolve, aggregate, limits, timings is not None)
+        with ProcessPoolExecutor(max_workers=min(component_workers, len(parts))) as pool:
+            results = list(pool.map(_dispatch_component, parts, [options] * len(parts)))
+    else:
+        options = (price_method, pricing_workers, backend, presolve, aggregate, limits, timings is not None)
+        results = [_dispatch_component(part, options) for part in parts]
+
+    values = pd.concat([pd.Series(frame['value'].values, index=frame['variable_id'].values)
+                        for part_variables, part_prices, part_statistics, part_timings in results
+                        for frame in part_variables.values()])
+    values = values[~values.index.duplicated()]
     split_decision_variables = {}
-    for variable_group in decision_variables.index.unique():
-        split_decision_variables[variable_group] = \
-            decision_variables[decision_variables.index == variable_group].reset_index(drop=True)
-    #print('get values {}'.format(time() - t0))
+    for variable_group, variables in decision_variables.items():
+        split_decision_variables[variable_group] = variables.reset_index(drop=True)
+        split_decision_variables[variable_group]['value'] = \
+            split_decision_variables[variable_group]['variable_id'].map(values).astype(np.float64)
 
-    # 6. Retrieve the shadow costs of market constraints
-    start_obj = prob.objective.x
-    #initial_solution = [(v, v.x) for v in list(sos_variables['vars']) if v.x > 0.01]
-    #print(initial_solution)
-    #prob.start = initial_solution
-    #prob.validate_mip_start()
-    for constraint_group in market_rhs_and_type.keys():
-        cg = constraint_group
-        market_rhs_and_type[cg]['price'] = 0.0
-        for id in list(market_rhs_and_type[cg]['constraint_id']):
-            constraint = prob.constr_by_name(str(id))
-            constraint.rhs += 1.0
-            #t0 = time()
-            prob.optimize()
-            #tc += time() - t0
-            marginal_cost = prob.objective.x - start_obj
-            market_rhs_and_type[cg].loc[market_rhs_and_type[cg]['constraint_id'] == id, 'price'] = marginal_cost
-            constraint.rhs -= 1.0
-        # market_rhs_and_type[constraint_group]['price'] = \
-        #     market_rhs_and_type[constraint_group].apply(lambda x: get_price(x['constraint_id'], prob), axis=1)
-    #print(tc)
+    if price_method is not None:
+        prices = pd.concat([pd.Series(frame['price'].values, index=frame['constraint_id'].values)
+                            for part_variables, part_prices, part_statistics, part_timings in results
+                            for frame in part_prices.values()] + [pd.Series([], dtype=np.float64)])
+        for constraint_group in market_rhs_and_type.keys():
+            market_rhs_and_type[constraint_group]['price'] = \
+                market_rhs_and_type[constraint_group]['constraint_id'].map(prices).astype(np.float64)
+
+    if statistics is not None:
+        statistics['components'] = len(parts)
+        part_statistics = [result[2] for result in results]
+        if any('pricing' in part for part in part_statistics):
+            statistics['pricing'] = pd.concat([part['pricing'] for part in part_statistics if 'pricing' in part],
+                                              ignore_index=True)
+        for key in ['model_update', 'presolve', 'aggregation']:
+            reports = [part[key] for part in part_statistics if key in part]
+            if len(reports) > 0:
+                statistics[key] = {name: any(report[name] for report in reports) if isinstance(value, bool) else
+                                   sum(report[name] for report in reports) for name, value in reports[0].items()}
+        solves = [part['solve'] for part in part_statistics if 'solve' in part]
+        if len(solves) > 0:
+            statistics['solve'] = {
+                'status': 'optimal' if all(solve['status'] == 'optimal' for solve in solves) else 'feasible',
+                'gap': max(solve['gap'] for solve in solves)}
+    if timings is not None:
+        for part_variables, part_prices, part_statistics, part_timings in results:
+            for phase, seconds in part_timings.items():
+                timings[phase] = timings.get(phase, 0.0) + seconds
     return split_decision_variables, market_rhs_and_type
 
 
-def make_constraint(lp_variables, lhs, rhs, column_ids, enq_type, marginal_offset=0):
-    columns_in_constraint = np.argwhere(~np.isnan(lhs)).flatten()
-    column_ids_in_constraint = column_ids[columns_in_constraint]
-    # lhs_variables = lp_variables[column_ids_in_constraint]
-    lhs_variables = np.asarray([lp_variables[k] for k in column_ids_in_constraint])
-    lhs = lhs[columns_in_constraint]
-    exp = lhs_variables * lhs
-    exp = exp.tolist()
-    exp = xsum(exp)
-    # Add based on inequality type.
-    if enq_type == '<=':
-        con = exp <= rhs + marginal_offset
-    elif enq_type == '>=':
-        con = exp >= rhs + marginal_offset
-    elif enq_type == '=':
-        con = exp == rhs + marginal_offset
+def _select(frames, id_column, ids):
+    selected = {}
+    for name, frame in frames.items():
+        frame = frame[frame[id_column].isin(ids)]
+        if len(frame.index) > 0:
+            selected[name] = frame.copy()
+    return selected
+
+
+def _dispatch_component(part, options):
+    price_method, pricing_workers, backend, presolve, aggregate, limits, timed = options
+    statistics = {}
+    timings = {} if timed else None
+    split_decision_variables, market_rhs_and_type = dispatch(
+        *part, price_method=price_method, pricing_workers=pricing_workers, statistics=statistics, backend=backend,
+        presolve=presolve, timings=timings, aggregate=aggregate, limits=limits)
+    return split_decision_variables, market_rhs_and_type, statistics, timings or {}
+
+
+def write_model(path, decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                constraints_dynamic_rhs_and_type, objective_function, backend='cbc'):
+    """Build the problem, from inputs in the same form as :func:`dispatch`, and write it to a file without solving.
+
+    The format is chosen by the file extension, '.mps' or '.lp', and the file is written by the backend's solver,
+    so it can be read back by that solver, or most others, to study a problem away from nempy. Variables are in the
+    order of the decision variables and constraints in the order of their ids, see :func:`create_arrays`.
+    """
+    model = PersistentModel(backend, reuse=False)
+    model.update(decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                 constraints_dynamic_rhs_and_type, objective_function)
+    model.backend.write(path)
+
+
+def find_components(arrays):
+    """Find the connected components of a problem, given in the form returned by :func:`create_arrays`.
+
+    Two variables are connected if they share a constraint. Continuous variables with equal lower and upper bounds are
+    fixed, so they do not connect the constraints they are in, and are instead copied into each component that uses
+    them. Variables that are in no constraint are put in the first component.
+
+    Examples
+    --------
+    Three variables, the first two share constraint 0, the third is alone in constraint 1.
+
+    >>> arrays = dict(
+    ...   variable_ids=np.array([0, 1, 2]),
+    ...   lower_bounds=np.array([0.0, 0.0, 0.0]),
+    ...   upper_bounds=np.array([10.0, 10.0, 10.0]),
+    ...   types=np.array(['continuous', 'continuous', 'continuous'], dtype=object),
+    ...   constraint_ids=np.array([0, 1]),
+    ...   row_starts=np.array([0, 2]),
+    ...   lhs_variable_ids=np.array([0, 1, 2]))
+
+    >>> find_components(arrays)
+    [(array([0, 1]), array([0])), (array([2]), array([1]))]
+
+    Returns
+    -------
+    list of tuple
+        The ids of the variables and of the constraints in each component, ordered by their first variable.
+    """
+    n_variables = len(arrays['variable_ids'])
+    n_rows = len(arrays['constraint_ids'])
+    if n_rows == 0:
+        return [(arrays['variable_ids'], arrays['constraint_ids'])]
+    lhs_positions = hf.IdIndex(arrays['variable_ids'])(arrays['lhs_variable_ids'])
+    rows = np.repeat(np.arange(n_rows), np.diff(np.append(arrays['row_starts'], len(lhs_positions))))
+    fixed = (arrays['lower_bounds'] == arrays['upper_bounds']) & (arrays['types'] == 'continuous')
+    linking = ~fixed[lhs_positions]
+    linking_rows, linking_positions = rows[linking], lhs_positions[linking]
+
+    # Each variable is labelled with the smallest position connected to it so far. Labels are spread through the
+    # constraints until nothing changes, following labels to their own label on the way to shorten long chains.
+    labels = np.arange(n_variables)
+    while True:
+        row_labels = np.full(n_rows, n_variables)
+        np.minimum.at(row_labels, linking_rows, labels[linking_positions])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, linking_positions, row_labels[linking_rows])
+        new_labels = new_labels[new_labels]
+        if (new_labels == labels).all():
+            break
+        labels = new_labels
+
+    # Constraints on fixed variables alone take the label of their first variable.
+    unlinked = row_labels == n_variables
+    row_labels[unlinked] = labels[lhs_positions[arrays['row_starts'][unlinked]]]
+
+    component_labels = np.unique(row_labels)
+    in_component = np.zeros(n_variables, dtype=bool)
+    components = []
+    for label in component_labels:
+        positions = np.union1d(np.flatnonzero(~fixed & (labels == label)),
+                               lhs_positions[~linking & (row_labels[rows] == label)])
+        in_component[positions] = True
+        components.append([positions, arrays['constraint_ids'][row_labels == label]])
+    components[0][0] = np.union1d(components[0][0], np.flatnonzero(~in_component))
+    return [(arrays['variable_ids'][positions], constraint_ids) for positions, constraint_ids in components]
+
+
+def create_arrays(decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+                  constraints_dynamic_rhs_and_type, objective_function):
+    """Flatten the inputs to :func:`dispatch` into the arrays a problem is built from.
+
+    Variables are kept in the order of the decision variables, with a lower bound, upper bound, type and cost array.
+    Constraints are sorted by id, with the lhs in compressed sparse row form, i.e. the lhs of constraint i has the
+    variables lhs_variable_ids[row_starts[i]:row_starts[i + 1]]. Variables on the rhs of dynamic constraints are moved
+    to the lhs with a coefficient of -1.0, leaving a rhs of 0.0. Only constraints with a lhs are included.
+
+    Examples
+    --------
+    >>> decision_variables = {'energy_units': pd.DataFrame({
+    ...   'unit': ['A', 'B'],
+    ...   'variable_id': [0, 1],
+    ...   'lower_bound': [0.0, 0.0],
+    ...   'upper_bound': [10.0, 10.0],
+    ...   'type': ['continuous', 'continuous']})}
+
+    >>> market_rhs_and_type = {'demand': pd.DataFrame({
+    ...   'region': ['X'],
+    ...   'constraint_id': [0],
+    ...   'type': ['='],
+    ...   'rhs': [12.0]})}
+
+    >>> constraints_lhs = pd.DataFrame({
+    ...   'constraint_id': [0, 0],
+    ...   'variable_id': [1, 0],
+    ...   'coefficient': [1.0, 1.0]})
+
+    >>> objective_function = {'bids': pd.DataFrame({
+    ...   'variable_id': [1],
+    ...   'cost': [2.0]})}
+
+    >>> arrays = create_arrays(decision_variables, constraints_lhs, {}, market_rhs_and_type, {}, objective_function)
+
+    >>> arrays['costs']
+    array([0., 2.])
+
+    >>> arrays['row_starts'], arrays['lhs_variable_ids'], arrays['rhs']
+    (array([0]), array([0, 1]), array([12.]))
+
+    Returns
+    -------
+    dict of np.ndarray
+        With the keys variable_ids, lower_bounds, upper_bounds, types and costs, for the variables, and constraint_ids,
+        row_starts, lhs_variable_ids, lhs_coefficients, senses and rhs, for the constraints.
+    """
+    def column(frames, name, dtype):
+        return np.concatenate([np.asarray(frame[name], dtype=dtype) for frame in frames] + [np.array([], dtype=dtype)])
+
+    variables = list(decision_variables.values())
+    arrays = dict(variable_ids=column(variables, 'variable_id', np.int64),
+                  lower_bounds=column(variables, 'lower_bound', np.float64),
+                  upper_bounds=column(variables, 'upper_bound', np.float64),
+                  types=column(variables, 'type', object),
+                  costs=np.zeros(sum(len(frame.index) for frame in variables)))
+    variable_index = hf.IdIndex(arrays['variable_ids'])
+    if len(objective_function) > 0:
+        objective_function = list(objective_function.values())
+        arrays['costs'][variable_index(column(objective_function, 'variable_id', np.int64))] = \
+            column(objective_function, 'cost', np.float64)
+
+    rhs_and_type = list(constraints_rhs_and_type.values()) + list(market_rhs_and_type.values())
+    dynamic_rhs_and_type = list(constraints_dynamic_rhs_and_type.values())
+    constraint_ids = column(rhs_and_type + dynamic_rhs_and_type, 'constraint_id', np.int64)
+    senses = column(rhs_and_type + dynamic_rhs_and_type, 'type', object)
+    rhs = np.append(column(rhs_and_type, 'rhs', np.float64), np.zeros(sum(len(f.index) for f in dynamic_rhs_and_type)))
+
+    lhs_constraint_ids = np.append(np.asarray(constraints_lhs['constraint_id'], dtype=np.int64),
+                                   column(dynamic_rhs_and_type, 'constraint_id', np.int64))
+    lhs_variable_ids = np.append(np.asarray(constraints_lhs['variable_id'], dtype=np.int64),
+                                 column(dynamic_rhs_and_type, 'rhs_variable_id', np.int64))
+    lhs_coefficients = np.append(np.asarray(constraints_lhs['coefficient'], dtype=np.float64),
+                                 -1.0 * np.ones(sum(len(f.index) for f in dynamic_rhs_and_type)))
+    order = np.lexsort((lhs_variable_ids, lhs_constraint_ids))
+    arrays['constraint_ids'], arrays['row_starts'] = np.unique(lhs_constraint_ids[order], return_index=True)
+    arrays['lhs_variable_ids'] = lhs_variable_ids[order]
+    arrays['lhs_coefficients'] = lhs_coefficients[order]
+    rows = hf.IdIndex(constraint_ids)(arrays['constraint_ids'])
+    arrays['senses'] = senses[rows]
+    arrays['rhs'] = rhs[rows]
+    return arrays
+
+
+# Columns that hold the values of a variable or constraint, rather than identifying it.
+VARIABLE_VALUE_COLUMNS = ['variable_id', 'lower_bound', 'upper_bound', 'type', 'value']
+CONSTRAINT_VALUE_COLUMNS = ['constraint_id', 'type', 'rhs', 'rhs_variable_id', 'price']
+
+
+class PersistentModel:
+    """A problem, held by a solver backend, that is kept alive between dispatches and updated in place.
+
+    Ids are handed out afresh each time the inputs to a dispatch are built, so variables and constraints are instead
+    matched between dispatches by a key made from their group and the values of their identifying columns, e.g. the
+    unit, service and capacity band of a bid. On each update the bounds and costs of variables, and the rhs of
+    constraints, that already exist in the problem are changed in place. Variables and constraints are only added or
+    removed when their keys appear or disappear, and a constraint is only rebuilt if its lhs or type changes. If the
+    SOS structure of the interpolation weights changes the problem is rebuilt from scratch. The solution of the last
+    dispatch warm started from the model is kept in the attribute solution, see :func:`dispatch`.
+
+    Examples
+    --------
+    >>> import pandas as pd
+
+    >>> decision_variables = {'energy_units': pd.DataFrame({
+    ...   'unit': ['A', 'B'],
+    ...   'variable_id': [0, 1],
+    ...   'lower_bound': [0.0, 0.0],
+    ...   'upper_bound': [10.0, 10.0],
+    ...   'type': ['continuous', 'continuous']})}
+
+    >>> market_rhs_and_type = {'demand': pd.DataFrame({
+    ...   'region': ['X'],
+    ...   'constraint_id': [0],
+    ...   'type': ['='],
+    ...   'rhs': [12.0]})}
+
+    >>> constraints_lhs = pd.DataFrame({
+    ...   'constraint_id': [0, 0],
+    ...   'variable_id': [0, 1],
+    ...   'coefficient': [1.0, 1.0]})
+
+    >>> objective_function = {'bids': pd.DataFrame({
+    ...   'variable_id': [0, 1],
+    ...   'cost': [1.0, 2.0]})}
+
+    >>> model = PersistentModel()
+
+    >>> variable_positions, lp_constraints, sos_variables = model.update(
+    ...   decision_variables, constraints_lhs, {}, market_rhs_and_type, {}, objective_function)
+
+    >>> model.changes['rebuilt'], model.changes['variables_added'], model.changes['constraints_added']
+    (True, 2, 1)
+
+    Changing the demand, with new ids, only updates the rhs of the demand constraint.
+
+    >>> market_rhs_and_type['demand']['constraint_id'] = 5
+    >>> market_rhs_and_type['demand']['rhs'] = 15.0
+    >>> constraints_lhs['constraint_id'] = 5
+
+    >>> variable_positions, lp_constraints, sos_variables = model.update(
+    ...   decision_variables, constraints_lhs, {}, market_rhs_and_type, {}, objective_function)
+
+    >>> model.changes['rebuilt'], model.changes['constraints_added'], model.changes['constraints_updated']
+    (False, 0, 1)
+
+    Parameters
+    ----------
+    backend : str
+        The name of the solver backend to hold the problem in, see :func:`solver_backends.create`.
+    reuse : bool
+        If False the problem is rebuilt on every update, which skips matching variables and constraints by key, the
+        quickest option when each problem is only solved once.
+    """
+
+    def __init__(self, backend='cbc', reuse=True):
+        if backend not in solver_backends.BACKENDS:
+            raise ValueError("backend should be one of {}, not '{}'.".format(sorted(solver_backends.BACKENDS.keys()),
+                                                                            backend))
+        self.backend_name = backend
+        self.reuse = reuse
+        self.backend = None
+        self.variables = {}
+        self.constraints = {}
+        self.sos_signature = None
+        self.changes = {}
+        self.presolve_report = None
+        self.aggregation = None
+        self.solution = None
+
+    def update(self, decision_variables, constraints_lhs, constraints_rhs_and_type, market_rhs_and_type,
+               constraints_dynamic_rhs_and_type, objective_function, presolve=False, timings=None,
+               aggregate=False, model_arrays=None):
+        """Bring the problem in line with the given inputs, which take the same form as the inputs to :func:`dispatch`.
+
+        The changes made are saved to the attribute changes, as counts of the variables and constraints added, updated
+        and removed, and whether the problem was rebuilt from scratch. If presolve is True the problem is reduced
+        first, keeping the market constraints and constraints with a variable on the rhs, and the presolve report is
+        saved to the attribute presolve_report. If a timings dict is given the seconds spent building the problem
+        arrays, and creating or updating variables and constraints, are added to it, see :func:`dispatch`. If aggregate
+        is True interchangeable variables are merged, and the details needed to share the value of each aggregate
+        between its members are saved to the attribute aggregation, see :func:`presolve.aggregate_variables`. The
+        positions returned for the members of an aggregate are all the position of the aggregate. If model_arrays is
+        given the problem arrays are taken from it, see :meth:`model_arrays.ModelArrays.arrays`.
+
+        Returns
+        -------
+        tuple
+            An array of the positions of the variables in the backend, in the order of the decision variables, a dict
+            mapping constraint ids to the positions of the constraints and, if interpolation weights are used, a copy of
+            the weight variables with a column 'position' holding the position of each weight.
+        """
+        with hf.timer(timings, 'problem_arrays'):
+            if model_arrays is not None:
+                arrays = model_arrays.arrays()
+            else:
+                arrays = create_arrays(decision_variables, constraints_lhs, constraints_rhs_and_type,
+                                       market_rhs_and_type, constraints_dynamic_rhs_and_type, objective_function)
+            self.presolve_report = None
+            if presolve:
+                protected_frames = list(market_rhs_and_type.values()) + list(constraints_dynamic_rhs_and_type.values())
+                protected_constraint_ids = [id for frame in protected_frames for id in frame['constraint_id']]
+                arrays, self.presolve_report = pre.presolve(arrays, protected_constraint_ids)
+            self.aggregation = None
+            if aggregate:
+                # The weights of special ordered sets must stay separate variables.
+                sos_variable_ids = decision_variables['interpolation_weights']['variable_id'] \
+                    if 'interpolation_weights' in decision_variables else []
+                arrays, self.aggregation = pre.aggregate_variables(arrays, sos_variable_ids)
+            variable_index = hf.IdIndex(arrays['variable_ids'])
+
+        variable_keys = None
+        sos_signature = None
+        if self.reuse:
+            variable_keys = get_keys(decision_variables, 'variable_id', VARIABLE_VALUE_COLUMNS)
+
+        sos_variables = None
+        if 'interpolation_weights' in decision_variables.keys():
+            sos_variables = decision_variables['interpolation_weights'].copy()
+            if self.reuse:
+                sos_signature = tuple(zip(sos_variables['interconnector'], sos_variables['loss_segment'],
+                                          [variable_keys[id] for id in sos_variables['variable_id']]))
+
+        rebuilt = not self.reuse or self.backend is None or sos_signature != self.sos_signature
+        if rebuilt:
+            self.backend = solver_backends.create(self.backend_name)
+            self.variables = {}
+            self.constraints = {}
+            self.sos_signature = sos_signature
+        self.changes = dict(rebuilt=rebuilt, variables_added=0, variables_updated=0, variables_removed=0,
+                            constraints_added=0, constraints_updated=0, constraints_removed=0)
+
+        if self.reuse:
+            constraint_keys = {}
+            for kind, frames in [('constraints', constraints_rhs_and_type), ('market', market_rhs_and_type),
+                                 ('dynamic', constraints_dynamic_rhs_and_type)]:
+                constraint_keys.update(get_keys(frames, 'constraint_id', CONSTRAINT_VALUE_COLUMNS, kind))
+            variable_positions, constraint_positions = self._match(arrays, variable_keys, constraint_keys, timings)
+        else:
+            with hf.timer(timings, 'variable_creation'):
+                variable_positions = self.backend.add_variables(arrays['lower_bounds'], arrays['upper_bounds'],
+                                                                arrays['types'], arrays['costs'])
+            with hf.timer(timings, 'constraint_creation'):
+                constraint_positions = self.backend.add_constraints(
+                    arrays['row_starts'], variable_positions[variable_index(arrays['lhs_variable_ids'])],
+                    arrays['lhs_coefficients'], arrays['senses'], arrays['rhs'])
+            self.changes['variables_added'] = len(variable_positions)
+            self.changes['constraints_added'] = len(constraint_positions)
+
+        if sos_variables is not None:
+            sos_variables['position'] = variable_positions[variable_index(sos_variables['variable_id'])]
+            if rebuilt:
+                with hf.timer(timings, 'constraint_creation'):
+                    self._add_sos(sos_variables)
+
+        if rebuilt and self.backend_name == 'cbc':
+            # A binary variable that is always zero, carried over from the original mip-python model, so CBC always
+            # solves the problem as a MIP.
+            self.backend.add_variables([0.0], [1.0], ['binary'], [1.0])
+
+        if self.aggregation is not None:
+            variable_positions = variable_positions[self.aggregation['aggregate_of']]
+        return variable_positions, dict(zip(arrays['constraint_ids'], constraint_positions)), sos_variables
+
+    def _match(self, arrays, variable_keys, constraint_keys, timings=None):
+        variable_index = hf.IdIndex(arrays['variable_ids'])
+        variables = list(zip([variable_keys[id] for id in arrays['variable_ids']],
+                             zip(arrays['lower_bounds'].tolist(), arrays['upper_bounds'].tolist(),
+                                 arrays['types'].tolist(), arrays['costs'].tolist())))
+
+        row_ends = np.append(arrays['row_starts'][1:], len(arrays['lhs_variable_ids']))
+        lhs_keys = [variable_keys[id] for id in arrays['lhs_variable_ids']]
+        lhs_coefficients = arrays['lhs_coefficients'].tolist()
+        rows = []
+        for id, start, end, sense, rhs in zip(arrays['constraint_ids'], arrays['row_starts'], row_ends,
+                                              arrays['senses'], arrays['rhs'].tolist()):
+            signature = (frozenset(Counter(zip(lhs_keys[start:end], lhs_coefficients[start:end])).items()), sense)
+            rows.append((constraint_keys[id], signature, rhs))
+
+        # Take out what has gone, or changed shape, first so the positions of everything kept are final.
+        with hf.timer(timings, 'variable_creation'):
+            current_keys = set(key for key, values in variables)
+            self._remove_variables([key for key in self.variables if key not in current_keys])
+        with hf.timer(timings, 'constraint_creation'):
+            current_signatures = {key: signature for key, signature, rhs in rows}
+            self._remove_constraints([key for key, (position, signature, rhs) in self.constraints.items()
+                                      if current_signatures.get(key) != signature])
+
+        with hf.timer(timings, 'variable_creation'):
+            variable_positions = self._update_variables(variables)
+        with hf.timer(timings, 'constraint_creation'):
+            new_rows = self._update_constraints(rows)
+            if len(new_rows) > 0:
+                # Add the new constraints, with their lhs taken from the rows of the lhs arrays.
+                starts = arrays['row_starts'][new_rows]
+                ends = row_ends[new_rows]
+                lhs = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+                positions = self.backend.add_constraints(
+                    np.cumsum(np.append(0, ends - starts)[:-1]),
+                    variable_positions[variable_index(arrays['lhs_variable_ids'][lhs])],
+                    arrays['lhs_coefficients'][lhs], arrays['senses'][new_rows], arrays['rhs'][new_rows])
+                for i, position in zip(new_rows, positions):
+                    key, signature, rhs = rows[i]
+                    self.constraints[key] = (position, signature, rhs)
+                self.changes['constraints_added'] = len(new_rows)
+            constraint_positions = np.array([self.constraints[key][0] for key, signature, rhs in rows],
+                                            dtype=np.int64)
+        return variable_positions, constraint_positions
+
+    def _remove_variables(self, keys):
+        if len(keys) > 0:
+            removed = np.sort([self.variables.pop(key)[0] for key in keys])
+            self.backend.remove_variables(removed)
+            for key, (position, values) in self.variables.items():
+                self.variables[key] = (position - np.searchsorted(removed, position), values)
+        self.changes['variables_removed'] = len(keys)
+
+    def _remove_constraints(self, keys):
+        if len(keys) > 0:
+            removed = np.sort([self.constraints.pop(key)[0] for key in keys])
+            self.backend.remove_constraints(removed)
+            for key, (position, signature, rhs) in self.constraints.items():
+                self.constraints[key] = (position - np.searchsorted(removed, position), signature, rhs)
+        self.changes['constraints_removed'] = len(keys)
+
+    def _update_variables(self, variables):
+        variable_positions = np.empty(len(variables), dtype=np.int64)
+        new_variables = []
+        bound_changes = []
+        type_changes = []
+        cost_changes = []
+        for i, (key, values) in enumerate(variables):
+            if key in self.variables:
+                position, old_values = self.variables[key]
+                if values != old_values:
+                    if values[0] != old_values[0] or values[1] != old_values[1]:
+                        bound_changes.append((position, values[0], values[1]))
+                    if values[2] != old_values[2]:
+                        type_changes.append((position, values[2]))
+                    if values[3] != old_values[3]:
+                        cost_changes.append((position, values[3]))
+                    self.variables[key] = (position, values)
+                    self.changes['variables_updated'] += 1
+                variable_positions[i] = position
+            else:
+                new_variables.append(i)
+
+        if len(bound_changes) > 0:
+            self.backend.set_variable_bounds(*zip(*bound_changes))
+        if len(type_changes) > 0:
+            self.backend.set_variable_types(*zip(*type_changes))
+        if len(cost_changes) > 0:
+            self.backend.set_costs(*zip(*cost_changes))
+
+        if len(new_variables) > 0:
+            lower_bounds, upper_bounds, types, costs = zip(*[variables[i][1] for i in new_variables])
+            positions = self.backend.add_variables(lower_bounds, upper_bounds, types, costs)
+            variable_positions[new_variables] = positions
+            for i, position in zip(new_variables, positions):
+                key, values = variables[i]
+                self.variables[key] = (position, values)
+            self.changes['variables_added'] = len(new_variables)
+        return variable_positions
+
+    def _update_constraints(self, rows):
+        new_rows = []
+        rhs_changes = []
+        for i, (key, signature, rhs) in enumerate(rows):
+            if key in self.constraints:
+                position, signature, old_rhs = self.constraints[key]
+                if rhs != old_rhs:
+                    rhs_changes.append((position, rhs))
+                    self.constraints[key] = (position, signature, rhs)
+            else:
+                new_rows.append(i)
+
+        if len(rhs_changes) > 0:
+            self.backend.set_rhs(*zip(*rhs_changes))
+            self.changes['constraints_updated'] = len(rhs_changes)
+        return new_rows
+
+    def _add_sos(self, sos_variables):
+        for interconnector, weights in sos_variables.groupby('interconnector'):
+            weights = weights.sort_values('loss_segment')
+            self.backend.add_sos2(list(weights['position']), list(weights['loss_segment']))
+
+
+def get_keys(frames, id_column, value_columns, kind=None):
+    """Map the ids in each frame to a key made from the group name and the values of the identifying columns.
+
+    An occurrence count is added to each key so rows with the same identifying values still get distinct keys.
+    """
+    keys = {}
+    for group, frame in frames.items():
+        key_columns = [column for column in frame.columns if column not in value_columns]
+        if len(key_columns) > 0:
+            occurrence = frame.groupby(key_columns, sort=False, dropna=False).cumcount()
+        else:
+            occurrence = range(len(frame.index))
+        prefix = (group,) if kind is None else (kind, group)
+        keys.update(zip(frame[id_column], [prefix + values for values in
+                                           zip(*[frame[column] for column in key_columns], occurrence)]))
+    return keys
+
+
+def get_prices_by_perturbation(solver, lp_constraints, market_rhs_and_type, pricing_workers=None, model_inputs=None,
+                               relax=False, statistics=None, presolve=False, aggregate=False, limits=None):
+    """Price each market constraint as the change in objective value when its rhs is increased by 1.0.
+
+    The problem is re-solved once for each market constraint. Each perturbed problem is independent of the others, so
+    if pricing_workers is given the re-solves are shared out over a pool of that many worker processes. Each worker
+    builds and solves its own copy of the model once, from model_inputs (the inputs to :func:`dispatch`), presolved and
+    aggregated if presolve and aggregate are True and with the solver limits given, and then prices the constraints it
+    is sent.
+
+    A +1.0 change to a rhs rarely moves the optimal solution far, so re-solves are warm started from the base
+    solution. If relax is True, i.e. the problem has no integer or SOS structure that changes the optimal solution,
+    re-solves are done as linear programs which start from the basis of the previous solve, otherwise the base solution
+    is given to the solver as a MIP start. If a statistics dict is given the details of each re-solve are saved to it
+    under the key 'pricing', as a DataFrame with the columns constraint_id, warm_start, status, iterations and
+    seconds. Iterations are only reported by the 'highs' backend, with 'cbc' they are None, see
+    :meth:`solver_backends.MipBackend.iterations`.
+    """
+    start_obj = solver.objective_value()
+    constraint_ids = [id for cg in market_rhs_and_type.keys() for id in market_rhs_and_type[cg]['constraint_id']]
+    rhs = [value for cg in market_rhs_and_type.keys() for value in market_rhs_and_type[cg]['rhs']]
+    if pricing_workers is not None and pricing_workers > 1 and len(constraint_ids) > 1:
+        workers = min(pricing_workers, len(constraint_ids))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_pricing_worker,
+                                 initargs=(model_inputs, solver.name, relax, presolve, aggregate, limits)) as pool:
+            results = list(pool.map(_price_in_worker, constraint_ids, rhs, [start_obj] * len(constraint_ids)))
     else:
-        print('missing types')
-    return con
+        start = None if relax else solver.primal_values()
+        results = [perturbation_price(solver, lp_constraints[id], constraint_rhs, start_obj, start, relax)
+                   for id, constraint_rhs in zip(constraint_ids, rhs)]
+    prices = dict(zip(constraint_ids, [price for price, status, iterations, seconds in results]))
+    for constraint_group in market_rhs_and_type.keys():
+        market_rhs_and_type[constraint_group]['price'] = \
+            [prices[id] for id in market_rhs_and_type[constraint_group]['constraint_id']]
+    if statistics is not None:
+        statistics['pricing'] = pd.DataFrame({
+            'constraint_id': constraint_ids,
+            'warm_start': 'lp_basis' if relax else 'mip_start',
+            'status': [status for price, status, iterations, seconds in results],
+            'iterations': [iterations for price, status, iterations, seconds in results],
+            'seconds': [seconds for price, status, iterations, seconds in results]})
+    return market_rhs_and_type
+
 
+def perturbation_price(solver, constraint_position, rhs, start_obj, start=None, relax=False):
+    """Re-solve with the rhs of the constraint increased by 1.0 and return the change in objective value.
+
+    Returns
+    -------
+    tuple
+        The change in objective value (NaN if the re-solve found no feasible solution), the status of the re-solve,
+        the number of simplex iterations the re-solve took (None with the 'cbc' backend, which does not report it)
+        and the time taken in seconds.
+    """
+    solver.set_rhs([constraint_position], [rhs + 1.0])
+    if start is not None:
+        solver.set_start(start)
+    t0 = time()
+    status = solver.solve(relax=relax)
+    seconds = time() - t0
+    marginal_cost = solver.objective_value() - start_obj if status in ['optimal', 'feasible'] else np.nan
+    iterations = solver.iterations()
+    solver.set_rhs([constraint_position], [rhs])
+    return marginal_cost, status, iterations, seconds
 
-def get_sos(var_list, lhs, column_ids):
-    columns_in_constraint = np.argwhere(~np.isnan(lhs)).flatten()
-    column_ids_in_constraint = column_ids[columns_in_constraint]
-    lhs_variables = var_list[column_ids_in_constraint]
-    return lhs_variables
 
+# The solved model held by each pricing worker process, and the solution to warm start re-solves from.
+_worker_model = {}
 
-def get_price(row_index, prob):
-    row_index = get_con_by_name(prob.constrs, str(row_index))
-    constraint = prob.constrs[row_index]
-    return constraint.pi
 
+def _start_pricing_worker(model_inputs, backend, relax, presolve, aggregate, limits):
+    model = PersistentModel(backend, reuse=False)
+    variable_positions, lp_constraints, sos_variables = model.update(*model_inputs, presolve=presolve,
+                                                                     aggregate=aggregate)
+    if limits is not None:
+        model.backend.set_limits(**limits)
+    model.backend.solve(relax=relax)
+    _worker_model['solver'] = model.backend
+    _worker_model['constraints'] = lp_constraints
+    _worker_model['start'] = None if relax else model.backend.primal_values()
+    _worker_model['relax'] = relax
+
+
+def _price_in_worker(constraint_id, rhs, start_obj):
+    return perturbation_price(_worker_model['solver'], _worker_model['constraints'][constraint_id], rhs, start_obj,
+                              _worker_model['start'], _worker_model['relax'])
+
+
+def get_prices_from_duals(solver, lp_constraints, sos_variables, market_rhs_and_type):
+    """Price each market constraint using its shadow price, found by re-solving once as a linear program.
+
+    The integer and SOS structure of the solved problem is fixed at its optimal values, so the linear program is the
+    one the mixed integer solution sits in, and the shadow price of every market constraint is read in a single pass.
+    The original variable bounds are restored afterwards, also if the re-solve fails, so a solver model that is kept
+    between dispatches is left as it was.
+    """
+    original_bounds = fix_integer_structure(solver, sos_variables)
+    try:
+        status = solver.solve(relax=True)
+        if status != 'optimal':
+            raise ValueError('Linear program infeasible')
+        duals = solver.duals()
+    finally:
+        solver.set_variable_bounds(*original_bounds)
+    for constraint_group in market_rhs_and_type.keys():
+        market_rhs_and_type[constraint_group]['price'] = \
+            duals[[lp_constraints[id] for id in market_rhs_and_type[constraint_group]['constraint_id']]]
+    return market_rhs_and_type
+
+
+def fix_integer_structure(solver, sos_variables):
+    """Fix integer variables at their optimal values and restrict each SOS2 set of weights to its optimal segment.
+
+    Where an SOS2 set has only one non zero weight, i.e. the solution sits on a break point, the segment above the
+    break point is used, or the segment below if it is the last break point.
+
+    Returns
+    -------
+    tuple
+        The positions of the variables whose bounds were changed, and their original lower and upper bounds.
+    """
+    values = solver.primal_values()
+    lower_bounds, upper_bounds = solver.variable_bounds()
+    new_lower_bounds = lower_bounds.copy()
+    new_upper_bounds = upper_bounds.copy()
+
+    integer = np.isin(solver.variable_types(), ['integer', 'binary'])
+    new_lower_bounds[integer] = new_upper_bounds[integer] = np.round(values[integer])
+    changed = integer.copy()
+
+    if sos_variables is not None:
+        for interconnector, weights in sos_variables.groupby('interconnector'):
+            weights = np.asarray(weights.sort_values('loss_segment')['position'])
+            active = [i for i, position in enumerate(weights) if values[position] > 1e-9]
+            if len(active) == 1:
+                active.append(active[0] + 1 if active[0] + 1 < len(weights) else active[0] - 1)
+            inactive = np.delete(weights, active)
+            new_upper_bounds[inactive] = 0.0
+            changed[inactive] = True
 
-def get_con_by_name(constraints, name):
-    i = 0
-    for con in constraints:
-        if con.name == name:
-            return i
-        i += 1
\ No newline at end of file
+    positions = np.flatnonzero(changed)
+    solver.set_variable_bounds(positions, new_lower_bounds[positions], new_upper_bounds[positions])
+    return positions, lower_bounds[positions], upper_bounds[positions]
@@ -0,0 +1,72 @@
+import os
+import pandas as pd
+from pandas._testing import assert_frame_equal
+from nempy import markets, dispatch_cache
+
+
+def build_market(cache, demand):
+    market = markets.Spot(cache=cache)
+    market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+    market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0], '2': [20.0, 30.0]}))
+    market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0], '2': [60.0, 130.0]}))
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [demand]}))
+    return market
+
+
+def test_repeated_dispatch_is_served_from_the_cache(tmp_path):
+    cache = dispatch_cache.DispatchCache(directory=str(tmp_path))
+    solved = build_market(cache, 60.0)
+    solved.dispatch()
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cached = build_market(cache, 60.0)
+    cached.dispatch()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert_frame_equal(cached.get_unit_dispatch(), solved.get_unit_dispatch())
+    assert_frame_equal(cached.get_energy_prices(), solved.get_energy_prices())
+
+    # Dispatching the same market again, with the results of the last dispatch held in its inputs, is also a hit.
+    cached.dispatch()
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    changed = build_market(cache, 70.0)
+    changed.dispatch()
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert list(changed.get_unit_dispatch()['dispatch']) == [40.0, 30.0]
+
+    # A new cache over the same directory finds results on disk.
+    disk_cache = dispatch_cache.DispatchCache(directory=str(tmp_path))
+    from_disk = build_market(disk_cache, 60.0)
+    from_disk.dispatch()
+    assert (disk_cache.hits, disk_cache.disk_hits, disk_cache.misses) == (1, 1, 0)
+    assert_frame_equal(from_disk.get_energy_prices(), solved.get_energy_prices())
+
+
+def test_cache_evicts_least_recently_used_results(tmp_path):
+    cache = dispatch_cache.DispatchCache(max_entries=2, directory=str(tmp_path), max_disk_bytes=0)
+    for key in ['a', 'b', 'c']:
+        cache.put(key, key)
+    assert list(cache.memory.keys()) == ['b', 'c']
+    assert os.listdir(str(tmp_path)) == []
+    assert cache.get('a') is None
+    assert cache.get('c') == 'c'
+
+
+def test_cached_results_keep_their_statistics_and_dispatch_options():
+    cache = dispatch_cache.DispatchCache()
+    solved = build_market(cache, 60.0)
+    solved.dispatch(merit_order=False)
+    cached = build_market(cache, 60.0)
+    cached.dispatch(merit_order=False)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert_frame_equal(cached.get_pricing_statistics(), solved.get_pricing_statistics())
+    assert_frame_equal(cached.get_solve_status(), solved.get_solve_status())
+
+    # Merit order, or a decomposed dispatch, is not served the results of the whole problem solved at once.
+    merit_order = build_market(cache, 60.0)
+    merit_order.dispatch()
+    decomposed = build_market(cache, 60.0)
+    decomposed.dispatch(merit_order=False, decompose=True)
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert list(merit_order.get_unit_dispatch()['dispatch']) == [40.0, 20.0]
+    assert list(merit_order.get_energy_prices()['price']) == [100.0]
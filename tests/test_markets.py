@@ -1,6 +1,43 @@
+import pickle
+import pytest
+import numpy as np
 import pandas as pd
 from pandas._testing import assert_frame_equal
-from nempy import markets
+from nempy import markets, solver_interface
+
+
+def energy_market(unit_info, volume_bids, price_bids, demand, **market_options):
+    # A market with the units in unit_info, bidding the band volumes and prices given for each band, in the order of
+    # the units, to meet the demand given for each region.
+    market = markets.Spot(**market_options)
+    market.set_unit_info(pd.DataFrame(unit_info))
+    market.set_unit_volume_bids(pd.DataFrame(dict({'unit': unit_info['unit']}, **volume_bids)))
+    market.set_unit_price_bids(pd.DataFrame(dict({'unit': unit_info['unit']}, **price_bids)))
+    market.set_demand_constraints(pd.DataFrame({'region': list(demand), 'demand': list(demand.values())}))
+    return market
+
+
+def quadratic_losses(flow):
+    return 0.0002 * flow ** 2
+
+
+def two_region_market(demand=(60.0, 180.0), limit=150.0, break_points=None, **loss_options):
+    # Unit A in NSW and unit B in VIC, each bidding two bands, joined by an interconnector from NSW to VIC, with
+    # quadratic losses interpolated between the break points, if they are given.
+    market = energy_market({'unit': ['A', 'B'], 'region': ['NSW', 'VIC']}, {'1': [200.0, 100.0], '2': [50.0, 50.0]},
+                           {'1': [50.0, 90.0], '2': [60.0, 120.0]}, {'NSW': demand[0], 'VIC': demand[1]})
+    market.set_interconnectors(pd.DataFrame({
+        'interconnector': ['little_link'], 'to_region': ['VIC'], 'from_region': ['NSW'], 'max': [limit],
+        'min': [-limit]}))
+    if break_points is not None:
+        market.set_interconnector_losses(
+            pd.DataFrame({'interconnector': ['little_link'], 'from_region_loss_share': [0.5],
+                          'loss_function': [quadratic_losses]}),
+            pd.DataFrame({'interconnector': ['little_link'] * len(break_points),
+                          'loss_segment': list(range(1, len(break_points) + 1)),
+                          'break_point': list(break_points)}),
+            **loss_options)
+    return market
 
 
 def test_one_region_energy_market():
@@ -412,13 +449,730 @@ def test_raise_6s_and_raise_reg():
     assert_frame_equal(simple_market.get_fcas_prices(), expected_fcas_prices)
 
 
+def test_dual_pricing_matches_perturbation_pricing_with_interconnector_losses():
+    perturbation_market = two_region_market(limit=400.0, break_points=[-400.0, -200.0, 0.0, 200.0, 400.0])
+    perturbation_market.dispatch(price_method='perturbation')
+    dual_market = two_region_market(limit=400.0, break_points=[-400.0, -200.0, 0.0, 200.0, 400.0])
+    dual_market.dispatch(price_method='dual')
+
+    assert_frame_equal(dual_market.get_unit_dispatch(), perturbation_market.get_unit_dispatch())
+    assert_frame_equal(dual_market.get_energy_prices(), perturbation_market.get_energy_prices())
+    # The interconnector is not at its limit, so VIC is supplied from NSW, with the losses of the 0 to 200 MW
+    # segment, 4 % of flow, shared equally by the two regions.
+    flow = 180.0 / 0.98
+    assert list(dual_market.get_unit_dispatch()['dispatch']) == pytest.approx([60.0 + flow * 1.02, 0.0])
+    assert list(dual_market.get_interconnector_flows()['flow']) == pytest.approx([flow])
+    assert list(dual_market.get_energy_prices()['price']) == pytest.approx([60.0, 60.0 * 1.02 / 0.98])
+
+
+def test_unknown_price_method_raises():
+    market = markets.Spot()
+    market.set_unit_info(pd.DataFrame({'unit': ['A'], 'region': ['NSW']}))
+    market.set_unit_volume_bids(pd.DataFrame({'unit': ['A'], '1': [100.0]}))
+    market.set_unit_price_bids(pd.DataFrame({'unit': ['A'], '1': [50.0]}))
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [20.0]}))
+    with pytest.raises(ValueError):
+        market.dispatch(price_method='guess')
+
+
+def test_parallel_perturbation_pricing_matches_serial_pricing():
+    def build_market():
+        market = markets.Spot()
+        market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        market.set_unit_volume_bids(pd.DataFrame({
+            'unit': ['A', 'A', 'B', 'B', 'B'],
+            'service': ['energy', 'raise_6s', 'energy', 'raise_6s', 'raise_reg'],
+            '1': [100.0, 10.0, 110.0, 15.0, 15.0]}))
+        market.set_unit_price_bids(pd.DataFrame({
+            'unit': ['A', 'A', 'B', 'B', 'B'],
+            'service': ['energy', 'raise_6s', 'energy', 'raise_6s', 'raise_reg'],
+            '1': [50.0, 35.0, 60.0, 20.0, 30.0]}))
+        fcas_trapeziums = pd.DataFrame({
+            'unit': ['B', 'B', 'A'],
+            'service': ['raise_reg', 'raise_6s', 'raise_6s'],
+            'max_availability': [15.0, 15.0, 10.0],
+            'enablement_min': [50.0, 50.0, 70.0],
+            'low_break_point': [65.0, 65.0, 80.0],
+            'high_break_point': [95.0, 95.0, 100.0],
+            'enablement_max': [110.0, 110.0, 110.0]})
+        market.set_fcas_max_availability(fcas_trapeziums.loc[:, ['unit', 'service', 'max_availability']])
+        market.set_energy_and_regulation_capacity_constraints(
+            fcas_trapeziums[fcas_trapeziums['service'] == 'raise_reg'])
+        market.set_joint_capacity_constraints(fcas_trapeziums[fcas_trapeziums['service'] == 'raise_6s'])
+        market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [195.0]}))
+        market.set_fcas_requirements_constraints(pd.DataFrame({
+            'set': ['nsw_regulation_requirement', 'nsw_raise_6s_requirement'],
+            'region': ['NSW', 'NSW'],
+            'service': ['raise_reg', 'raise_6s'],
+            'volume': [10.0, 10.0]}))
+        return market
+
+    serial_market = build_market()
+    serial_market.dispatch()
+    parallel_market = build_market()
+    parallel_market.dispatch(pricing_workers=2)
+
+    assert_frame_equal(parallel_market.get_unit_dispatch(), serial_market.get_unit_dispatch())
+    assert_frame_equal(parallel_market.get_energy_prices(), serial_market.get_energy_prices())
+    assert_frame_equal(parallel_market.get_fcas_prices(), serial_market.get_fcas_prices())
+    assert list(parallel_market.get_fcas_prices()['price']) == [45.0, 35.0]
+
+
+def test_pricing_re_solves_are_warm_started():
+    market = markets.Spot()
+    market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'VIC']}))
+    market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [200.0, 100.0]}))
+    market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 90.0]}))
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [20.0, 90.0]}))
+    market.set_interconnectors(pd.DataFrame({
+        'interconnector': ['little_link'], 'to_region': ['VIC'], 'from_region': ['NSW'], 'max': [50.0],
+        'min': [-50.0]}))
+    market.dispatch()
+
+    statistics = market.get_pricing_statistics()
+    assert list(statistics['constraint_id']) == list(market.market_constraints_rhs_and_type['demand']['constraint_id'])
+    assert list(statistics['warm_start']) == ['lp_basis', 'lp_basis']
+    assert list(market.get_energy_prices()['price']) == [50.0, 90.0]
 
+    def constant_losses(flow):
+        return abs(flow) * 0.05
 
-
-
-
-
-
-
-
-
+    market.set_interconnector_losses(
+        pd.DataFrame({'interconnector': ['little_link'], 'from_region_loss_share': [0.5],
+                      'loss_function': [constant_losses]}),
+        pd.DataFrame({'interconnector': ['little_link'] * 3, 'loss_segment': [1, 2, 3],
+                      'break_point': [-50.0, 0.0, 50.0]}))
+    market.dispatch()
+
+    assert list(market.get_pricing_statistics()['warm_start']) == ['mip_start', 'mip_start']
+
+
+def test_incremental_dispatch_matches_fresh_dispatch():
+    def set_interval_inputs(market, units, volumes, prices, demand):
+        market.set_unit_info(pd.DataFrame({'unit': units, 'region': ['NSW'] * len(units)}))
+        market.set_unit_volume_bids(pd.DataFrame({'unit': units, '1': volumes, '2': [20.0] * len(units)}))
+        # Distinct second band prices, so the optimal dispatch is unique.
+        market.set_unit_price_bids(pd.DataFrame({'unit': units, '1': prices,
+                                                 '2': [150.0 + 10.0 * i for i in range(len(units))]}))
+        market.set_unit_capacity_constraints(pd.DataFrame({'unit': units, 'capacity': [60.0] * len(units)}))
+        market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [demand]}))
+
+    intervals = [
+        (['A', 'B'], [40.0, 30.0], [50.0, 60.0], 60.0),
+        # New volumes, prices and demand, only bounds, costs and rhs values should change.
+        (['A', 'B'], [30.0, 35.0], [70.0, 40.0], 75.0),
+        # Unit C appears.
+        (['A', 'B', 'C'], [30.0, 35.0, 50.0], [70.0, 40.0, 10.0], 75.0),
+        # Unit A disappears.
+        (['B', 'C'], [35.0, 50.0], [40.0, 10.0], 75.0)]
+
+    incremental_market = markets.Spot(incremental=True)
+    changes = []
+    for units, volumes, prices, demand in intervals:
+        set_interval_inputs(incremental_market, units, volumes, prices, demand)
+        incremental_market.dispatch()
+        changes.append(incremental_market.results.solve_statistics['model_update'])
+
+        fresh_market = markets.Spot()
+        set_interval_inputs(fresh_market, units, volumes, prices, demand)
+        fresh_market.dispatch()
+
+        assert_frame_equal(incremental_market.get_unit_dispatch(), fresh_market.get_unit_dispatch())
+        assert_frame_equal(incremental_market.get_energy_prices(), fresh_market.get_energy_prices())
+
+    assert changes[0]['rebuilt']
+    assert not changes[1]['rebuilt']
+    assert changes[1]['variables_added'] == changes[1]['constraints_added'] == 0
+    assert changes[1]['variables_removed'] == changes[1]['constraints_removed'] == 0
+    # Only the band 1 bids of A and B changed.
+    assert changes[1]['variables_updated'] == 2
+    assert changes[2]['variables_added'] == 2
+    # The capacity constraint of C, plus the demand constraint, which gains C's bids.
+    assert changes[2]['constraints_added'] == 2
+    assert changes[3]['variables_removed'] == 2
+    assert changes[3]['constraints_removed'] == 2
+
+
+def test_highs_backend_matches_cbc_backend_with_interconnector_losses():
+    pytest.importorskip('highspy')
+
+    for price_method in ['perturbation', 'dual']:
+        cbc_market = two_region_market(limit=400.0, break_points=[-400.0, -200.0, 0.0, 200.0, 400.0])
+        cbc_market.dispatch(price_method=price_method, backend='cbc')
+        # HiGHS has no SOS2 constraints, so the loss interpolation weights are limited by binary variables.
+        highs_market = two_region_market(limit=400.0, break_points=[-400.0, -200.0, 0.0, 200.0, 400.0])
+        highs_market.dispatch(price_method=price_method, backend='highs')
+
+        assert_frame_equal(highs_market.get_unit_dispatch(), cbc_market.get_unit_dispatch())
+        assert_frame_equal(highs_market.get_energy_prices(), cbc_market.get_energy_prices())
+        assert_frame_equal(highs_market.get_interconnector_flows(), cbc_market.get_interconnector_flows())
+        assert list(highs_market.get_interconnector_flows()['flow']) == pytest.approx([180.0 / 0.98])
+        assert list(highs_market.get_energy_prices()['price']) == pytest.approx([60.0, 60.0 * 1.02 / 0.98])
+        if price_method == 'perturbation':
+            # Only HiGHS reports the iterations of each pricing re-solve.
+            assert all(iterations >= 0 for iterations in highs_market.get_pricing_statistics()['iterations'])
+            assert cbc_market.get_pricing_statistics()['iterations'].isna().all()
+
+
+def test_dispatch_timings_are_only_recorded_when_timing_is_on():
+    def build(market):
+        market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0]}))
+        market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0]}))
+        market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A'], 'capacity': [15.0]}))
+        market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [40.0]}))
+
+    untimed_market = markets.Spot()
+    build(untimed_market)
+    untimed_market.dispatch()
+    with pytest.raises(markets.check.ModelBuildError):
+        untimed_market.get_timings()
+
+    timed_market = markets.Spot(incremental=True, timing=True)
+    for interval in range(2):
+        build(timed_market)
+        timed_market.dispatch()
+        timings = timed_market.get_timings()
+        assert list(timings['phase']) == ['lhs_assembly', 'problem_arrays', 'variable_creation',
+                                          'constraint_creation', 'initial_solve', 'result_extraction', 'pricing']
+        assert (timings['seconds'] >= 0.0).all()
+    assert_frame_equal(timed_market.get_unit_dispatch(), untimed_market.get_unit_dispatch())
+
+
+def test_decomposed_dispatch_matches_whole_dispatch():
+    def build():
+        market = energy_market({'unit': ['A', 'B', 'C', 'D'], 'region': ['NSW', 'VIC', 'TAS', 'TAS']},
+                               {'1': [100.0, 50.0, 80.0, 60.0], '2': [50.0, 50.0, 20.0, 20.0]},
+                               {'1': [50.0, 70.0, 20.0, 30.0], '2': [90.0, 100.0, 40.0, 45.0]},
+                               {'NSW': 60.0, 'VIC': 150.0, 'TAS': 70.0})
+        market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A'], 'capacity': [120.0]}))
+        # The TAS link has a fixed flow, so TAS can be dispatched on its own.
+        market.set_interconnectors(pd.DataFrame({
+            'interconnector': ['little_link', 'fixed_link'], 'to_region': ['VIC', 'VIC'],
+            'from_region': ['NSW', 'TAS'], 'max': [100.0, 40.0], 'min': [-100.0, 40.0]}))
+        return market
+
+    whole_market = build()
+    whole_market.dispatch()
+    for component_workers in [None, 2]:
+        decomposed_market = build()
+        decomposed_market.dispatch(decompose=True, component_workers=component_workers)
+        assert decomposed_market.results.solve_statistics['components'] == 2
+        assert_frame_equal(decomposed_market.get_unit_dispatch(), whole_market.get_unit_dispatch())
+        assert_frame_equal(decomposed_market.get_energy_prices(), whole_market.get_energy_prices())
+        assert_frame_equal(decomposed_market.get_interconnector_flows(), whole_market.get_interconnector_flows())
+    # TAS exports 40 MW over the fixed link, and with A at its capacity NSW and VIC are priced by B's second band.
+    assert list(whole_market.get_unit_dispatch()['dispatch']) == pytest.approx([120.0, 50.0, 80.0, 30.0])
+    assert list(whole_market.get_energy_prices()['price']) == pytest.approx([100.0, 100.0, 30.0])
+
+
+def test_lp_loss_formulation_matches_sos2_formulation_for_convex_losses():
+    break_points = [-150.0, -100.0, -50.0, 0.0, 50.0, 100.0, 150.0]
+    sos2_market = two_region_market(break_points=break_points)
+    sos2_market.dispatch()
+    lp_market = two_region_market(break_points=break_points, formulation='lp')
+    lp_market.dispatch()
+    assert 'interpolation_weights' not in lp_market.decision_variables
+    assert list(lp_market.get_pricing_statistics()['warm_start']) == ['lp_basis', 'lp_basis']
+    assert_frame_equal(lp_market.get_unit_dispatch(), sos2_market.get_unit_dispatch())
+    assert_frame_equal(lp_market.get_energy_prices(), sos2_market.get_energy_prices())
+    assert_frame_equal(lp_market.get_interconnector_flows(), sos2_market.get_interconnector_flows())
+    # The link is at its limit, with losses of 0.0002 * 150 ** 2 MW shared equally by the two regions.
+    assert list(lp_market.get_unit_dispatch()['dispatch']) == pytest.approx([212.25, 32.25])
+    assert list(lp_market.get_interconnector_flows().iloc[0, 1:]) == pytest.approx([150.0, 4.5])
+    assert list(lp_market.get_energy_prices()['price']) == pytest.approx([60.0, 90.0])
+
+    # The flow is kept within the break points, even where the interconnector could carry more.
+    narrow_market = two_region_market(break_points=[-100.0, 0.0, 100.0], formulation='lp')
+    narrow_market.dispatch()
+    assert list(narrow_market.get_interconnector_flows().iloc[0, 1:]) == pytest.approx([100.0, 2.0])
+    assert list(narrow_market.get_unit_dispatch()['dispatch']) == pytest.approx([161.0, 81.0])
+
+
+def test_lp_loss_formulation_falls_back_to_sos2_with_negative_price_bids():
+    # A's first band is negative priced, so with the 'lp' formulation the losses could be over stated to dispatch
+    # more of it.
+    negative_prices = pd.DataFrame({'unit': ['A', 'B'], '1': [-20.0, 90.0], '2': [60.0, 120.0]})
+    lp_market = two_region_market(demand=(20.0, 100.0), break_points=[-150.0, 0.0, 150.0], formulation='lp')
+    lp_market.set_unit_price_bids(negative_prices)
+    lp_market.dispatch()
+    sos2_market = two_region_market(demand=(20.0, 100.0), break_points=[-150.0, 0.0, 150.0])
+    sos2_market.set_unit_price_bids(negative_prices)
+    sos2_market.dispatch()
+
+    assert_frame_equal(lp_market.get_unit_dispatch(), sos2_market.get_unit_dispatch())
+    assert_frame_equal(lp_market.get_energy_prices(), sos2_market.get_energy_prices())
+    assert_frame_equal(lp_market.get_interconnector_flows(), sos2_market.get_interconnector_flows())
+    # VIC is supplied from NSW with losses of 3 % of flow, not over stated.
+    flow = 100.0 / 0.985
+    assert list(lp_market.get_interconnector_flows().iloc[0, 1:]) == pytest.approx([flow, 0.03 * flow])
+    assert list(lp_market.get_energy_prices()['price']) == pytest.approx([-20.0, -20.0 * 1.015 / 0.985])
+    # The market keeps its own 'lp' losses.
+    assert 'interpolation_weights' not in lp_market.decision_variables
+    assert 'interconnector_loss_segments' in lp_market.constraints_rhs_and_type
+
+
+def test_lp_loss_formulation_rejects_non_convex_losses():
+    market = markets.Spot()
+    market.set_interconnectors(pd.DataFrame({
+        'interconnector': ['little_link'], 'to_region': ['VIC'], 'from_region': ['NSW'], 'max': [100.0],
+        'min': [-100.0]}))
+
+    def concave_losses(flow):
+        return -0.001 * flow ** 2
+
+    loss_functions = pd.DataFrame({'interconnector': ['little_link'], 'from_region_loss_share': [0.5],
+                                   'loss_function': [concave_losses]})
+    break_points = pd.DataFrame({'interconnector': ['little_link'] * 3, 'loss_segment': [1, 2, 3],
+                                 'break_point': [-100.0, 0.0, 100.0]})
+    with pytest.raises(markets.check.ModelBuildError):
+        market.set_interconnector_losses(loss_functions, break_points, formulation='lp')
+    with pytest.raises(ValueError):
+        market.set_interconnector_losses(loss_functions, break_points, formulation='tangent')
+
+
+def test_adaptive_break_points_match_all_break_points():
+    break_points = [-400.0 + 50.0 * i for i in range(17)]
+    full_market = two_region_market(limit=400.0, break_points=break_points)
+    full_market.dispatch()
+    adaptive_market = two_region_market(limit=400.0, break_points=break_points, coarse_break_points=3)
+    adaptive_market.dispatch()
+    refinement = adaptive_market.results.solve_statistics['loss_refinement']
+    assert refinement == {'dispatches': 2, 'break_points': 5}
+    assert_frame_equal(adaptive_market.get_unit_dispatch(), full_market.get_unit_dispatch())
+    assert_frame_equal(adaptive_market.get_energy_prices(), full_market.get_energy_prices())
+    assert_frame_equal(adaptive_market.get_interconnector_flows(), full_market.get_interconnector_flows())
+    # The flow lands in the 150 to 200 MW segment, where losses are 0.07 * flow - 6.0 MW.
+    flow = 177.0 / 0.965
+    assert list(adaptive_market.get_interconnector_flows().iloc[0, 1:]) == pytest.approx([flow, 0.07 * flow - 6.0])
+    assert list(adaptive_market.get_energy_prices()['price']) == pytest.approx([60.0, 60.0 * 1.035 / 0.965])
+
+
+@pytest.mark.parametrize('spacing, refinement', [(10.0, {'dispatches': 2, 'break_points': 5}),
+                                                  (0.5, {'dispatches': 3, 'break_points': 14})])
+def test_adaptive_break_points_only_add_break_points_around_the_flow(spacing, refinement):
+    break_points = list(np.arange(-400.0, 400.0 + spacing, spacing))
+    full_market = two_region_market(limit=400.0, break_points=break_points)
+    full_market.dispatch()
+    adaptive_market = two_region_market(limit=400.0, break_points=break_points, coarse_break_points=3)
+    adaptive_market.dispatch()
+    # However dense the break points, only those within a few MW of the flow are added, and the final dispatch is
+    # priced as it is solved, rather than being solved again.
+    assert adaptive_market.results.solve_statistics['loss_refinement'] == refinement
+    assert len(adaptive_market.get_pricing_statistics().index) == 2
+    assert_frame_equal(adaptive_market.get_unit_dispatch(), full_market.get_unit_dispatch())
+    assert_frame_equal(adaptive_market.get_energy_prices(), full_market.get_energy_prices())
+    assert_frame_equal(adaptive_market.get_interconnector_flows(), full_market.get_interconnector_flows())
+
+
+def test_adaptive_break_points_leave_the_market_inputs_as_they_are():
+    market = two_region_market(limit=400.0, break_points=[-400.0 + 50.0 * i for i in range(17)],
+                               coarse_break_points=3)
+    groups = ['decision_variables', 'constraints_rhs_and_type', 'constraints_dynamic_rhs_and_type',
+              'market_constraints_rhs_and_type', 'objective_function_components']
+    inputs = {group: {name: frame.copy() for name, frame in getattr(market, group).items()} for group in groups}
+    lhs_coefficients = market.lhs_coefficients.copy()
+
+    for dispatch in range(2):
+        market.dispatch()
+        # Every dispatch starts again from the coarse break points.
+        assert market.results.solve_statistics['loss_refinement'] == {'dispatches': 2, 'break_points': 5}
+        for group in groups:
+            assert list(getattr(market, group)) == list(inputs[group])
+            for name, frame in inputs[group].items():
+                assert_frame_equal(getattr(market, group)[name], frame)
+        assert_frame_equal(market.lhs_coefficients, lhs_coefficients)
+    assert len(market.decision_variables['interpolation_weights'].index) == 3
+
+
+def test_aggregated_bid_bands_give_the_same_dispatch():
+    def build():
+        market = energy_market({'unit': ['A', 'B', 'C', 'D'], 'region': ['NSW', 'NSW', 'NSW', 'VIC']},
+                               {'1': [20.0, 30.0, 25.0, 50.0], '2': [40.0, 40.0, 40.0, 50.0],
+                                '3': [10.0, 10.0, 10.0, 10.0]},
+                               {'1': [50.0, 50.0, 50.0, 50.0], '2': [100.0, 100.0, 100.0, 100.0],
+                                '3': [150.0, 160.0, 170.0, 180.0]},
+                               {'NSW': 180.0, 'VIC': 60.0})
+        # C's capacity constraint sets it apart from A and B.
+        market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['C'], 'capacity': [50.0]}))
+        return market
+
+    whole_market = build()
+    whole_market.dispatch()
+    aggregated_market = build()
+    aggregated_market.dispatch(aggregate=True)
+    # A and B's first and second bands are merged, the third bands are at different prices.
+    assert aggregated_market.results.solve_statistics['aggregation'] == {'variables_before': 12,
+                                                                         'variables_after': 10}
+    assert_frame_equal(aggregated_market.get_unit_dispatch(), whole_market.get_unit_dispatch())
+    assert_frame_equal(aggregated_market.get_energy_prices(), whole_market.get_energy_prices())
+    # NSW demand takes every first and second band, with C held to 50 MW, so A's third band sets the NSW price.
+    assert list(aggregated_market.get_unit_dispatch()['dispatch']) == pytest.approx([60.0, 70.0, 50.0, 60.0])
+    assert list(aggregated_market.get_energy_prices()['price']) == pytest.approx([150.0, 100.0])
+
+
+def test_time_bounded_dispatch_reports_solve_status():
+    break_points = [-150.0, -100.0, -50.0, 0.0, 50.0, 100.0, 150.0]
+    market = two_region_market(break_points=break_points)
+    with pytest.raises(markets.check.ModelBuildError):
+        market.get_solve_status()
+    market.dispatch()
+    bounded_market = two_region_market(break_points=break_points)
+    bounded_market.dispatch(time_limit=60.0, mip_gap=0.0, threads=1)
+    assert list(bounded_market.get_solve_status()['status']) == ['optimal']
+    assert list(bounded_market.get_pricing_statistics()['status']) == ['optimal', 'optimal']
+    assert_frame_equal(bounded_market.get_unit_dispatch(), market.get_unit_dispatch())
+    assert_frame_equal(bounded_market.get_energy_prices(), market.get_energy_prices())
+    # The interconnector is at its 150 MW limit, with 4.5 MW of losses shared evenly between the regions.
+    assert list(bounded_market.get_unit_dispatch()['dispatch']) == pytest.approx([212.25, 32.25])
+    assert list(bounded_market.get_energy_prices()['price']) == pytest.approx([60.0, 90.0])
+
+
+def test_constraint_violation_penalties_let_infeasible_dispatch_solve():
+    market = energy_market({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}, {'1': [20.0, 50.0]}, {'1': [50.0, 100.0]},
+                           {'NSW': 60.0})
+    # Unit B can not ramp down below 55 MW, which is more than it has bid.
+    market.set_unit_ramp_down_constraints(pd.DataFrame({
+        'unit': ['B'], 'initial_output': [65.0], 'ramp_down_rate': [120.0]}))
+    with pytest.raises(ValueError):
+        market.dispatch()
+
+    market.set_constraint_violation_penalties(pd.DataFrame({
+        'constraint_group': ['demand', 'ramp_down'], 'penalty': [14000.0, 1000.0]}))
+    market.dispatch()
+    violations = market.get_constraint_violations()
+    assert list(violations['constraint_group']) == ['ramp_down']
+    assert list(violations['direction']) == ['deficit']
+    assert list(violations['violation']) == pytest.approx([5.0])
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([10.0, 50.0])
+    # Unit A has bid more than it is dispatched, so it sets the price.
+    assert list(market.get_energy_prices()['price']) == pytest.approx([50.0])
+
+    with pytest.raises(ValueError):
+        market.set_constraint_violation_penalties(pd.DataFrame({
+            'constraint_group': ['interpolation_weights'], 'penalty': [1000.0]}))
+
+
+def test_snapshot_dispatches_the_same_as_the_market_it_was_saved_from(tmp_path):
+    market = two_region_market(break_points=[-150.0, 0.0, 150.0])
+    market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A'], 'capacity': [150.0]}))
+    market.dispatch()
+    market.save_snapshot(str(tmp_path / 'interval.npz'))
+    market.write_model(str(tmp_path / 'interval.mps'))
+    market.write_model(str(tmp_path / 'interval.lp'))
+
+    replay_market = markets.Spot()
+    replay_market.load_snapshot(str(tmp_path / 'interval.npz'))
+    replay_market.dispatch()
+    assert_frame_equal(replay_market.get_unit_dispatch(), market.get_unit_dispatch())
+    assert_frame_equal(replay_market.get_energy_prices(), market.get_energy_prices())
+    assert_frame_equal(replay_market.get_interconnector_flows(), market.get_interconnector_flows())
+    # Unit A is held at its 150 MW capacity, so NSW is priced off unit B in VIC, less 3 % losses each way.
+    assert list(replay_market.get_unit_dispatch()['dispatch']) == pytest.approx([150.0, 180.0 - 90.0 * 0.985 / 1.015])
+    assert list(replay_market.get_energy_prices()['price']) == pytest.approx([90.0 * 0.985 / 1.015, 90.0])
+    assert (tmp_path / 'interval.mps').read_text().startswith('NAME')
+    assert 'Subject To' in (tmp_path / 'interval.lp').read_text()
+
+
+def test_inputs_cannot_be_set_on_a_market_loaded_from_a_snapshot(tmp_path):
+    market = two_region_market()
+    market.save_snapshot(str(tmp_path / 'interval.npz'))
+    market.dispatch()
+
+    replay_market = markets.Spot()
+    replay_market.load_snapshot(str(tmp_path / 'interval.npz'))
+    with pytest.raises(markets.check.ModelBuildError):
+        replay_market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'VIC']}))
+    with pytest.raises(markets.check.ModelBuildError):
+        replay_market.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [80.0, 180.0]}))
+    # The loaded model is left as it was saved.
+    replay_market.dispatch()
+    assert_frame_equal(replay_market.get_unit_dispatch(), market.get_unit_dispatch())
+    assert_frame_equal(replay_market.get_energy_prices(), market.get_energy_prices())
+
+
+def test_price_curve_matches_dispatching_at_each_demand_level():
+    break_points = [-150.0, 0.0, 150.0]
+    demand_values = [20.0, 100.0, 200.0]
+    market = two_region_market(break_points=break_points)
+    market.dispatch()
+    base_prices = market.get_energy_prices()
+    prices, dispatch = market.price_curve('NSW', demand_values)
+    for demand_value in demand_values:
+        point_market = two_region_market(demand=(demand_value, 180.0), break_points=break_points)
+        point_market.dispatch()
+        point_prices = prices[prices['demand'] == demand_value].drop(columns=['demand']).reset_index(drop=True)
+        point_dispatch = dispatch[dispatch['demand'] == demand_value].drop(columns=['demand']).reset_index(drop=True)
+        assert_frame_equal(point_prices, point_market.get_energy_prices())
+        assert_frame_equal(point_dispatch, point_market.get_unit_dispatch())
+    # Losses are 3 % of the flow, so once unit A is fully dispatched NSW is priced off unit B in VIC.
+    assert list(prices['price']) == pytest.approx([50.0, 90.0, 90.0 * 0.985 / 1.015, 90.0, 120.0 * 0.985 / 1.015,
+                                                   120.0])
+    assert list(dispatch['dispatch']) == pytest.approx([172.25, 32.25, 250.0, 180.0 - 150.0 * 0.985 / 1.015, 250.0,
+                                                        180.0 - 50.0 * 0.985 / 1.015])
+    # The market's own results are unchanged.
+    assert_frame_equal(market.get_energy_prices(), base_prices)
+    with pytest.raises(ValueError):
+        market.price_curve('QLD', demand_values)
+
+
+def test_dispatch_scenarios_match_markets_built_for_each_scenario():
+    def build(demand=60.0, a_price=50.0):
+        market = markets.Spot()
+        market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+        market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 80.0], '2': [10.0, 10.0]}))
+        market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [a_price, 100.0], '2': [a_price * 2, 110.0]}))
+        market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [demand]}))
+        return market
+
+    scenarios = pd.DataFrame({
+        'scenario': ['low', 'outage', 'shock', 'shock'],
+        'delta': ['demand_offset', 'outage', 'price_factor', 'demand_offset'],
+        'target': ['NSW', 'A', 'A', 'NSW'],
+        'value': [-45.0, 0.0, 3.0, 10.0]})
+    expected_markets = {'low': build(demand=15.0), 'outage': build(), 'shock': build(70.0, a_price=150.0)}
+    outage_market = expected_markets['outage']
+    outage_market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [0.0, 80.0], '2': [0.0, 10.0]}))
+    outage_market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0], '2': [100.0, 110.0]}))
+    for expected_market in expected_markets.values():
+        expected_market.dispatch()
+
+    market = build()
+    for workers in [None, 2]:
+        prices, dispatch = market.dispatch_scenarios(scenarios, workers=workers)
+        assert list(prices['scenario']) == ['low', 'outage', 'shock']
+        for scenario, expected_market in expected_markets.items():
+            scenario_prices = prices[prices['scenario'] == scenario].drop(columns=['scenario'])
+            scenario_dispatch = dispatch[dispatch['scenario'] == scenario].drop(columns=['scenario'])
+            assert_frame_equal(scenario_prices.reset_index(drop=True), expected_market.get_energy_prices())
+            expected_dispatch = expected_market.get_unit_dispatch()
+            # Bids of 0 MW have no variable, so the outage unit is missing from the market built without its bids.
+            scenario_dispatch = scenario_dispatch[scenario_dispatch['unit'].isin(expected_dispatch['unit'])]
+            assert_frame_equal(scenario_dispatch.reset_index(drop=True), expected_dispatch)
+
+
+@pytest.mark.parametrize('delta, target', [('surge', 'NSW'), ('demand_offset', 'QLD'), ('outage', 'C'),
+                                           ('price_factor', 'NSW')])
+def test_dispatch_scenarios_rejects_unknown_deltas_and_targets(delta, target):
+    market = two_region_market()
+    scenarios = pd.DataFrame({'scenario': [1, 1], 'delta': ['demand_offset', delta], 'target': ['NSW', target],
+                              'value': [10.0, 2.0]})
+    with pytest.raises(ValueError):
+        market.dispatch_scenarios(scenarios)
+
+
+def test_merit_order_dispatch_matches_the_solver():
+    merit_order_market = energy_market(
+        {'unit': ['A', 'B', 'C', 'D'], 'region': ['NSW', 'NSW', 'VIC', 'VIC'], 'loss_factor': [0.95, 1.0, 1.02, 1.0]},
+        {'1': [40.0, 30.0, 50.0, 20.0], '2': [40.0, 60.0, 30.0, 60.0], '3': [20.0, 20.0, 20.0, 20.0]},
+        {'1': [-20.0, 30.0, 10.0, 45.0], '2': [70.0, 50.0, 80.0, 65.0], '3': [200.0, 150.0, 300.0, 250.0]},
+        {'NSW': 120.0, 'VIC': 110.0}, timing=True)
+    merit_order_market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A', 'B', 'C'],
+                                                                   'capacity': [70.0, 200.0, 90.0]}))
+    merit_order_market.set_unit_ramp_up_constraints(pd.DataFrame({'unit': ['B', 'D'], 'initial_output': [50.0, 10.0],
+                                                                  'ramp_up_rate': [240.0, 600.0]}))
+    solver_market = merit_order_market.clone()
+    ramp_down_market = merit_order_market.clone()
+    infeasible_market = merit_order_market.clone()
+
+    merit_order_market.dispatch()
+    assert list(merit_order_market.get_timings()['phase']) == ['merit_order']
+    solver_market.dispatch(merit_order=False)
+    assert_frame_equal(merit_order_market.get_unit_dispatch(), solver_market.get_unit_dispatch())
+    assert_frame_equal(merit_order_market.get_energy_prices(), solver_market.get_energy_prices())
+    # Ramp up rates hold B to 70 MW and D to 60 MW, so A's and C's second bands set the prices, scaled by their loss
+    # factors.
+    assert list(merit_order_market.get_unit_dispatch()['dispatch']) == pytest.approx([50.0, 70.0, 50.0, 60.0])
+    assert list(merit_order_market.get_energy_prices()['price']) == pytest.approx([70.0 / 0.95, 80.0 / 1.02])
+
+    # Merit order prices need no re-solves, so the pricing statistics have their columns but no rows.
+    pricing_statistics = merit_order_market.get_pricing_statistics()
+    assert list(pricing_statistics.columns) == list(solver_market.get_pricing_statistics().columns)
+    assert len(pricing_statistics.index) == 0
+
+    # Markets the merit order can not clear, e.g. with a ramp down constraint, use the solver.
+    ramp_down_market.set_unit_ramp_down_constraints(pd.DataFrame({'unit': ['D'], 'initial_output': [10.0],
+                                                                  'ramp_down_rate': [600.0]}))
+    ramp_down_market.dispatch()
+    assert 'merit_order' not in list(ramp_down_market.get_timings()['phase'])
+    assert_frame_equal(ramp_down_market.get_unit_dispatch(), solver_market.get_unit_dispatch())
+
+    infeasible_market.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [120.0, 1000.0]}))
+    with pytest.raises(ValueError):
+        infeasible_market.dispatch()
+
+
+def test_merit_order_dispatch_matches_the_solver_with_tied_bands():
+    # A and B are tied on price in NSW, and so are C's and D's second bands in VIC.
+    merit_order_market = energy_market(
+        {'unit': ['A', 'B', 'C', 'D', 'E'], 'region': ['NSW', 'NSW', 'VIC', 'VIC', 'VIC']},
+        {'1': [40.0, 30.0, 20.0, 20.0, 30.0], '2': [40.0, 40.0, 30.0, 30.0, 50.0]},
+        {'1': [35.5, 35.5, 20.0, 25.0, 90.0], '2': [80.0, 80.0, 61.25, 61.25, 95.0]},
+        {'NSW': 100.0, 'VIC': 80.0}, timing=True)
+    merit_order_market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['B'], 'capacity': [50.0]}))
+    solver_market = merit_order_market.clone()
+    merit_order_market.dispatch()
+    assert list(merit_order_market.get_timings()['phase']) == ['merit_order']
+    solver_market.dispatch(merit_order=False)
+
+    # The tied bands may be shared out differently, but the total of each set of tied units, the dispatch of the
+    # others and the prices are the same, within the solver's tolerance.
+    merit_order_dispatch = merit_order_market.get_unit_dispatch().set_index('unit')['dispatch']
+    solver_dispatch = solver_market.get_unit_dispatch().set_index('unit')['dispatch']
+    for units in [['A', 'B'], ['C', 'D'], ['E']]:
+        assert merit_order_dispatch[units].sum() == pytest.approx(solver_dispatch[units].sum())
+    assert merit_order_dispatch[['A', 'B']].sum() == pytest.approx(100.0)
+    assert merit_order_dispatch[['C', 'D']].sum() == pytest.approx(80.0)
+    assert list(merit_order_market.get_energy_prices()['price']) == pytest.approx([80.0, 61.25])
+    assert list(solver_market.get_energy_prices()['price']) == pytest.approx([80.0, 61.25], abs=1e-3)
+
+
+def test_model_arrays_match_arrays_flattened_from_the_dataframes():
+    def assert_arrays_match(market):
+        decision_variables, constraints_lhs, objective_function_components, arrays = market._assemble()
+        expected = solver_interface.create_arrays(
+            decision_variables, constraints_lhs, market.constraints_rhs_and_type,
+            market.market_constraints_rhs_and_type, market.constraints_dynamic_rhs_and_type,
+            objective_function_components)
+        for name, values in arrays.arrays().items():
+            np.testing.assert_array_equal(values, expected[name])
+
+    break_points = [-150.0, 0.0, 150.0]
+    market = two_region_market(break_points=break_points)
+    market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A', 'B'], 'capacity': [220.0, 150.0]}))
+    assert_arrays_match(market)
+    market.dispatch()
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([212.25, 32.25])
+
+    # Inputs set again after a dispatch replace their blocks.
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [100.0, 150.0]}))
+    market.set_interconnector_losses(
+        pd.DataFrame({'interconnector': ['little_link'], 'from_region_loss_share': [0.5],
+                      'loss_function': [quadratic_losses]}),
+        pd.DataFrame({'interconnector': ['little_link'] * 3, 'loss_segment': [1, 2, 3], 'break_point': break_points}),
+        formulation='lp')
+    market.set_constraint_violation_penalties(pd.DataFrame({'constraint_group': ['demand'], 'penalty': [1.0e4]}))
+    assert_arrays_match(market)
+    market.dispatch()
+    # Unit A is held at its 220 MW capacity, so NSW is priced off unit B in VIC, less 3 % losses each way.
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([220.0, 150.0 - 120.0 * 0.985 / 1.015])
+    assert list(market.get_energy_prices()['price']) == pytest.approx([90.0 * 0.985 / 1.015, 90.0])
+
+
+def test_direct_edits_to_the_input_dataframes_are_dispatched():
+    market = two_region_market(demand=(60.0, 200.0), limit=100.0)
+    market.dispatch(merit_order=False)
+    assert list(market.get_energy_prices()['price']) == [50.0, 120.0]
+
+    # A group replaced in the dict of a market, rather than set.
+    demand = market.market_constraints_rhs_and_type['demand'].copy()
+    demand.loc[demand['region'] == 'VIC', 'rhs'] = 120.0
+    market.market_constraints_rhs_and_type['demand'] = demand
+    market.dispatch(merit_order=False)
+    assert list(market.get_energy_prices()['price']) == [50.0, 90.0]
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([160.0, 20.0])
+
+    # A group edited in place, cutting the first band of unit B to 10 MW, so VIC is priced by its second band.
+    bids = market.decision_variables['bids']
+    bids.loc[(bids['unit'] == 'B') & (bids['capacity_band'] == '1'), 'upper_bound'] = 10.0
+    market.dispatch(merit_order=False)
+    assert list(market.get_energy_prices()['price']) == [50.0, 120.0]
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([160.0, 20.0])
+
+
+def test_lhs_joins_are_only_redone_for_groups_set_again():
+    market = markets.Spot()
+    market.set_unit_info(pd.DataFrame({'unit': ['A', 'B'], 'region': ['NSW', 'NSW']}))
+    market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [20.0, 50.0], '2': [20.0, 30.0]}))
+    market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B'], '1': [50.0, 100.0], '2': [60.0, 130.0]}))
+    market.set_unit_capacity_constraints(pd.DataFrame({'unit': ['A', 'B'], 'capacity': [30.0, 100.0]}))
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [60.0]}))
+    market.dispatch(merit_order=False)
+    joins = dict(market.model_arrays.lhs_joins)
+    assert set(joins) == {('regional', 'demand', 'bids'), ('unit_level', 'unit_capacity', 'bids')}
+
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW'], 'demand': [90.0]}))
+    market.dispatch(merit_order=False)
+    assert market.model_arrays.lhs_joins[('unit_level', 'unit_capacity', 'bids')] is \
+        joins[('unit_level', 'unit_capacity', 'bids')]
+    assert market.model_arrays.lhs_joins[('regional', 'demand', 'bids')] is not joins[('regional', 'demand', 'bids')]
+    assert_frame_equal(market.get_unit_dispatch(), pd.DataFrame({
+        'unit': ['A', 'B'], 'service': ['energy', 'energy'], 'dispatch': [30.0, 60.0]}))
+
+
+def test_redispatch_keeps_inputs_and_results_apart():
+    market = two_region_market(demand=(60.0, 200.0), limit=100.0)
+    with pytest.raises(markets.check.ModelBuildError):
+        market.get_energy_prices()
+    with pytest.raises(markets.check.ModelBuildError):
+        market.get_solve_status()
+    market.dispatch()
+    first_results = market.results
+    first_prices = first_results.get_energy_prices().copy()
+    first_statistics = first_results.solve_statistics
+    assert 'value' not in market.decision_variables['bids'].columns
+    assert 'price' not in market.market_constraints_rhs_and_type['demand'].columns
+
+    market.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [60.0, 120.0]}))
+    market.dispatch()
+    fresh_market = two_region_market(demand=(60.0, 120.0), limit=100.0)
+    fresh_market.dispatch()
+    assert_frame_equal(market.get_energy_prices(), fresh_market.get_energy_prices())
+    assert_frame_equal(market.get_unit_dispatch(), fresh_market.get_unit_dispatch())
+    assert_frame_equal(market.get_interconnector_flows(), fresh_market.get_interconnector_flows())
+    assert_frame_equal(first_results.get_energy_prices(), first_prices)
+    # The statistics of each dispatch are kept with its results.
+    assert market.results.solve_statistics is not first_statistics
+    assert first_results.solve_statistics is first_statistics
+    assert list(market.get_solve_status()['status']) == ['optimal']
+    # The interconnector is at its 100 MW limit in both dispatches.
+    assert list(first_prices['price']) == [50.0, 120.0]
+    assert list(first_results.get_unit_dispatch()['dispatch']) == pytest.approx([160.0, 100.0])
+    assert list(market.get_energy_prices()['price']) == [50.0, 90.0]
+    assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx([160.0, 20.0])
+
+
+def test_clones_share_the_base_and_are_rebuilt_from_pickled_changes():
+    def add_unit_c(market):
+        market.set_unit_info(pd.DataFrame({'unit': ['A', 'B', 'C'], 'region': ['NSW', 'VIC', 'VIC']}))
+        market.set_unit_volume_bids(pd.DataFrame({'unit': ['A', 'B', 'C'], '1': [200.0, 100.0, 80.0],
+                                                  '2': [50.0, 50.0, 0.0]}))
+        market.set_unit_price_bids(pd.DataFrame({'unit': ['A', 'B', 'C'], '1': [50.0, 90.0, 70.0],
+                                                 '2': [60.0, 120.0, 70.0]}))
+        return market
+
+    base = two_region_market(demand=(60.0, 200.0), limit=100.0)
+    base.dispatch(merit_order=False)
+    base_prices = base.get_energy_prices().copy()
+
+    lower_demand = base.clone()
+    lower_demand.set_demand_constraints(pd.DataFrame({'region': ['NSW', 'VIC'], 'demand': [60.0, 120.0]}))
+    new_unit = add_unit_c(base.clone())
+    assert lower_demand.decision_variables['bids'] is base.decision_variables['bids']
+    assert lower_demand.market_constraints_rhs_and_type['demand'] is not \
+        base.market_constraints_rhs_and_type['demand']
+
+    changes = lower_demand.changes(base)
+    assert set(changes.changed) == {'market_constraints_rhs_and_type', 'constraint_to_variable_map',
+                                    'next_constraint_id', 'model_arrays'}
+    assert len(pickle.dumps(changes)) < len(pickle.dumps(base.clone()))
+
+    # The interconnector is at its 100 MW limit in every market, so VIC is priced by its own units.
+    fresh_markets = [(lower_demand, two_region_market(demand=(60.0, 120.0), limit=100.0), [160.0, 20.0], [50.0, 90.0]),
+                     (new_unit, add_unit_c(two_region_market(demand=(60.0, 200.0), limit=100.0)),
+                      [160.0, 20.0, 80.0], [50.0, 90.0])]
+    for branch, fresh_market, dispatch, prices in fresh_markets:
+        rebuilt = base.clone(pickle.loads(pickle.dumps(branch.changes(base))))
+        fresh_market.dispatch(merit_order=False)
+        for market in [branch, rebuilt]:
+            market.dispatch(merit_order=False)
+            assert_frame_equal(market.get_energy_prices(), fresh_market.get_energy_prices())
+            assert_frame_equal(market.get_unit_dispatch(), fresh_market.get_unit_dispatch())
+            assert_frame_equal(market.get_interconnector_flows(), fresh_market.get_interconnector_flows())
+            assert list(market.get_unit_dispatch()['dispatch']) == pytest.approx(dispatch)
+            assert list(market.get_energy_prices()['price']) == pytest.approx(prices)
+
+    base.dispatch(merit_order=False)
+    assert_frame_equal(base.get_energy_prices(), base_prices)
+    assert list(base_prices['price']) == [50.0, 120.0]
+    assert len(base.get_unit_dispatch().index) == 2
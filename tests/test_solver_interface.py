@@ -1,6 +1,8 @@
+import pytest
+import numpy as np
 import pandas as pd
 from pandas._testing import assert_frame_equal
-from nempy import solver_interface
+from nempy import solver_backends, solver_interface
 
 
 def test_dispatch():
@@ -62,3 +64,226 @@ def test_dispatch():
     }
     assert_frame_equal(split_decision_variables['energy_units'], expected_split_decision_variables['energy_units'])
     assert_frame_equal(market_rhs_and_type['demand'], expected_market_rhs_and_type['demand'])
+
+
+def test_dispatch_with_unsorted_sparse_lhs():
+    decision_variables = {
+        'energy_units': pd.DataFrame({
+            'unit': ['A', 'A', 'B', 'B'],
+            'upper_bound': [1, 6, 5, 7],
+            'variable_id': [4, 5, 6, 7],
+            'lower_bound': [0.0, 0.0, 0.0, 0.0],
+            'type': ['continuous', 'continuous', 'continuous', 'continuous'],
+        })
+    }
+    constraints_rhs_and_type = {
+            'capacity': pd.DataFrame({
+                'constraint_id': [0, 1],
+                'type': ['<=', '<='],
+                'rhs': [5, 15]
+        })
+    }
+    market_rhs_and_type = {
+        'demand': pd.DataFrame({
+            'constraint_id': [2],
+            'type': ['='],
+            'rhs': [15]
+        })
+    }
+    # Triplets in no particular order, with an explicit zero coefficient, which should still be treated as present.
+    constraints_lhs_coefficient = pd.DataFrame({
+            'constraint_id': [2, 1, 0, 2, 2, 1, 0, 2, 0],
+            'variable_id': [7, 7, 5, 4, 6, 6, 4, 5, 6],
+            'coefficient': [1, 1, 1, 1, 1, 1, 1, 1, 0]
+    })
+    objective_function = {
+        'energy_bids': pd.DataFrame({
+            'variable_id': [4, 5, 6, 7],
+            'cost': [0, 1, 2, 3]
+        })
+    }
+    constraints_dynamic_rhs_and_type = {}
+    split_decision_variables, market_rhs_and_type = solver_interface.dispatch(
+        decision_variables, constraints_lhs_coefficient, constraints_rhs_and_type, market_rhs_and_type,
+        constraints_dynamic_rhs_and_type, objective_function)
+    assert list(split_decision_variables['energy_units']['value']) == [1.0, 4.0, 5.0, 5.0]
+    assert list(market_rhs_and_type['demand']['price']) == [3.0]
+
+
+def test_dispatch_with_highs_backend():
+    pytest.importorskip('highspy')
+    decision_variables = {
+        'energy_units': pd.DataFrame({
+            'unit': ['A', 'A', 'B', 'B'],
+            'upper_bound': [1, 6, 5, 7],
+            'variable_id': [4, 5, 6, 7],
+            'lower_bound': [0.0, 0.0, 0.0, 0.0],
+            'type': ['continuous', 'continuous', 'continuous', 'continuous'],
+        })
+    }
+    constraints_rhs_and_type = {
+            'capacity': pd.DataFrame({
+                'constraint_id': [0, 1],
+                'type': ['<=', '<='],
+                'rhs': [5, 15]
+        })
+    }
+    market_rhs_and_type = {
+        'demand': pd.DataFrame({
+            'constraint_id': [2],
+            'type': ['='],
+            'rhs': [15]
+        })
+    }
+    constraints_lhs_coefficient = pd.DataFrame({
+            'constraint_id': [0, 0, 1, 1, 2, 2, 2, 2],
+            'variable_id': [4, 5, 6, 7, 4, 5, 6, 7],
+            'coefficient': [1, 1, 1, 1, 1, 1, 1, 1]
+    })
+    objective_function = {
+        'energy_bids': pd.DataFrame({
+            'variable_id': [4, 5, 6, 7],
+            'cost': [0, 1, 2, 3]
+        })
+    }
+    for price_method in ['perturbation', 'dual']:
+        split_decision_variables, market_prices = solver_interface.dispatch(
+            decision_variables, constraints_lhs_coefficient, constraints_rhs_and_type,
+            {'demand': market_rhs_and_type['demand'].copy()}, {}, objective_function, price_method=price_method,
+            backend='highs')
+        assert list(split_decision_variables['energy_units']['value']) == [1.0, 4.0, 5.0, 5.0]
+        assert list(market_prices['demand']['price']) == [3.0]
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        solver_interface.PersistentModel('guess')
+
+
+def test_incomplete_backend_can_not_be_created():
+    class NoSos2Backend(solver_backends.SolverBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        NoSos2Backend()
+
+
+def test_dual_pricing_restores_bounds_when_the_re_solve_fails():
+    class FailingRelaxedSolve(solver_backends.MipBackend):
+        def solve(self, relax=False):
+            status = super().solve(relax)
+            return 'infeasible' if relax else status
+
+    solver = FailingRelaxedSolve()
+    solver.add_variables(lower_bounds=[0.0, 0.0], upper_bounds=[10.0, 10.0], types=['integer', 'continuous'],
+                         costs=[1.0, 2.0])
+    demand = solver.add_constraints(row_starts=[0], variable_positions=[0, 1], coefficients=[1.0, 1.0],
+                                    senses=['='], rhs=[12.5])
+    assert solver.solve() == 'optimal'
+    market_rhs_and_type = {'demand': pd.DataFrame({'constraint_id': [0], 'type': ['='], 'rhs': [12.5]})}
+    with pytest.raises(ValueError):
+        solver_interface.get_prices_from_duals(solver, {0: demand[0]}, None, market_rhs_and_type)
+    lower_bounds, upper_bounds = solver.variable_bounds()
+    np.testing.assert_array_equal(lower_bounds, [0.0, 0.0])
+    np.testing.assert_array_equal(upper_bounds, [10.0, 10.0])
+
+
+def test_dispatch_splits_values_back_to_each_variable_group():
+    decision_variables = {
+        'energy_units': pd.DataFrame({
+            'unit': ['A', 'B'],
+            'upper_bound': [10.0, 10.0],
+            'variable_id': [0, 1],
+            'lower_bound': [0.0, 0.0],
+            'type': ['continuous', 'continuous'],
+        }),
+        'interconnectors': pd.DataFrame({
+            'interconnector': ['X'],
+            'variable_id': [2],
+            'lower_bound': [-5.0],
+            'upper_bound': [5.0],
+            'type': ['continuous'],
+        })
+    }
+    market_rhs_and_type = {
+        'demand': pd.DataFrame({
+            'constraint_id': [0, 1],
+            'type': ['=', '='],
+            'rhs': [8.0, 6.0]
+        })
+    }
+    # Unit A and B supply regions 0 and 1, with the interconnector flowing from region 0 to region 1.
+    constraints_lhs_coefficient = pd.DataFrame({
+            'constraint_id': [0, 0, 1, 1],
+            'variable_id': [0, 2, 1, 2],
+            'coefficient': [1.0, -1.0, 1.0, 1.0]
+    })
+    objective_function = {
+        'energy_bids': pd.DataFrame({
+            'variable_id': [0, 1],
+            'cost': [1.0, 2.0]
+        })
+    }
+    split_decision_variables, market_rhs_and_type = solver_interface.dispatch(
+        decision_variables, constraints_lhs_coefficient, {}, market_rhs_and_type, {}, objective_function)
+    assert list(split_decision_variables['energy_units']['value']) == [10.0, 4.0]
+    assert list(split_decision_variables['interconnectors']['value']) == [2.0]
+    # Each group keeps only its own columns.
+    assert list(split_decision_variables['interconnectors'].columns) == \
+        ['interconnector', 'variable_id', 'lower_bound', 'upper_bound', 'type', 'value']
+    assert list(market_rhs_and_type['demand']['price']) == [2.0, 2.0]
+
+
+def test_dispatch_with_presolve_matches_dispatch_without():
+    decision_variables = {
+        'energy_units': pd.DataFrame({
+            'unit': ['A', 'A', 'B', 'B'],
+            'upper_bound': [1, 6, 5, 7],
+            'variable_id': [4, 5, 6, 7],
+            'lower_bound': [0.0, 0.0, 0.0, 0.0],
+            'type': ['continuous', 'continuous', 'continuous', 'continuous'],
+        })
+    }
+    # A capacity and ramp up constraint on unit A, and a constraint on B's second band alone.
+    constraints_rhs_and_type = {
+            'capacity': pd.DataFrame({
+                'constraint_id': [0, 1],
+                'type': ['<=', '<='],
+                'rhs': [6, 15]
+        }),
+            'ramp_up': pd.DataFrame({
+                'constraint_id': [3, 4],
+                'type': ['<=', '<='],
+                'rhs': [5, 4]
+        })
+    }
+    market_rhs_and_type = {
+        'demand': pd.DataFrame({
+            'constraint_id': [2],
+            'type': ['='],
+            'rhs': [13]
+        })
+    }
+    constraints_lhs_coefficient = pd.DataFrame({
+            'constraint_id': [0, 0, 1, 1, 2, 2, 2, 2, 3, 3, 4],
+            'variable_id': [4, 5, 6, 7, 4, 5, 6, 7, 4, 5, 7],
+            'coefficient': [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+    })
+    objective_function = {
+        'energy_bids': pd.DataFrame({
+            'variable_id': [4, 5, 6, 7],
+            'cost': [0, 1, 2, 3]
+        })
+    }
+    results = []
+    for presolve in [False, True]:
+        statistics = {}
+        split_decision_variables, market_prices = solver_interface.dispatch(
+            decision_variables, constraints_lhs_coefficient, constraints_rhs_and_type,
+            {'demand': market_rhs_and_type['demand'].copy()}, {}, objective_function, statistics=statistics,
+            presolve=presolve)
+        results.append((list(split_decision_variables['energy_units']['value']),
+                        list(market_prices['demand']['price'])))
+    assert results[0] == results[1] == ([1.0, 4.0, 5.0, 3.0], [3.0])
+    assert statistics['presolve'] == {'rows_before': 5, 'duplicate_rows_eliminated': 1,
+                                      'single_variable_rows_eliminated': 1, 'rows_after': 3}